@@ -7,6 +7,7 @@ Task mapping:
 1) process_trade_data
 2) detect_anomaly
 3) process_candle_data 
+4) process_trade_batch (micro-batched version of 1) + 2))
 
 """
 # ------------------------------------------------------------------------------
@@ -28,7 +29,7 @@ r = redis.Redis(host='redis', port=6379, db=0)
 # -----------------------------------------------------------------------------
 
 # Import functions.
-from Falcon_functions import clean_trade, save_trade_to_cache, save_candle_to_timeseries, fetch_coinbase_candles
+from Falcon_functions import clean_trade, save_trade_to_cache, save_trades_to_cache, save_candle_to_timeseries, fetch_coinbase_candles
 
 # Define the app and broker and backend.
 app = Celery('Falcon_Celery_Tasks',
@@ -211,3 +212,84 @@ def process_candle_data(candle):
         print(f"[process_candle_data ERROR] {e}")
         return {"status": "error", "message": str(e)}
 
+# ------------------------------------------------------------------------------
+# 4. process_trade_batch
+# ------------------------------------------------------------------------------
+# Same threshold as detect_anomaly.
+ANOMALY_THRESHOLD = 2
+ANOMALY_MIN_HISTORY = 30
+
+
+def detect_anomalies_batch(platform, prices):
+    """
+    Run the rolling mean/std check of `detect_anomaly` on a batch of prices.
+
+    Each price is compared with the last 500 prices up to and including
+    itself, exactly like calling `detect_anomaly` once per trade, but all
+    the windows are computed at once from cumulative sums.
+
+    Args:
+        platform (str): Platform whose price history is used and updated.
+        prices (np.ndarray): Prices of the batch, in arrival order.
+
+    Returns:
+        tuple: (is_anomaly, mean, std) arrays, one value per price.
+    """
+    history = price_history[platform]
+    window = history.maxlen
+    values = np.concatenate([np.asarray(history, dtype=float), prices])
+    # Center on a reference price so the sum of squares doesn't lose precision.
+    centered = values - values[0]
+    csum = np.concatenate([[0.0], np.cumsum(centered)])
+    csum_sq = np.concatenate([[0.0], np.cumsum(centered ** 2)])
+    # Window of each new price: values[start:end].
+    end = np.arange(len(history) + 1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    count = end - start
+    mean = (csum[end] - csum[start]) / count
+    var = (csum_sq[end] - csum_sq[start]) / count - mean ** 2
+    std = np.sqrt(np.maximum(var, 0.0))
+    mean += values[0]
+    is_anomaly = (count >= ANOMALY_MIN_HISTORY) & (
+        np.abs(prices - mean) > ANOMALY_THRESHOLD * std
+    )
+    history.extend(prices.tolist())
+    return is_anomaly, mean, std
+
+
+# ignore_result: the endpoint never reads the result, so don't write one per batch.
+@app.task(ignore_result=True)
+def process_trade_batch(trades, platform):
+    """
+    Clean, cache and check for anomalies a batch of raw trades of a platform.
+
+    One task replaces the `process_trade_data -> detect_anomaly` chain of
+    every trade in the batch.
+    """
+    print(f"[Celery] Processing batch of {len(trades)} {platform} trades")
+    try:
+        cleaned = [c for c in (clean_trade(t, platform) for t in trades) if c]
+        if not cleaned:
+            return {"platform": platform, "count": 0, "anomalies": 0}
+        save_trades_to_cache(cleaned, platform=platform)
+        cores = [c["core"] for c in cleaned]
+        prices = np.array([float(core.get("price", 0)) for core in cores])
+        is_anomaly, mean, std = detect_anomalies_batch(platform.lower(), prices)
+        # Push all the anomalies of the batch with one round trip.
+        anomaly_key = f"anomalies:{platform.lower()}"
+        idxs = np.flatnonzero(is_anomaly)
+        if len(idxs):
+            pipe = r.pipeline(transaction=False)
+            for i in idxs:
+                data = dict(cores[i], anomaly=True, mean=float(mean[i]), std=float(std[i]))
+                logging.warning(
+                    f"[ANOMALY] {platform} @ {data.get('timestamp')} | Price: {prices[i]:.2f} | Mean: {mean[i]:.2f} | Std: {std[i]:.2f}"
+                )
+                pipe.lpush(anomaly_key, json.dumps(data))
+            pipe.ltrim(anomaly_key, 0, 999)
+            pipe.execute()
+        return {"platform": platform, "count": len(cleaned), "anomalies": len(idxs)}
+    except Exception as e:
+        logger.error(f"Failed to process trade batch: {e}")
+        traceback.print_exc()
+        return {"status": "error", "message": str(e)}
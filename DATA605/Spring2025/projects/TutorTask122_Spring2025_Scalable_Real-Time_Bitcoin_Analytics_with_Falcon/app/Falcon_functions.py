@@ -128,6 +128,34 @@ def save_trade_to_cache(trade: dict, symbol: str = "BTCUSDT", platform: str = "b
 
     except Exception as e:
         print(f"[Redis Error] Could not save trade: {e}")
+
+def save_trades_to_cache(trades: list, platform: str = "binance", max_trades: int = 5000):
+    """
+    Save a batch of cleaned trades to Redis in one round trip.
+
+    Same keys as `save_trade_to_cache`, but the trades are grouped by symbol
+    and written with a single pipeline, so the list is trimmed once per batch.
+
+    Args:
+        trades (list): Cleaned trades with 'core' and 'raw', in arrival order.
+        platform (str): 'binance' or 'coinbase'.
+        max_trades (int): Max number of trades to keep in Redis.
+    """
+    by_symbol = {}
+    for trade in trades:
+        by_symbol.setdefault(trade["core"]["symbol"], []).append(json.dumps(trade))
+    try:
+        pipe = r.pipeline(transaction=False)
+        for symbol, payloads in by_symbol.items():
+            key = f"trades:{platform}:{symbol.lower()}"
+            # LPUSH of several values keeps the newest trade at the head.
+            pipe.lpush(key, *payloads)
+            pipe.ltrim(key, 0, max_trades - 1)
+            pipe.set(f"{key}:latest", payloads[-1])
+        pipe.execute()
+        print(f"[save_trades_to_cache] Cached {len(trades)} trades for {platform}")
+    except Exception as e:
+        print(f"[Redis Error] Could not save trades: {e}")
 # ------------------------------------------------------------------------------
 # Initialize Redis timeseries client for LSTM modeling
 # -----------------------------------------------------------------------------
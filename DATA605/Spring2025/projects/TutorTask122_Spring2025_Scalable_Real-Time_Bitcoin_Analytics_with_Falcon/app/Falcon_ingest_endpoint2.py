@@ -8,6 +8,10 @@ Falcon ASGI server that receives real-time trade data via WebSocket endpoints fo
 
 3. Middleware is used to log WebSocket connections.
 
+3b. Trades received via POST are micro-batched per platform (see `TradeBatcher`)
+    and dispatched as one Celery task per batch; the endpoint answers 429 when
+    too many trades are waiting.
+
 4. For internal documentation and processing logic, see:
    - Falcon.API.md
 
@@ -16,25 +20,25 @@ Follow the team coding guide here:
 
 """
 
+import asyncio
 import datetime
 from datetime import datetime, timezone
 import math
+import time
 import traceback
 import json
 import falcon.asgi
 from falcon import WebSocketDisconnected
 from falcon.asgi import Request, WebSocket, Response
-from celery import chain
 import redis 
 from redistimeseries.client import Client as RedisTS
 
 
 
 from Falcon_Celery_Tasks import (
-    process_trade_data,
     process_ticker_data,
-    detect_anomaly,
-    process_candle_data
+    process_candle_data,
+    process_trade_batch
 )
 from Falcon_functions import fetch_coinbase_candles
 from Falcon_utils import train_lstm_from_redis, predict_next_price
@@ -53,6 +57,117 @@ class LoggerMiddleware:
     async def process_resource_ws(self, req: Request, ws: WebSocket, resource, params):
         print(f'[WS] Connection established on {req.path}')
 
+# ------------------------------------------------------------------------------
+# Micro-batching of trades for Celery
+# ------------------------------------------------------------------------------
+class TradeBatcher:
+    """
+    Accumulate trades per platform and send them to Celery in batches.
+
+    A batch is dispatched as one `process_trade_batch` task when it reaches
+    `max_batch_size` trades or when its oldest trade has waited `max_wait_ms`,
+    whichever comes first. This replaces one broker message (and one result)
+    per trade with one per batch.
+
+    `is_overloaded()` is used by the endpoint for backpressure: it is true
+    when too many trades are buffered or being dispatched, or when the
+    Celery queue in the broker is too long.
+    """
+
+    def __init__(self, max_batch_size=500, max_wait_ms=50, max_pending_trades=20000,
+                 max_broker_backlog=200, broker_queue="celery", backlog_check_interval=0.5):
+        """
+        Args:
+            max_batch_size (int): Number of trades of a platform that triggers a dispatch.
+            max_wait_ms (int): Max time a trade waits in the buffer.
+            max_pending_trades (int): Max trades buffered or being dispatched before 429.
+            max_broker_backlog (int): Max tasks waiting in the broker queue before 429.
+            broker_queue (str): Name of the Celery queue (a Redis list) to watch.
+            backlog_check_interval (float): Seconds between two checks of the broker queue.
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending_trades = max_pending_trades
+        self.max_broker_backlog = max_broker_backlog
+        self.broker_queue = broker_queue
+        self.backlog_check_interval = backlog_check_interval
+        self.buffers = {}
+        self.timers = {}
+        self.in_flight = 0
+        self.broker = redis.Redis(host='redis', port=6379, db=0)
+        self._broker_backlog = 0
+        self._last_backlog_check = 0.0
+
+    @property
+    def queue_depth(self):
+        """Number of trades received and not yet handed to the broker."""
+        return sum(len(b) for b in self.buffers.values()) + self.in_flight
+
+    async def broker_backlog(self):
+        """Number of tasks waiting in the broker, refreshed at most every `backlog_check_interval`."""
+        now = time.monotonic()
+        if now - self._last_backlog_check >= self.backlog_check_interval:
+            # Set first, so the concurrent requests don't all refresh it.
+            self._last_backlog_check = now
+            try:
+                # The redis client is synchronous, keep it off the event loop.
+                self._broker_backlog = await asyncio.to_thread(self.broker.llen, self.broker_queue)
+            except redis.RedisError as e:
+                print(f"[batcher] Could not read broker queue length: {e}")
+        return self._broker_backlog
+
+    async def is_overloaded(self):
+        return (self.queue_depth >= self.max_pending_trades
+                or await self.broker_backlog() >= self.max_broker_backlog)
+
+    async def add(self, platform, trades):
+        """Buffer trades of a platform, dispatching full batches right away."""
+        buffer = self.buffers.setdefault(platform, [])
+        buffer.extend(trades)
+        while len(self.buffers.get(platform, [])) >= self.max_batch_size:
+            await self.flush(platform)
+        if self.buffers.get(platform) and platform not in self.timers:
+            self.timers[platform] = asyncio.create_task(self._flush_later(platform))
+
+    async def flush(self, platform):
+        """Dispatch up to `max_batch_size` buffered trades of a platform."""
+        buffer = self.buffers.get(platform, [])
+        batch = buffer[:self.max_batch_size]
+        self.buffers[platform] = buffer[self.max_batch_size:]
+        if not self.buffers[platform]:
+            timer = self.timers.pop(platform, None)
+            if timer is not None and timer is not asyncio.current_task():
+                timer.cancel()
+        if not batch:
+            return
+        self.in_flight += len(batch)
+        try:
+            # apply_async talks to the broker synchronously, keep it off the event loop.
+            await asyncio.to_thread(process_trade_batch.apply_async, args=(batch, platform))
+            print(f"[batcher] Dispatched batch of {len(batch)} {platform} trades")
+        except Exception as e:
+            print(f"[batcher] Failed to dispatch {len(batch)} {platform} trades: {e}")
+        finally:
+            self.in_flight -= len(batch)
+
+    async def flush_all(self):
+        for platform in list(self.buffers):
+            while self.buffers.get(platform):
+                await self.flush(platform)
+
+    async def _flush_later(self, platform):
+        await asyncio.sleep(self.max_wait)
+        self.timers.pop(platform, None)
+        while self.buffers.get(platform):
+            await self.flush(platform)
+
+    # Falcon lifespan hook: don't lose the buffered trades on shutdown.
+    async def process_shutdown(self, scope, event):
+        await self.flush_all()
+
+
+trade_batcher = TradeBatcher()
+
 # ------------------------------------------------------------------------------
 # Live Trade Ingest Resource (WebSocket + POST)
 # ------------------------------------------------------------------------------
@@ -78,9 +193,19 @@ class IngestResource:
 
     async def on_post(self, req: Request, resp: Response, platform: str):
         try:
+            # Backpressure: ask the client to retry instead of queueing without bound.
+            if await trade_batcher.is_overloaded():
+                resp.status = falcon.HTTP_429
+                resp.set_header("Retry-After", "1")
+                resp.media = {"status": "busy", "queue_depth": trade_batcher.queue_depth}
+                return
+
             data = await req.media
             print(f"[POST] /ingest/{platform} received: {data}")
 
+            # Trades are collected here and handed to the batcher at once.
+            trades = []
+
             def route_message(msg):
                 msg_type = msg.get("type", "unknown")
 
@@ -89,10 +214,9 @@ class IngestResource:
                 elif msg_type == "ticker":
                     process_ticker_data.delay(msg, platform)
                 elif msg_type == "trade":
-                    chain(process_trade_data.s(msg, platform), detect_anomaly.s()).apply_async()
+                    trades.append(msg)
                 elif "trades" in msg:
-                    for trade in msg["trades"]:
-                        chain(process_trade_data.s(trade, platform), detect_anomaly.s()).apply_async()
+                    trades.extend(msg["trades"])
                 else:
                     print(f"[{platform}] Unknown message format: {msg}")
 
@@ -102,6 +226,9 @@ class IngestResource:
             else:
                 route_message(data)
 
+            if trades:
+                await trade_batcher.add(platform, trades)
+
             resp.status = falcon.HTTP_202
             resp.media = {"status": "queued"}
 
@@ -444,6 +571,7 @@ class PredictPriceResource_future:
 # Routes and Middleware
 # ------------------------------------------------------------------------------
 app.add_middleware(LoggerMiddleware())
+app.add_middleware(trade_batcher)
 app.add_route('/ingest/{platform}', IngestResource())
 app.add_route('/ingest/kline/{platform}', KlineIngestResource())
 app.add_route('/lstm/train', TrainLSTMResource())
@@ -4,10 +4,14 @@ import numpy as np
 import pickle
 import requests
 import json
+import logging
 from sentence_transformers import SentenceTransformer
 import time
 import concurrent.futures
+import hashlib
 import re
+import sqlite3
+import threading
 
 # Add imports for PDF handling
 try:
@@ -23,6 +27,8 @@ try:
 except ImportError:
     HAS_DOCX = False
 
+logger = logging.getLogger(__name__)
+
 # Any folder name (not full path) in this list will be skipped
 EXCLUDED_DIR_NAMES = {
     'AppData', 'anaconda3', 'node_modules', '__pycache__', 'WindowsNoEditor',
@@ -234,90 +240,253 @@ def embed_text(text, model=None):
         return model.encode(text, normalize_embeddings=True)
 
 # Document indexing
+def _get_cache_prefix(path, cache_dir, mtime=None, size=None):
+    """Cache files of a document, keyed by its path, mtime and size"""
+    if mtime is None:
+        file_stat = os.stat(path)
+        mtime, size = file_stat.st_mtime, file_stat.st_size
+    cache_key = f"{os.path.abspath(path)}_{mtime}_{size}"
+    cache_key = cache_key.replace('\\', '_').replace('/', '_').replace(':', '_')
+    return os.path.join(cache_dir, cache_key)
+
+
+def _load_cached_chunks(path, cache_dir):
+    """
+    Load the cached chunks and embeddings of a document.
+
+    Returns:
+        tuple: (chunks, float32 embeddings), or None on a cache miss
+    """
+    try:
+        prefix = _get_cache_prefix(path, cache_dir)
+        if not os.path.exists(f"{prefix}.npy"):
+            return None
+        with open(f"{prefix}.json", "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        embeddings = np.load(f"{prefix}.npy").astype(np.float32)
+        return chunks, embeddings
+    except Exception as e:
+        print(f"Error loading cache for {path}: {e}")
+        return None
+
+
+def _save_cached_chunks(path, cache_dir, chunks, embeddings):
+    """Cache the chunks as JSON and the embeddings as a float16 .npy file"""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        prefix = _get_cache_prefix(path, cache_dir)
+        with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+            json.dump(chunks, f)
+        # The .npy file is written last: it marks the cache entry as complete.
+        np.save(f"{prefix}.npy", np.asarray(embeddings, dtype=np.float16))
+    except Exception as e:
+        print(f"Error saving to cache for {path}: {e}")
+
+
+def _remove_cached_chunks(path, cache_dir, mtime, size):
+    """Remove the cache files of an old version of a document"""
+    prefix = _get_cache_prefix(path, cache_dir, mtime, size)
+    for suffix in (".npy", ".json"):
+        if os.path.exists(prefix + suffix):
+            os.remove(prefix + suffix)
+
+
+def _hash_file(path):
+    """SHA-256 of the content of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _chunk_metadata(path, chunks):
+    return [{"chunk": chunk, "filename": os.path.basename(path), "path": path} for chunk in chunks]
+
+
+def _extract_chunks(path):
+    """Extract and chunk a document (runs in a worker process)"""
+    try:
+        return path, chunk_text(extract_text(path))
+    except Exception as e:
+        print(f"Error processing {path}: {e}")
+        return path, []
+
+
+def _extract_chunks_and_hash(path):
+    """Extract, chunk and hash a document (runs in a worker process)"""
+    path, chunks = _extract_chunks(path)
+    try:
+        return path, chunks, _hash_file(path)
+    except OSError as e:
+        print(f"Error hashing {path}: {e}")
+        return path, chunks, None
+
+
 def process_document(path, model=None, use_cache=True, cache_dir="index/cache"):
     """
     Process a single document and return a list of (embedding, metadata) tuples,
     one for each chunk.
     """
-    if use_cache and not os.path.exists(cache_dir):
-        os.makedirs(cache_dir, exist_ok=True)
-
-    # Generate cache key
-    cache_key = None
     if use_cache:
-        try:
-            file_stat = os.stat(path)
-            modified_time = file_stat.st_mtime
-            file_size = file_stat.st_size
-            cache_key = f"{os.path.abspath(path)}_{modified_time}_{file_size}"
-            cache_key = cache_key.replace('\\', '_').replace('/', '_').replace(':', '_')
-            cache_file = os.path.join(cache_dir, f"{cache_key}.pkl")
-
-            # Load from cache
-            if os.path.exists(cache_file):
-                try:
-                    with open(cache_file, "rb") as f:
-                        cached_data = pickle.load(f)
-                        print(f"Cache hit for {path}")
-                        return cached_data
-                except Exception as e:
-                    print(f"Error loading cache for {path}: {e}")
-        except Exception as e:
-            print(f"Cache key generation error for {path}: {e}")
+        cached = _load_cached_chunks(path, cache_dir)
+        if cached is not None:
+            print(f"Cache hit for {path}")
+            chunks, embeddings = cached
+            return list(zip(embeddings, _chunk_metadata(path, chunks)))
 
     try:
         if model is None:
             model = get_embedding_model()
 
-        text = extract_text(path)
-        if not text or not text.strip():
-            print(f"No content extracted from {path}")
-            return []
-
-        chunks = chunk_text(text)
+        _, chunks = _extract_chunks(path)
         if not chunks:
             print(f"No chunks generated for {path}")
             return []
 
-        chunk_data = []
-        for chunk in chunks:
-            embedding = model.encode([chunk], normalize_embeddings=True)[0]
-            metadata = {
-                "chunk": chunk,
-                "filename": os.path.basename(path),
-                "path": path
-            }
-            chunk_data.append((embedding, metadata))
-
-        # Save to cache
-        if use_cache and cache_key:
-            try:
-                with open(cache_file, "wb") as f:
-                    pickle.dump(chunk_data, f)
-                print(f"Saved to cache: {cache_file}")
-            except Exception as e:
-                print(f"Error saving to cache for {path}: {e}")
-
-        return chunk_data
+        # All the chunks of the document in one call.
+        embeddings = model.encode(chunks, normalize_embeddings=True)
+        if use_cache:
+            _save_cached_chunks(path, cache_dir, chunks, embeddings)
+        return list(zip(embeddings, _chunk_metadata(path, chunks)))
 
     except Exception as e:
         print(f"Error processing {path}: {e}")
         return []
 
 
+class IncrementalIndexWriter:
+    """
+    Add and remove vectors of a FAISS inner-product index batch by batch.
+
+    The index is an IndexIDMap, so each vector has the id of its chunk in the
+    metadata store and the vectors of a file can be removed when it changes.
+
+    index_type:
+        "flat": exact search (IndexFlatIP)
+        "hnsw": graph index, no training needed (IndexHNSWFlat); it doesn't
+            support removal, so removed vectors stay in the graph as stale
+            vectors until compact() rebuilds it without them
+        "ivf": inverted lists (IndexIVFFlat); the vectors are buffered until
+            there are enough to train the coarse quantizer, and a flat index is
+            used if there never are
+    """
+
+    def __init__(self, dim, index=None, index_type="flat", hnsw_m=32, ivf_nlist=1024, ivf_nprobe=16):
+        self.dim = dim
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self.pending = []
+        self.num_pending = 0
+        self.index = index
+        if self.index is None and index_type != "ivf":
+            self.index = self._create_index(index_type)
+
+    def _create_index(self, index_type):
+        if index_type == "hnsw":
+            base = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        elif index_type == "ivf":
+            quantizer = faiss.IndexFlatIP(self.dim)
+            base = faiss.IndexIVFFlat(quantizer, self.dim, self.ivf_nlist, faiss.METRIC_INNER_PRODUCT)
+            base.nprobe = self.ivf_nprobe
+        else:
+            base = faiss.IndexFlatIP(self.dim)  # cosine-compatible
+        return faiss.IndexIDMap(base)
+
+    def add(self, vectors, ids):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.index is not None:
+            self.index.add_with_ids(vectors, ids)
+            return
+        self.pending.append((vectors, ids))
+        self.num_pending += len(vectors)
+        # FAISS wants ~39 training points per list.
+        if self.num_pending >= 39 * self.ivf_nlist:
+            self.index = self._create_index("ivf")
+            self.index.train(np.vstack([v for v, _ in self.pending]))
+            self._add_pending()
+
+    def remove(self, ids):
+        """Remove the vectors with the given ids, and return the ids of the ones left in the index"""
+        if not len(ids) or self.index is None:
+            return []
+        try:
+            self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+        except RuntimeError:
+            logger.warning("The index doesn't support removal: %d stale vectors are left in it", len(ids))
+            return list(ids)
+        return []
+
+    def compact(self, stale_ids):
+        """
+        Rebuild the index without the vectors with the given ids.
+
+        The kept vectors are read back from the index, so nothing is embedded
+        again, and the new index has the same type and parameters.
+        """
+        ids = faiss.vector_to_array(self.index.id_map)
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        keep = ~np.isin(ids, np.fromiter(stale_ids, dtype=np.int64, count=len(stale_ids)))
+        base = faiss.clone_index(self.index.index)
+        base.reset()
+        index = faiss.IndexIDMap(base)
+        index.add_with_ids(vectors[keep], ids[keep])
+        self.index = index
+
+    def _add_pending(self):
+        if self.pending:
+            self.index.add_with_ids(
+                np.vstack([v for v, _ in self.pending]), np.concatenate([i for _, i in self.pending])
+            )
+            self.pending, self.num_pending = [], 0
+
+    def finish(self):
+        """Return the index, with the buffered vectors added"""
+        if self.index is None:
+            print(f"Only {self.num_pending} vectors, not enough to train an IVF index: using a flat index")
+            self.index = self._create_index("flat")
+        self._add_pending()
+        return self.index
+
+
 def build_document_index(file_paths, index_path="index/faiss_index.bin", metadata_path="index/metadata.pkl",
-                         progress_callback=None, use_parallel=True, max_workers=None):
+                         progress_callback=None, use_parallel=True, max_workers=None,
+                         batch_size=256, index_type="flat", use_cache=True, cache_dir="index/cache",
+                         remove_missing=True, max_stale_fraction=0.2):
     """
-    Build a FAISS vector index from document chunks (not whole documents).
+    Build or update a FAISS vector index from document chunks (not whole documents).
     Each chunk is indexed separately with its own metadata.
 
+    The update is incremental: a manifest of the indexed files (path, mtime,
+    size and content hash) is kept in the metadata store, and only the new,
+    modified and deleted files are processed. The vectors of modified and
+    deleted files are removed from the index, and only the chunks of new and
+    modified files are embedded and added. The indexes that can't remove
+    vectors (HNSW) keep them as stale vectors, which search skips, and are
+    rebuilt without them once they are more than `max_stale_fraction` of the
+    index.
+
+    Text extraction and chunking run in a process pool, while this process
+    embeds the chunks of many files together in batches of `batch_size` and
+    adds them to the index as they are produced, so the model always works
+    on full batches.
+
     Args:
         file_paths: List of file paths to index
         index_path: Path to save the FAISS index
-        metadata_path: Path to save the metadata
+        metadata_path: Path of the metadata; the metadata store is saved next to it
         progress_callback: Optional callback function(progress_float, message)
-        use_parallel: Whether to use parallel processing
-        max_workers: Number of worker threads (None = auto)
+        use_parallel: Whether to extract text in parallel processes
+        max_workers: Number of worker processes (None = auto)
+        batch_size: Number of chunks embedded per model call
+        index_type: "flat", "hnsw" or "ivf" for a new index (see IncrementalIndexWriter)
+        use_cache: Whether to reuse the cached embeddings of unchanged files
+        cache_dir: Directory of the per-file cache
+        remove_missing: Whether to remove the indexed files that are not in file_paths
+        max_stale_fraction: Fraction of stale vectors above which the index is compacted
 
     Returns:
         bool: True if successful
@@ -329,100 +498,169 @@ def build_document_index(file_paths, index_path="index/faiss_index.bin", metadat
 
     print(f"Building index for {len(file_paths)} files")
     model = get_embedding_model()
+    dim = model.get_sentence_embedding_dimension()
 
     os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    store = MetadataStore(get_metadata_store_path(metadata_path))
 
-    # Load existing index and metadata (if any)
+    # Load the existing index (if any)
     existing_index = None
-    existing_metadata = []
-    already_indexed_paths = set()
-
-    if os.path.exists(index_path) and os.path.exists(metadata_path):
+    if os.path.exists(index_path):
         try:
             existing_index = faiss.read_index(index_path)
-            with open(metadata_path, "rb") as f:
-                existing_metadata = pickle.load(f)
-            already_indexed_paths = set(m["path"] for m in existing_metadata)
-            print(f"Found existing index with {len(existing_metadata)} chunks")
         except Exception as e:
-            print(f"Error loading existing index or metadata: {e}")
+            print(f"Error loading existing index: {e}")
+    if existing_index is not None and not isinstance(existing_index, faiss.IndexIDMap):
+        # Built before the manifest existed: its vectors can't be removed by id.
+        print("Rebuilding index from scratch (cached embeddings are reused)")
+        existing_index = None
+    elif existing_index is not None and existing_index.d != dim:
+        print("Embedding dimension changed: rebuilding index from scratch")
+        existing_index = None
+    if existing_index is None:
+        store.clear()
+    else:
+        print(f"Found existing index with {existing_index.ntotal} chunks")
 
-    # Filter new files
-    new_files = [path for path in file_paths if path not in already_indexed_paths]
-    if not new_files:
+    # Compare the files with the manifest
+    manifest = store.get_files()
+    file_paths = list(dict.fromkeys(file_paths))
+    new_files = []
+    changed_paths = []
+    for path in file_paths:
+        entry = manifest.get(path)
+        if entry is None:
+            new_files.append(path)
+            continue
+        try:
+            file_stat = os.stat(path)
+            if (entry["mtime"], entry["size"]) == (file_stat.st_mtime, file_stat.st_size):
+                continue
+            # Only the files whose mtime or size changed are read.
+            digest = _hash_file(path)
+        except OSError as e:
+            print(f"Error accessing file {path}: {e}")
+            continue
+        if digest == entry["hash"]:
+            store.set_file(path, file_stat.st_mtime, file_stat.st_size, digest, entry["num_chunks"])
+        else:
+            changed_paths.append(path)
+    deleted_paths = []
+    if remove_missing:
+        kept_paths = set(file_paths)
+        deleted_paths = [path for path in manifest if path not in kept_paths]
+    if not new_files and not changed_paths and not deleted_paths:
+        store.commit()
+        store.close()
         if progress_callback:
-            progress_callback(1.0, "No new files to index")
+            progress_callback(1.0, "No new or modified files to index")
         return True
+    print(f"Processing {len(new_files)} new, {len(changed_paths)} modified "
+          f"and {len(deleted_paths)} deleted files")
+
+    # Remove the chunks of the modified and deleted files
+    writer = IncrementalIndexWriter(dim, index=existing_index, index_type=index_type)
+    store.add_stale_ids(writer.remove(store.remove_files(changed_paths + deleted_paths)))
+    stale_ids = store.get_stale_ids()
+    if stale_ids and len(stale_ids) > max_stale_fraction * writer.index.ntotal:
+        logger.info("Rebuilding the index without its %d stale vectors", len(stale_ids))
+        writer.compact(stale_ids)
+        store.clear_stale_ids()
+    if use_cache:
+        for path in changed_paths + deleted_paths:
+            _remove_cached_chunks(path, cache_dir, manifest[path]["mtime"], manifest[path]["size"])
 
-    print(f"Processing {len(new_files)} new files")
-    all_embeddings = []
-    all_metadata = []
+    files_to_index = new_files + changed_paths
+    num_completed = 0
+    num_new_chunks = 0
 
     # Progress function
     def update_progress(completed, total):
         if progress_callback:
             progress_callback((completed / total) * 0.9, f"Processed {completed}/{total} files")
 
-    # Process documents (parallel or sequential)
-    if use_parallel and len(new_files) > 1:
-        if not max_workers:
-            max_workers = min(os.cpu_count() or 2, 8)
-        print(f"Using {max_workers} parallel workers")
+    def add_chunks(path, file_stat, digest, chunks, embeddings):
+        nonlocal num_new_chunks
+        if chunks:
+            writer.add(embeddings, store.add_chunks(_chunk_metadata(path, chunks)))
+        # Files without content are recorded too, so they aren't read again.
+        store.set_file(path, file_stat.st_mtime, file_stat.st_size, digest, len(chunks))
+        num_new_chunks += len(chunks)
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(process_document, path, model): path for path in new_files}
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                path = futures[future]
-                try:
-                    chunk_data = future.result()
-                    for emb, meta in chunk_data:
-                        all_embeddings.append(emb)
-                        all_metadata.append(meta)
-                except Exception as e:
-                    print(f"Error processing {path}: {e}")
-                update_progress(i + 1, len(new_files))
-    else:
-        print("Processing files sequentially")
-        for i, path in enumerate(new_files):
-            print(f"Processing {i + 1}/{len(new_files)}: {path}")
-            try:
-                chunk_data = process_document(path, model)
-                for emb, meta in chunk_data:
-                    all_embeddings.append(emb)
-                    all_metadata.append(meta)
-            except Exception as e:
-                print(f"Error processing {path}: {e}")
-            update_progress(i + 1, len(new_files))
-
-    if not all_embeddings:
-        print("No valid embeddings were generated.")
-        if progress_callback:
-            progress_callback(1.0, "No valid content found.")
-        return False
+    # Chunks waiting to be embedded, from one or more files
+    pending_files = []
+    pending_chunks = []
 
-    # Final progress update
-    if progress_callback:
-        progress_callback(0.95, "Building FAISS index")
+    def embed_pending():
+        if not pending_chunks:
+            return
+        embeddings = model.encode(pending_chunks, batch_size=batch_size, normalize_embeddings=True)
+        offset = 0
+        for path, file_stat, digest, chunks in pending_files:
+            file_embeddings = embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
+            if use_cache:
+                _save_cached_chunks(path, cache_dir, chunks, file_embeddings)
+            add_chunks(path, file_stat, digest, chunks, file_embeddings)
+        pending_files.clear()
+        pending_chunks.clear()
 
+    executor = None
     try:
-        embedding_matrix = np.vstack(all_embeddings)
-        dim = embedding_matrix.shape[1]
-        print(f"Creating FAISS index with {embedding_matrix.shape[0]} chunks (dim={dim})")
-
-        if existing_index and existing_index.d == dim:
-            print(f"Appending to existing index (currently has {existing_index.ntotal} vectors)")
-            existing_index.add(embedding_matrix)
-            combined_metadata = existing_metadata + all_metadata
-            faiss.write_index(existing_index, index_path)
-            with open(metadata_path, "wb") as f:
-                pickle.dump(combined_metadata, f)
+        # Files whose embeddings are cached don't need to be chunked at all
+        to_extract = []
+        for path in files_to_index:
+            cached = _load_cached_chunks(path, cache_dir) if use_cache else None
+            if cached is None:
+                to_extract.append(path)
+                continue
+            add_chunks(path, os.stat(path), _hash_file(path), *cached)
+            num_completed += 1
+        if num_completed:
+            print(f"Loaded {num_completed} files from cache")
+            update_progress(num_completed, len(files_to_index))
+
+        if use_parallel and len(to_extract) > 1:
+            if not max_workers:
+                max_workers = min(os.cpu_count() or 2, 8)
+            print(f"Using {max_workers} parallel workers")
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+            # Results come back in order while the workers keep extracting.
+            extracted = executor.map(_extract_chunks_and_hash, to_extract, chunksize=8)
         else:
-            print("Creating new FAISS index")
-            index = faiss.IndexFlatIP(dim)  # cosine-compatible
-            index.add(embedding_matrix)
-            faiss.write_index(index, index_path)
-            with open(metadata_path, "wb") as f:
-                pickle.dump(all_metadata, f)
+            print("Processing files sequentially")
+            extracted = map(_extract_chunks_and_hash, to_extract)
+        for path, chunks, digest in extracted:
+            num_completed += 1
+            update_progress(num_completed, len(files_to_index))
+            try:
+                file_stat = os.stat(path)
+            except OSError as e:
+                print(f"Error accessing file {path}: {e}")
+                continue
+            if not chunks:
+                print(f"No chunks generated for {path}")
+                add_chunks(path, file_stat, digest, [], None)
+                continue
+            pending_files.append((path, file_stat, digest, chunks))
+            pending_chunks.extend(chunks)
+            if len(pending_chunks) >= batch_size:
+                embed_pending()
+        embed_pending()
+
+        # Final progress update
+        if progress_callback:
+            progress_callback(0.95, "Building FAISS index")
+
+        index = writer.finish()
+        print(f"Saving FAISS index with {index.ntotal} chunks (dim={dim}, {num_new_chunks} new)")
+        write_index_atomic(index, index_path)
+        # The metadata is committed only once the index is saved: if the build
+        # is interrupted, the manifest still lists the files to re-index.
+        store.commit()
+        if os.path.exists(metadata_path):
+            # Pickled metadata of the indexes built before the metadata store.
+            os.remove(metadata_path)
 
         if progress_callback:
             progress_callback(1.0, "Index built successfully")
@@ -434,13 +672,321 @@ def build_document_index(file_paths, index_path="index/faiss_index.bin", metadat
         if progress_callback:
             progress_callback(1.0, f"Error: {e}")
         return False
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        store.close()
+
+
+# Metadata store
+def get_metadata_store_path(metadata_path):
+    """SQLite store of the chunk metadata, next to the pickled metadata"""
+    return os.path.join(os.path.dirname(metadata_path), "metadata.db")
+
+
+def write_index_atomic(index, index_path):
+    """
+    Write a FAISS index to a temp file and rename it over the old one.
+
+    A search service may have the old file memory-mapped: the rename keeps
+    its pages valid, while overwriting the file in place would not.
+    """
+    tmp_path = f"{index_path}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+
+
+class MetadataStore:
+    """
+    Chunk metadata and manifest of the indexed files, in SQLite.
+
+    The chunks are keyed by the id of their vector in the FAISS index, so
+    only the rows of the search results are read, and an index update only
+    writes the rows of the files that changed. The ids of the vectors that
+    the index couldn't remove are kept as stale ids. Writes are not committed
+    until commit() is called.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Streamlit runs each script rerun in a new thread.
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id INTEGER PRIMARY KEY, path TEXT, filename TEXT, chunk TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, mtime REAL, size INTEGER, hash TEXT, num_chunks INTEGER)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value INTEGER)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS stale (id INTEGER PRIMARY KEY)")
+
+    def _get_next_id(self):
+        # Ids are never reused: the index may still hold the vectors of
+        # removed chunks (e.g., HNSW can't remove them).
+        row = self.conn.execute("SELECT value FROM info WHERE key = 'next_id'").fetchone()
+        if row is not None:
+            return row[0]
+        row = self.conn.execute("SELECT MAX(id) FROM chunks").fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def add(self, metadata, start_id):
+        """Store the metadata of the chunks with ids start_id, start_id + 1, ..."""
+        rows = [
+            (start_id + i, m.get("path", ""), m.get("filename", ""), m.get("chunk", ""))
+            for i, m in enumerate(metadata)
+        ]
+        with self.lock:
+            # Replace the rows left by an interrupted build.
+            self.conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", rows)
+
+    def add_chunks(self, metadata):
+        """Store the metadata of new chunks and return their ids"""
+        with self.lock:
+            start_id = self._get_next_id()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO info VALUES ('next_id', ?)", (start_id + len(metadata),)
+            )
+        self.add(metadata, start_id)
+        return list(range(start_id, start_id + len(metadata)))
+
+    def get(self, ids):
+        """Return {id: metadata dict} for the given ids"""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT id, path, filename, chunk FROM chunks WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {row[0]: {"path": row[1], "filename": row[2], "chunk": row[3]} for row in rows}
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get_files(self):
+        """Return the manifest as {path: {"mtime", "size", "hash", "num_chunks"}}"""
+        with self.lock:
+            rows = self.conn.execute("SELECT path, mtime, size, hash, num_chunks FROM files").fetchall()
+        return {
+            row[0]: {"mtime": row[1], "size": row[2], "hash": row[3], "num_chunks": row[4]}
+            for row in rows
+        }
+
+    def set_file(self, path, mtime, size, digest, num_chunks):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", (path, mtime, size, digest, num_chunks)
+            )
+
+    def remove_files(self, paths):
+        """Remove files from the manifest with their chunks, and return the ids of the chunks"""
+        ids = []
+        with self.lock:
+            for path in paths:
+                ids.extend(row[0] for row in self.conn.execute("SELECT id FROM chunks WHERE path = ?", (path,)))
+                self.conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+                self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        return ids
+
+    def add_stale_ids(self, ids):
+        """Record the ids of vectors left in the index without a chunk"""
+        with self.lock:
+            self.conn.executemany("INSERT OR IGNORE INTO stale VALUES (?)", [(int(i),) for i in ids])
+
+    def get_stale_ids(self):
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT id FROM stale")}
+
+    def clear_stale_ids(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM stale")
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("DELETE FROM info")
+            self.conn.execute("DELETE FROM stale")
+
+    def close(self):
+        self.conn.close()
+
+
+def get_indexed_files(metadata_path="index/metadata.pkl"):
+    """List the files in the manifest of an index, or in its pickled metadata if it has no manifest yet"""
+    db_path = get_metadata_store_path(metadata_path)
+    if os.path.exists(db_path):
+        store = MetadataStore(db_path)
+        try:
+            files = sorted(store.get_files())
+        finally:
+            store.close()
+        if files or not os.path.exists(metadata_path):
+            return files
+    elif not os.path.exists(metadata_path):
+        return []
+    # Built before the manifest existed: the next update rebuilds it with one.
+    with open(metadata_path, "rb") as f:
+        return sorted({m.get("path", "") for m in pickle.load(f)})
+
 
 # Document search
+class DocumentSearchService:
+    """
+    Keep a FAISS index and its metadata store loaded between queries.
+
+    The index is memory-mapped, so loading it doesn't copy it into memory and
+    the OS shares its pages between processes. Both are reloaded only when the
+    index file changes (build_document_index replaces it on every build), which
+    costs one os.stat per query. A replaced metadata store is closed only once
+    the searches still reading it are done. The stale vectors of the index
+    are filtered out of the results.
+    """
+
+    def __init__(self, index_path="index/faiss_index.bin", metadata_path="index/metadata.pkl"):
+        self.index_path = index_path
+        self.metadata_path = metadata_path
+        self.index = None
+        self.store = None
+        self.stale_ids = set()
+        self.version = None
+        self.lock = threading.Lock()
+        # Metadata store -> number of searches reading it
+        self.readers = {}
+
+    def _get_version(self):
+        stat = os.stat(self.index_path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _load(self, version):
+        try:
+            index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            # Not all the index types can be memory-mapped.
+            index = faiss.read_index(self.index_path)
+        store = MetadataStore(get_metadata_store_path(self.metadata_path))
+        if (not isinstance(index, faiss.IndexIDMap) and store.count() < index.ntotal
+                and os.path.exists(self.metadata_path)):
+            # Index built before the metadata store existed: convert it once.
+            print(f"Converting {self.metadata_path} to {store.db_path}")
+            with open(self.metadata_path, "rb") as f:
+                store.add(pickle.load(f), start_id=0)
+            store.commit()
+        stale_ids = store.get_stale_ids()
+        old_store = self.store
+        self.index, self.store, self.stale_ids, self.version = index, store, stale_ids, version
+        if old_store is not None and old_store not in self.readers:
+            old_store.close()
+        print(f"Loaded index {self.index_path} with {index.ntotal} chunks")
+
+    def ensure_loaded(self):
+        """Load the index and the metadata, or reload them if the index changed"""
+        version = self._get_version()
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self._load(version)
+
+    def _acquire(self):
+        """Return the current index, metadata store and stale ids; the store stays open until _release"""
+        self.ensure_loaded()
+        with self.lock:
+            index, store, stale_ids = self.index, self.store, self.stale_ids
+            self.readers[store] = self.readers.get(store, 0) + 1
+        return index, store, stale_ids
+
+    def _release(self, store):
+        with self.lock:
+            self.readers[store] -= 1
+            if self.readers[store] == 0:
+                del self.readers[store]
+                if store is not self.store:
+                    # Replaced by a reload while it was being read
+                    store.close()
+
+    def search(self, query, top_k=5, threshold=0.1):
+        """Search the chunks most similar to a query (see search_batch)"""
+        return self.search_batch([query], top_k=top_k, threshold=threshold)[0]
+
+    def search_batch(self, queries, top_k=5, threshold=0.1):
+        """
+        Search several queries with one embedding call and one FAISS search.
+
+        Args:
+            queries (list): The search queries
+            top_k (int): Number of top results to return per query
+            threshold (float): Similarity threshold
+
+        Returns:
+            list: One list of result dicts per query
+        """
+        index, store, stale_ids = self._acquire()
+        try:
+            return self._search_batch(index, store, stale_ids, queries, top_k, threshold)
+        finally:
+            self._release(store)
+
+    def _search_batch(self, index, store, stale_ids, queries, top_k, threshold):
+        if not queries or index.ntotal == 0:
+            return [[] for _ in queries]
+        model = get_embedding_model()
+        query_vecs = model.encode(list(queries), normalize_embeddings=True)
+        # Retrieve more results to filter, including the stale vectors
+        expanded_k = min(top_k * 3 + len(stale_ids), index.ntotal)
+        distances, indices = index.search(np.asarray(query_vecs, dtype=np.float32), expanded_k)
+        if stale_ids:
+            indices = np.where(np.isin(indices, list(stale_ids)), -1, indices)
+        # Fetch the metadata of the hits of all the queries at once
+        hits = distances >= threshold
+        metadata = store.get(np.unique(indices[hits & (indices >= 0)]))
+        all_results = []
+        for q in range(len(queries)):
+            results = []
+            for score, idx in zip(distances[q], indices[q]):
+                if idx < 0 or score < threshold or idx not in metadata:
+                    continue
+                entry = metadata[idx]
+                results.append({
+                    "score": float(score),
+                    "filename": entry.get("filename", ""),
+                    "file_path": entry.get("path", ""),
+                    "snippet": entry.get("chunk", "")
+                })
+                if len(results) == top_k:
+                    break
+            all_results.append(results)
+        return all_results
+
+
+_search_services = {}
+_search_services_lock = threading.Lock()
+
+def get_search_service(index_path="index/faiss_index.bin", metadata_path="index/metadata.pkl"):
+    """Get the resident search service of an index"""
+    key = (os.path.abspath(index_path), os.path.abspath(metadata_path))
+    with _search_services_lock:
+        if key not in _search_services:
+            _search_services[key] = DocumentSearchService(index_path, metadata_path)
+        return _search_services[key]
+
 def search_documents(query, top_k=5, index_path="index/faiss_index.bin", metadata_path="index/metadata.pkl", 
                       threshold=0.1):  # Lowered threshold from 0.3 to 0.1
     """
     Search indexed document chunks using semantic similarity.
 
+    The index and metadata stay loaded between calls (see DocumentSearchService).
+
     Args:
         query (str): The user's search query
         top_k (int): Number of top results to return
@@ -452,41 +998,12 @@ def search_documents(query, top_k=5, index_path="index/faiss_index.bin", metadat
         list: A list of result dicts, or a dict with "error"
     """
     try:
-        if not os.path.exists(index_path) or not os.path.exists(metadata_path):
+        has_metadata = os.path.exists(get_metadata_store_path(metadata_path)) or os.path.exists(metadata_path)
+        if not os.path.exists(index_path) or not has_metadata:
             return {"error": "Index not found. Please build the index first."}
 
-        # Load index and metadata
-        index = faiss.read_index(index_path)
-        with open(metadata_path, "rb") as f:
-            metadata = pickle.load(f)
-
-        # Generate query embedding
-        model = get_embedding_model()
-        query_vec = model.encode([query], normalize_embeddings=True)
-
-        # Perform the FAISS search - retrieve more results initially
-        expanded_k = min(top_k * 3, len(metadata))  # Get more results to filter
-        distances, indices = index.search(query_vec, expanded_k)
-
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < 0 or idx >= len(metadata):
-                continue
-
-            similarity_score = float(distances[0][i])
-            if similarity_score < threshold:  # Using the lower threshold parameter
-                continue
-
-            entry = metadata[idx]
-            results.append({
-                "score": similarity_score,
-                "filename": entry.get("filename", ""),
-                "file_path": entry.get("path", ""),
-                "snippet": entry.get("chunk", "")
-            })
-
-        # Return top_k results after filtering
-        return results[:top_k]
+        service = get_search_service(index_path, metadata_path)
+        return service.search(query, top_k=top_k, threshold=threshold)
 
     except Exception as e:
         return {"error": f"Search error: {str(e)}"}
@@ -76,32 +76,14 @@ for searchable_name, searchable in st.session_state['searchables'].items():
     faiss_path = f"{index_path}/faiss_index.bin"
     metadata_path = f"{index_path}/metadata.pkl"
     
-    if os.path.exists(faiss_path) and os.path.exists(metadata_path):
+    # Indexes built before the metadata store only have the pickled metadata
+    has_metadata = os.path.exists(ou.get_metadata_store_path(metadata_path)) or os.path.exists(metadata_path)
+    if os.path.exists(faiss_path) and has_metadata:
         # If index files exist, mark as indexed
         searchable['is_indexed'] = True
         try:
-            # Load metadata to get count
-            import pickle
-            with open(metadata_path, "rb") as f:
-                metadata = pickle.load(f)
-                
-                # Extract file paths based on metadata structure
-                paths = []
-                if isinstance(metadata, list):
-                    for item in metadata:
-                        if isinstance(item, dict):
-                            # Try different possible keys
-                            if 'file_path' in item:
-                                paths.append(item['file_path'])
-                            elif 'path' in item:
-                                paths.append(item['path'])
-                            elif 'filename' in item:
-                                paths.append(item['filename'])
-                            elif 'source' in item:
-                                paths.append(item['source'])
-                
-                # Store file paths for display
-                searchable['indexed_files'] = paths
+            # Store file paths for display
+            searchable['indexed_files'] = ou.get_indexed_files(metadata_path)
         except Exception as e:
             print(f"Error loading metadata for {searchable_name}: {str(e)}")
 
@@ -295,77 +277,82 @@ if 'found_files' in st.session_state:
         # Always show processing options, but with different messaging based on state
         if current_searchable.get('is_indexed', False):
             total_files = len(found_files)
-            indexed_files = len(current_searchable.get('indexed_files', []))
+            indexed_files = set(current_searchable.get('indexed_files', []))
+            num_new_files = len(set(found_files) - indexed_files)
+            num_missing_files = len(indexed_files - set(found_files))
             
-            if indexed_files < total_files:
-                st.info(f"There are {total_files - indexed_files} new files that can be added to make searchable.")
-                if st.button("🔄 Process New Documents", key="update_index_button"):
-                    # Create index directory if it doesn't exist
-                    index_dir = current_searchable.get('index_path', f"index/{selected_searchable.lower().replace(' ', '_')}")
-                    os.makedirs(index_dir, exist_ok=True)
-                    
-                    # Create a placeholder for the progress bar
-                    progress_placeholder = st.empty()
-                    progress_bar = progress_placeholder.progress(0)
-                    
-                    # Create a placeholder for progress message
-                    message_placeholder = st.empty()
-                    message_placeholder.text("Starting to process documents...")
-                    
-                    # Progress callback function
-                    def update_progress(progress, message):
-                        progress_bar.progress(progress)
-                        message_placeholder.text(message)
-                        st.session_state['indexing_progress'] = progress
-                        st.session_state['indexing_message'] = message
-                    
-                    # Call build_document_index with the progress callback
-                    ou.build_document_index(
-                        found_files, 
-                        progress_callback=update_progress,
-                        index_path=f"{index_dir}/faiss_index.bin",
-                        metadata_path=f"{index_dir}/metadata.pkl"
-                    )
-                    current_searchable['indexed_files'] = found_files
-                    st.session_state['indexed_files'] = found_files
-                    st.session_state['indexed_files_count'] = len(found_files)
-                    
-                    # Mark as indexed
-                    current_searchable['is_indexed'] = True
-                    st.session_state['indexing_complete'] = True
-                    
-                    # Increment index version to invalidate cache
-                    st.session_state['index_version'] += 1
-                    
-                    # Save the updated searchable
-                    save_searchables()
-                    
-                    # Keep the final progress state
-                    progress_bar.progress(1.0)
-                    message_placeholder.text("✅ Processing complete!")
-                    
-                    st.success(f"✅ New documents processed! Total files ready for search: {total_files}")
-                    st.balloons()
+            if num_new_files or num_missing_files:
+                st.info(f"There are {num_new_files} new and {num_missing_files} removed files to update in the searchable index.")
             else:
                 st.success(f"✅ All {total_files} files are ready for search!")
+            st.caption("Updating the index also re-processes the modified files.")
+            
+            # The manifest of the index decides which files to (re-)process
+            if st.button("🔄 Update Searchable Documents", key="update_index_button"):
+                # Create index directory if it doesn't exist
+                index_dir = current_searchable.get('index_path', f"index/{selected_searchable.lower().replace(' ', '_')}")
+                os.makedirs(index_dir, exist_ok=True)
                 
-                # Option to rebuild index from scratch
-                if st.button("🔄 Reprocess All Documents", key="rebuild_index_button"):
-                    # Delete existing index files
-                    index_dir = current_searchable.get('index_path', f"index/{selected_searchable.lower().replace(' ', '_')}")
-                    import shutil
-                    try:
-                        shutil.rmtree(index_dir, ignore_errors=True)
-                        os.makedirs(index_dir, exist_ok=True)
-                        current_searchable['is_indexed'] = False
-                        current_searchable['indexed_files'] = []
-                        st.session_state['indexing_complete'] = False
-                        st.session_state['indexed_files_count'] = 0
-                        st.session_state['indexed_files'] = []
-                        save_searchables()
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Error clearing processed files: {str(e)}")
+                # Create a placeholder for the progress bar
+                progress_placeholder = st.empty()
+                progress_bar = progress_placeholder.progress(0)
+                
+                # Create a placeholder for progress message
+                message_placeholder = st.empty()
+                message_placeholder.text("Starting to process documents...")
+                
+                # Progress callback function
+                def update_progress(progress, message):
+                    progress_bar.progress(progress)
+                    message_placeholder.text(message)
+                    st.session_state['indexing_progress'] = progress
+                    st.session_state['indexing_message'] = message
+                
+                # Call build_document_index with the progress callback
+                ou.build_document_index(
+                    found_files, 
+                    progress_callback=update_progress,
+                    index_path=f"{index_dir}/faiss_index.bin",
+                    metadata_path=f"{index_dir}/metadata.pkl"
+                )
+                current_searchable['indexed_files'] = found_files
+                st.session_state['indexed_files'] = found_files
+                st.session_state['indexed_files_count'] = len(found_files)
+                
+                # Mark as indexed
+                current_searchable['is_indexed'] = True
+                st.session_state['indexing_complete'] = True
+                
+                # Increment index version to invalidate cache
+                st.session_state['index_version'] += 1
+                
+                # Save the updated searchable
+                save_searchables()
+                
+                # Keep the final progress state
+                progress_bar.progress(1.0)
+                message_placeholder.text("✅ Processing complete!")
+                
+                st.success(f"✅ Documents updated! Total files ready for search: {total_files}")
+                st.balloons()
+
+            # Option to rebuild index from scratch
+            if st.button("🔄 Reprocess All Documents", key="rebuild_index_button"):
+                # Delete existing index files
+                index_dir = current_searchable.get('index_path', f"index/{selected_searchable.lower().replace(' ', '_')}")
+                import shutil
+                try:
+                    shutil.rmtree(index_dir, ignore_errors=True)
+                    os.makedirs(index_dir, exist_ok=True)
+                    current_searchable['is_indexed'] = False
+                    current_searchable['indexed_files'] = []
+                    st.session_state['indexing_complete'] = False
+                    st.session_state['indexed_files_count'] = 0
+                    st.session_state['indexed_files'] = []
+                    save_searchables()
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error clearing processed files: {str(e)}")
         else:
             # First-time indexing
             confirm = st.checkbox("✅ Confirm to proceed with document processing", key="confirm_processing")
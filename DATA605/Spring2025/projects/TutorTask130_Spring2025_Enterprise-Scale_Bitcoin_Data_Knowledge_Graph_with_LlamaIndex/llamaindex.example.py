@@ -20,7 +20,7 @@ import os
 from llama_index.llms.openai import OpenAI
 from llama_index.core import Settings
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llamaindex_utils import get_neo4j_graph_store
+from llamaindex_utils import get_neo4j_graph_store, PropertyGraphWriter
 from llama_index.core import PropertyGraphIndex
 from llamaindex_utils import LlamaAgents
 from typing import List, Optional, Tuple
@@ -96,34 +96,21 @@ async def ingest_data(td: timedelta):
     ingest_onchain_metrics(td)
     logger.info("Data Ingestion complete...")
 
-# Build Graph Structure with Triplets and batch embed them
-async def generate_and_embed_triplets():
+# Build Graph Structure day by day and write it to Neo4j in batches
+async def stream_triplets_to_graph(window_days: int = 1):
     """
-    Generate and embed triplets
+    Generate, embed and write triplets to the graph store in windows of `window_days` days
     """
     blocks_data = get_raw_block_data()
-    economic_data = get_onchain_metrics()
-    onchain_data = get_economic_indicators()
+    economic_data = get_economic_indicators()
+    onchain_data = get_onchain_metrics()
 
     triplet_generator = TripletGenerator()
-    nodes, relations, text_nodes = triplet_generator.load_and_process_data(blocks_data, economic_data, onchain_data)
-    
-    # Embed nodes
-    node_texts = []
-    for node in nodes:
-        node_texts.append("\n".join([f"{key}: {node.properties[key]}" for key in node.properties.keys()]))
-    
-    node_embeddings = embed_model.get_text_embedding_batch(node_texts)
-    text_embeddings = embed_model.get_text_embedding_batch([text_node.text for text_node in text_nodes])
-    
-    for node, embedding in zip(nodes, node_embeddings):
-        node.embedding = embedding
-    for text_node, embedding in zip(text_nodes, text_embeddings):
-        text_node.embedding = embedding
-    
-    logger.info(f"Generated and embedded {len(nodes)} nodes, {len(relations)} relations")
-    
-    return nodes, relations, text_nodes
+    windows = triplet_generator.stream_process_data(blocks_data, economic_data, onchain_data, window_days=window_days)
+    writer = PropertyGraphWriter(get_neo4j_graph_store(), embed_model=embed_model)
+    counts = await asyncio.to_thread(writer.ingest, windows)
+
+    logger.info(f"Generated and wrote {counts['nodes']} nodes, {counts['relations']} relations")
 
 # Create a new Knowledge Graph
 async def build_knowledge_graph(nodes=None, relations=None, text_nodes=None):
@@ -182,8 +169,8 @@ async def update_knowledge_graph():
     start_time = time.time()
     try:
         await ingest_data(timedelta(days=1))  # Get last day's data
-        nodes, relations, text_nodes = await generate_and_embed_triplets()
-        await build_knowledge_graph(nodes, relations, text_nodes)
+        await stream_triplets_to_graph()
+        await build_knowledge_graph()
         last_update_time = datetime.now()
         LAST_UPDATE.set(last_update_time.timestamp())
         KG_UPDATES.inc()
@@ -234,11 +221,9 @@ async def startup_event():
     logger.info("Performing initial knowledge graph setup...")
     if live:
         await ingest_data(timedelta(days=10))
-        nodes, relations, text_nodes = await generate_and_embed_triplets()
-    else:
-        nodes, relations, text_nodes = None, None, None
+        await stream_triplets_to_graph()
 
-    await build_knowledge_graph(nodes, relations, text_nodes)
+    await build_knowledge_graph()
     last_update_time = datetime.now()
     LAST_UPDATE.set(last_update_time.timestamp())
 
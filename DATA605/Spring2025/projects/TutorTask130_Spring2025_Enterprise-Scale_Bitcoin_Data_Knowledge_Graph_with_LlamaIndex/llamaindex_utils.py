@@ -13,7 +13,8 @@ from connectors.fred import FredApiConnector
 from connectors.bitcoinrpc import BitcoinNodeConnector
 from datetime import timedelta
 from datetime import datetime
-from typing import List, Tuple
+from typing import Any, Dict, Iterable, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import json
 import asyncio
 from IPython.display import display, clear_output
@@ -108,6 +109,87 @@ def get_neo4j_graph_store(username: str = "neo4j", password: str = "llamaindex",
         database=db_name
     )
 
+def get_node_embedding_text(node) -> str:
+    """
+    Returns the text embedded for a graph node, one "key: value" line per property
+    """
+    return "\n".join([f"{key}: {node.properties[key]}" for key in node.properties.keys()])
+
+class PropertyGraphWriter:
+    """
+    Writes nodes, relations and text nodes to a property graph store in batches
+
+    The nodes and text nodes are embedded `embed_batch_size` at a time and each
+    batch is upserted as soon as it is embedded; the Neo4j store writes each
+    upsert call with UNWIND, `batch_size` rows per query at most.
+    """
+
+    def __init__(self, graph_store, embed_model=None, batch_size: int = 1000, embed_batch_size: int = 256):
+        self.graph_store = graph_store
+        # No embeddings are computed without a model
+        self.embed_model = embed_model
+        self.batch_size = batch_size
+        self.embed_batch_size = embed_batch_size
+        self.num_nodes = 0
+        self.num_relations = 0
+        self.num_text_nodes = 0
+
+    def _embed(self, items, texts: List[str]) -> None:
+        if self.embed_model is None or not items:
+            return
+        embeddings = self.embed_model.get_text_embedding_batch(texts)
+        for item, embedding in zip(items, embeddings):
+            item.embedding = embedding
+
+    def write(self, nodes, relations, text_nodes) -> None:
+        """
+        Embed and upsert one set of nodes, relations and text nodes
+
+        The nodes are written first, so that the relations don't create
+        placeholder nodes for their endpoints.
+        """
+        for i in range(0, len(nodes), self.embed_batch_size):
+            batch = nodes[i:i + self.embed_batch_size]
+            self._embed(batch, [get_node_embedding_text(node) for node in batch])
+            self.graph_store.upsert_nodes(batch)
+        for i in range(0, len(relations), self.batch_size):
+            self.graph_store.upsert_relations(relations[i:i + self.batch_size])
+        for i in range(0, len(text_nodes), self.embed_batch_size):
+            batch = text_nodes[i:i + self.embed_batch_size]
+            self._embed(batch, [text_node.text for text_node in batch])
+            self.graph_store.upsert_llama_nodes(batch)
+        self.num_nodes += len(nodes)
+        self.num_relations += len(relations)
+        self.num_text_nodes += len(text_nodes)
+
+    def ingest(self, windows: Iterable[Tuple[List[Any], List[Any], List[Any]]]) -> Dict[str, int]:
+        """
+        Write the (nodes, relations, text nodes) of each window, e.g. from
+        TripletGenerator.stream_process_data
+
+        A window is written in a background thread while the next one is
+        generated. At most one window is being written at a time, so only
+        two windows are in memory.
+
+        Returns:
+            The number of nodes, relations and text nodes written
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = None
+            for num_windows, (nodes, relations, text_nodes) in enumerate(windows, 1):
+                if pending is not None:
+                    # Raises the errors of the previous window
+                    pending.result()
+                pending = executor.submit(self.write, nodes, relations, text_nodes)
+                logger.info(f"Writing window {num_windows}: {len(nodes)} nodes, {len(relations)} relations")
+            if pending is not None:
+                pending.result()
+        return {
+            'nodes': self.num_nodes,
+            'relations': self.num_relations,
+            'text_nodes': self.num_text_nodes
+        }
+
 #####################
 # LlamaIndex Agents #
 
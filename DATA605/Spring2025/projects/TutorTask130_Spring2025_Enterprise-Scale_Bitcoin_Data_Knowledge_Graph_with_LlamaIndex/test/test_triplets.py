@@ -0,0 +1,191 @@
+from datetime import datetime
+from typing import Any, Dict, List, Set, Tuple
+
+import helpers.hunit_test as hunitest
+
+from llamaindex_utils import PropertyGraphWriter
+from utils.triplets import TripletGenerator
+
+
+def _get_timestamp(date_str: str, hour: int) -> int:
+    """
+    Get the local Unix timestamp of an hour of a date.
+    """
+    date_dt = datetime.strptime(date_str, "%Y-%m-%d").replace(hour=hour)
+    return int(date_dt.timestamp())
+
+
+def _get_test_data() -> Tuple[List[Dict[str, Any]], Dict[str, Any], Dict[str, Any]]:
+    """
+    Build 3 blocks over 2 days with the indicators and metrics of those days.
+
+    The indicators and metrics are the ones of the domain-specific
+    relationships, so that all their endpoints exist.
+    """
+    dates = ["2023-11-14", "2023-11-15"]
+    blocks_data = []
+    for height, date_str, hour in [
+        (100, dates[0], 10),
+        (101, dates[0], 11),
+        (102, dates[1], 10),
+    ]:
+        block = {
+            "hash": f"hash{height}",
+            "height": height,
+            "time": _get_timestamp(date_str, hour),
+            "nTx": 1,
+            "tx": [f"tx{height}"],
+        }
+        # The first block has no previous block in the data.
+        if height > 100:
+            block["previousblockhash"] = f"hash{height - 1}"
+        blocks_data.append(block)
+    economic_data = {
+        name: {
+            "values": [
+                {"date": date_str, "value": float(i + 1)}
+                for i, date_str in enumerate(dates)
+            ]
+        }
+        for name in ["federal_funds_rate", "m2_money_supply", "sp500"]
+    }
+    onchain_data = {
+        name: {
+            "values": [
+                {"x": _get_timestamp(date_str, 12), "y": float(i + 1)}
+                for i, date_str in enumerate(dates)
+            ]
+        }
+        for name in [
+            "hash_rate",
+            "transaction_volume_usd",
+            "transaction_volume_btc",
+            "active_addresses",
+        ]
+    }
+    return blocks_data, economic_data, onchain_data
+
+
+class _FakeGraphStore:
+    """
+    Record what a `PropertyGraphWriter` upserts.
+    """
+
+    def __init__(self) -> None:
+        self.node_ids: Set[str] = set()
+        self.relations: List[Any] = []
+        self.missing_endpoints: List[Tuple[str, str, str]] = []
+
+    def upsert_nodes(self, nodes: List[Any]) -> None:
+        self.node_ids.update(node.id for node in nodes)
+
+    def upsert_relations(self, relations: List[Any]) -> None:
+        # The endpoints must have been written before the relations.
+        for relation in relations:
+            for node_id in [relation.source_id, relation.target_id]:
+                if node_id not in self.node_ids:
+                    self.missing_endpoints.append(
+                        (relation.source_id, relation.label, relation.target_id)
+                    )
+        self.relations.extend(relations)
+
+    def upsert_llama_nodes(self, text_nodes: List[Any]) -> None:
+        pass
+
+
+# #############################################################################
+# TestTripletGenerator
+# #############################################################################
+
+
+class TestTripletGenerator(hunitest.TestCase):
+    def test_load_and_process_data1(self) -> None:
+        """
+        Check the number of nodes and relations of the full pipeline.
+        """
+        blocks_data, economic_data, onchain_data = _get_test_data()
+        nodes, relations, text_nodes = TripletGenerator().load_and_process_data(
+            blocks_data, economic_data, onchain_data
+        )
+        # 3 blocks, 3 transactions, 3 indicators with 2 values each,
+        # 4 metrics with 2 values each and 2 days.
+        self.assertEqual(len(nodes), 29)
+        # 8 block relations, 18 indicator relations, 24 metric relations,
+        # 26 + 19 cross-domain relations and 6 domain-specific relations.
+        self.assertEqual(len(relations), 101)
+        self.assertEqual(len(text_nodes), 29 + 101)
+        # All the relations refer to the ids of the nodes.
+        node_ids = {node.id for node in nodes}
+        for relation in relations:
+            self.assertIn(relation.source_id, node_ids)
+            self.assertIn(relation.target_id, node_ids)
+
+    def test_load_and_process_data2(self) -> None:
+        """
+        Check that `aggregate_by_date` links each block to its day.
+        """
+        blocks_data, economic_data, onchain_data = _get_test_data()
+        nodes, relations, _ = TripletGenerator().load_and_process_data(
+            blocks_data, economic_data, onchain_data, aggregate_by_date=True
+        )
+        on_date = sorted(
+            (relation.source_id, relation.target_id)
+            for relation in relations
+            if relation.label == "ON_DATE"
+        )
+        expected = [
+            ("100", "2023-11-14"),
+            ("101", "2023-11-14"),
+            ("102", "2023-11-15"),
+        ]
+        self.assertEqual(on_date, expected)
+        node_ids = {node.id for node in nodes}
+        for relation in relations:
+            self.assertIn(relation.source_id, node_ids)
+            self.assertIn(relation.target_id, node_ids)
+
+
+# #############################################################################
+# TestStreamProcessData
+# #############################################################################
+
+
+class TestStreamProcessData(hunitest.TestCase):
+    def helper(self, aggregate_by_date: bool) -> None:
+        """
+        Stream the test data into a writer and check the written relations.
+        """
+        blocks_data, economic_data, onchain_data = _get_test_data()
+        _, expected_relations, _ = TripletGenerator().load_and_process_data(
+            blocks_data,
+            economic_data,
+            onchain_data,
+            create_embeddings=False,
+            aggregate_by_date=aggregate_by_date,
+        )
+        graph_store = _FakeGraphStore()
+        windows = TripletGenerator().stream_process_data(
+            blocks_data,
+            economic_data,
+            onchain_data,
+            create_embeddings=False,
+            aggregate_by_date=aggregate_by_date,
+        )
+        PropertyGraphWriter(graph_store).ingest(windows)
+        self.assertEqual(graph_store.missing_endpoints, [])
+        # The windows add up to the graph built in memory.
+        actual = sorted(
+            (relation.source_id, relation.label, relation.target_id)
+            for relation in graph_store.relations
+        )
+        expected = sorted(
+            (relation.source_id, relation.label, relation.target_id)
+            for relation in expected_relations
+        )
+        self.assertEqual(actual, expected)
+
+    def test1(self) -> None:
+        self.helper(aggregate_by_date=False)
+
+    def test2(self) -> None:
+        self.helper(aggregate_by_date=True)
@@ -1,9 +1,10 @@
 import json
 import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Any, Tuple, Optional, Set
+from typing import List, Dict, Any, Tuple, Optional, Set, Iterator
 import re
 import logging
+from collections import defaultdict
 from llama_index.core.graph_stores.types import (
     LabelledPropertyGraph,
     LabelledNode,
@@ -27,13 +28,7 @@ class TripletGenerator:
     """
     
     def __init__(self):
-        self.nodes = []  # Will store LabelledNode objects
-        self.relations = []  # Will store Relation objects
-        self.text_nodes = []  # Will store TextNode objects for embedding
-        
-        # Track created entities to avoid duplicates
-        self.created_entity_ids = set()
-        self.created_relation_ids = set()
+        self.reset()
         
         # Define metrics and indicators for convenience
         self.metrics = [
@@ -102,6 +97,32 @@ class TripletGenerator:
             "utxo_set_size": "count"
         }
             
+    def reset(self) -> None:
+        """
+        Drop the generated nodes, relations and text nodes
+        
+        The lists are replaced, not cleared, so the ones already returned stay valid.
+        """
+        self.nodes = []  # Will store LabelledNode objects
+        self.relations = []  # Will store Relation objects
+        self.text_nodes = []  # Will store TextNode objects for embedding
+        
+        # Track created entities to avoid duplicates
+        self.created_entity_ids = set()
+        self.created_relation_ids = set()
+        
+        # Indexes maintained as nodes are created, to avoid scanning self.nodes.
+        # They are keyed by node.id, the id that the relations and the graph
+        # store use, not by the "<label>:<name>" key of created_entity_ids.
+        self.nodes_by_id: Dict[str, LabelledNode] = {}
+        # "<label>:<name>" -> node, to find the existing node of an entity
+        self._nodes_by_entity_id: Dict[str, EntityNode] = {}
+        # (primary label, date) -> ids of the nodes with that label and date
+        self.node_ids_by_label_date: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        # Dates of the nodes, in order of first appearance
+        self.dates: Dict[str, None] = {}
+        self._node_index_keys: Dict[str, Tuple[str, str]] = {}
+    
     def timestamp_to_date(self, timestamp: int) -> str:
         """Convert Unix timestamp to YYYY-MM-DD format"""
         return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
@@ -121,6 +142,15 @@ class TripletGenerator:
             "minute": dt.minute,
             "second": dt.second
         }
+    
+    def get_entity_node_id(self, name: str, primary_label: str) -> str:
+        """
+        Get the id of the node that create_entity_node creates for an entity
+        
+        EntityNode derives its id from the name only, so relations to nodes that
+        are not in memory (e.g., created in an earlier window) use this id.
+        """
+        return EntityNode(name=name, label=primary_label).id
 
     def create_entity_node(
         self, 
@@ -141,17 +171,16 @@ class TripletGenerator:
         if secondary_labels:
             labels.extend(secondary_labels)
             
-        # Create a unique ID based on label and name
+        # Create a unique key based on label and name
         entity_id = f"{primary_label}:{name}"
         
         # Check if this entity already exists
         if entity_id in self.created_entity_ids:
-            # Find the existing node and update its properties
-            for node in self.nodes:
-                if node.id == entity_id:
-                    # Update properties
-                    node.properties.update(properties)
-                    return node
+            # Update the properties of the existing node
+            node = self._nodes_by_entity_id[entity_id]
+            node.properties.update(properties)
+            self._index_node(node)
+            return node
         
         # Create new entity node
         node = EntityNode(
@@ -164,9 +193,41 @@ class TripletGenerator:
         # Add to tracking set
         self.created_entity_ids.add(entity_id)
         self.nodes.append(node)
+        self._nodes_by_entity_id[entity_id] = node
+        self.nodes_by_id[node.id] = node
+        self._index_node(node)
         
         return node
     
+    def _index_node(self, node: LabelledNode) -> None:
+        """
+        Add a node to the (label, date) index, or move it if its date changed
+        """
+        date_str = node.properties.get('date')
+        if date_str is None:
+            return
+        key = (node.label.split(':')[0], date_str)
+        old_key = self._node_index_keys.get(node.id)
+        if old_key == key:
+            return
+        if old_key is not None:
+            self.node_ids_by_label_date[old_key].remove(node.id)
+        self.node_ids_by_label_date[key].append(node.id)
+        self._node_index_keys[node.id] = key
+        self.dates.setdefault(date_str, None)
+    
+    def get_node(self, node_id: str) -> Optional[LabelledNode]:
+        """
+        Get a node by id
+        """
+        return self.nodes_by_id.get(node_id)
+    
+    def get_node_ids(self, label: str, date_str: str) -> List[str]:
+        """
+        Get the ids of the nodes with a primary label and date, in creation order
+        """
+        return self.node_ids_by_label_date.get((label, date_str), [])
+    
     def create_relation(
         self,
         source_id: str,
@@ -350,7 +411,7 @@ class TripletGenerator:
         if 'previousblockhash' in block_data and block_height > 0:
             self.create_relation(
                 source_id=block_entity.id,
-                target_id=f"Block:{block_height-1}",
+                target_id=self.get_entity_node_id(str(block_height - 1), "Block"),
                 label="FOLLOWS",
                 properties={
                     'time_difference': 600,  # Assuming ~10 minutes, can be calculated if timestamp available
@@ -635,7 +696,6 @@ class TripletGenerator:
                 )
                 
                 # Create time-based relationships
-                time_entity_id = f"Time:{date_str}"
                 time_entity = self.create_entity_node(
                     name=date_str,
                     primary_label="Time",
@@ -663,12 +723,19 @@ class TripletGenerator:
                     }
                 )
     
-    def process_onchain_metrics(self, metrics_data: Dict[str, Any]) -> None:
+    def process_onchain_metrics(
+        self,
+        metrics_data: Dict[str, Any],
+        previous_values: Optional[Dict[str, Any]] = None
+    ) -> None:
         """
         Process on-chain metrics data and create corresponding nodes and relations
         
         Args:
             metrics_data: Dictionary of on-chain metric data
+            previous_values: Last value of each metric, read to compute the change
+                of the first value and updated, when the metrics are processed in
+                several calls
         """
         for metric_name, metric_data in metrics_data.items():
             # Skip any error entries
@@ -698,7 +765,7 @@ class TripletGenerator:
             
             # Process each data point
             values = metric_data.get('values', [])
-            previous_value = None
+            previous_value = previous_values.get(metric_name) if previous_values is not None else None
             
             for value_point in values:
                 timestamp = value_point.get('x', 0)
@@ -751,7 +818,6 @@ class TripletGenerator:
                 )
                 
                 # Create time-based relationships
-                time_entity_id = f"Time:{date_str}"
                 time_entity = self.create_entity_node(
                     name=date_str,
                     primary_label="Time",
@@ -778,117 +844,105 @@ class TripletGenerator:
                         'metric_type': metric_name
                     }
                 )
+            
+            if previous_values is not None:
+                previous_values[metric_name] = previous_value
     
-    def create_cross_domain_relationships(self) -> None:
+    def create_cross_domain_relationships(
+        self,
+        max_blocks_per_date: Optional[int] = None,
+        aggregate_by_date: bool = False
+    ) -> None:
         """
         Create relationships between different domains (economic indicators, on-chain metrics, blockchain)
-        """
-        # Map of time entities to their related blocks, indicators, and metrics
-        time_mappings = {}
         
-        # First, collect all time-based entities
-        for node in self.nodes:
-            if 'date' in node.properties:
-                date_str = node.properties['date']
-                
-                if date_str not in time_mappings:
-                    time_mappings[date_str] = {
-                        'blocks': [],
-                        'indicators': [],
-                        'metrics': []
-                    }
-                
-                # Categorize by primary label
-                if node.label.startswith('Block'):
-                    time_mappings[date_str]['blocks'].append(node.id)
-                elif node.label.startswith('IndicatorValue'):
-                    time_mappings[date_str]['indicators'].append(node.id)
-                elif node.label.startswith('MetricValue'):
-                    time_mappings[date_str]['metrics'].append(node.id)
-        
-        # Now create cross-domain relationships for each date
-        for date_str, entities in time_mappings.items():
-            # Connect blocks with indicators on the same day
-            for block_id in entities['blocks']:
-                for indicator_id in entities['indicators']:
-                    # Extract indicator details
-                    indicator_node = None
-                    for node in self.nodes:
-                        if node.id == indicator_id:
-                            indicator_node = node
-                            break
-                    
-                    if indicator_node:
-                        indicator_type = indicator_node.properties.get('indicator', '')
-                        indicator_value = indicator_node.properties.get('value', 0)
-                        
-                        # Create block-to-indicator relationship
+        Nodes are looked up in the (label, date) and id indexes, so the cost is
+        proportional to the number of relations created.
+        
+        Args:
+            max_blocks_per_date: Link only the first blocks of each date to the
+                indicators and metrics of that date (None for all the blocks)
+            aggregate_by_date: Link each block to the Time node of its date
+                (ON_DATE) instead of to every indicator and metric of that date,
+                which are already reachable from the Time node
+        """
+        for date_str in self.dates:
+            block_ids = self.get_node_ids('Block', date_str)
+            indicator_ids = self.get_node_ids('IndicatorValue', date_str)
+            metric_ids = self.get_node_ids('MetricValue', date_str)
+            if max_blocks_per_date is not None:
+                block_ids = block_ids[:max_blocks_per_date]
+            
+            if aggregate_by_date:
+                time_ids = self.get_node_ids('Time', date_str)
+                if (indicator_ids or metric_ids) and time_ids:
+                    for block_id in block_ids:
                         self.create_relation(
                             source_id=block_id,
-                            target_id=indicator_id,
-                            label="HAS_ECONOMIC_CONTEXT",
+                            target_id=time_ids[0],
+                            label="ON_DATE",
                             properties={
-                                'relevance': 1.0,  # Default value, could be calculated
-                                'context_type': indicator_type,
-                                'indicator_value': indicator_value
+                                'indicator_count': len(indicator_ids),
+                                'metric_count': len(metric_ids)
                             }
                         )
+                block_ids = []
+            
+            # Connect blocks with indicators on the same day
+            for block_id in block_ids:
+                for indicator_id in indicator_ids:
+                    indicator_node = self.nodes_by_id[indicator_id]
+                    indicator_type = indicator_node.properties.get('indicator', '')
+                    indicator_value = indicator_node.properties.get('value', 0)
+                    
+                    # Create block-to-indicator relationship
+                    self.create_relation(
+                        source_id=block_id,
+                        target_id=indicator_id,
+                        label="HAS_ECONOMIC_CONTEXT",
+                        properties={
+                            'relevance': 1.0,  # Default value, could be calculated
+                            'context_type': indicator_type,
+                            'indicator_value': indicator_value
+                        }
+                    )
             
             # Connect blocks with metrics on the same day
-            for block_id in entities['blocks']:
-                for metric_id in entities['metrics']:
-                    # Extract metric details
-                    metric_node = None
-                    for node in self.nodes:
-                        if node.id == metric_id:
-                            metric_node = node
-                            break
+            for block_id in block_ids:
+                for metric_id in metric_ids:
+                    metric_node = self.nodes_by_id[metric_id]
+                    metric_value = metric_node.properties.get('value', 0)
                     
-                    if metric_node:
-                        metric_type = metric_node.properties.get('metric', '')
-                        metric_value = metric_node.properties.get('value', 0)
-                        
-                        # Create block-to-metric relationship
-                        self.create_relation(
-                            source_id=block_id,
-                            target_id=metric_id,
-                            label="HAS_METRIC_CONTEXT",
-                            properties={
-                                'relevance': 1.0,  # Default value, could be calculated
-                                'metric_value': metric_value
-                            }
-                        )
+                    # Create block-to-metric relationship
+                    self.create_relation(
+                        source_id=block_id,
+                        target_id=metric_id,
+                        label="HAS_METRIC_CONTEXT",
+                        properties={
+                            'relevance': 1.0,  # Default value, could be calculated
+                            'metric_value': metric_value
+                        }
+                    )
             
             # Connect indicators with metrics on the same day
-            for indicator_id in entities['indicators']:
-                for metric_id in entities['metrics']:
-                    # Extract indicator details
-                    indicator_node = None
-                    metric_node = None
+            for indicator_id in indicator_ids:
+                indicator_node = self.nodes_by_id[indicator_id]
+                for metric_id in metric_ids:
+                    metric_node = self.nodes_by_id[metric_id]
                     
-                    for node in self.nodes:
-                        if node.id == indicator_id:
-                            indicator_node = node
-                        elif node.id == metric_id:
-                            metric_node = node
-                    
-                    if indicator_node and metric_node:
-                        indicator_type = indicator_node.properties.get('indicator', '')
-                        metric_type = metric_node.properties.get('metric', '')
-                        
-                        # Create correlation relationship
-                        self.create_relation(
-                            source_id=indicator_id,
-                            target_id=metric_id,
-                            label="CORRELATES_WITH",
-                            properties={
-                                'correlation': 0.0,  # todo: placeholder to be calculated
-                                'p_value': 0.05,
-                                'time_period': date_str,
-                                'indicator_value': indicator_node.properties.get('value', 0),
-                                'metric_value': metric_node.properties.get('value', 0)
-                            }
-                        )
+                    # Create correlation relationship
+                    self.create_relation(
+                        source_id=indicator_id,
+                        target_id=metric_id,
+                        label="CORRELATES_WITH",
+                        properties={
+                            'correlation': 0.0,  # todo: placeholder to be calculated
+                            'p_value': 0.05,
+                            'time_period': date_str,
+                            'indicator_value': indicator_node.properties.get('value', 0),
+                            'metric_value': metric_node.properties.get('value', 0)
+                        }
+                    )
     
     def create_domain_specific_relationships(self) -> None:
         """
@@ -971,8 +1025,8 @@ class TripletGenerator:
         
         # Create these relationships
         for relationship in influence_relationships:
-            source_id = f"{relationship['source_type']}:{relationship['source_name']}"
-            target_id = f"{relationship['target_type']}:{relationship['target_name']}"
+            source_id = self.get_entity_node_id(relationship['source_name'], relationship['source_type'])
+            target_id = self.get_entity_node_id(relationship['target_name'], relationship['target_type'])
             
             # Add the relationship
             self.create_relation(
@@ -1011,9 +1065,14 @@ class TripletGenerator:
                              blocks_data: Any, 
                              economic_data: Any, 
                              onchain_data: Any,
-                             create_embeddings: bool = True) -> Tuple[List[LabelledNode], List[Relation], List[TextNode]]:
+                             create_embeddings: bool = True,
+                             max_blocks_per_date: Optional[int] = None,
+                             aggregate_by_date: bool = False) -> Tuple[List[LabelledNode], List[Relation], List[TextNode]]:
         """
         Load and process all data to generate property graph nodes and relations
+        
+        `max_blocks_per_date` and `aggregate_by_date` limit the block-to-indicator
+        and block-to-metric fan-out (see create_cross_domain_relationships).
         """
         logger.info("Starting data processing for property graph generation...")
         
@@ -1057,7 +1116,10 @@ class TripletGenerator:
         
         # Create cross-domain relationships
         logger.info("Creating cross-domain relationships...")
-        self.create_cross_domain_relationships()
+        self.create_cross_domain_relationships(
+            max_blocks_per_date=max_blocks_per_date,
+            aggregate_by_date=aggregate_by_date
+        )
         
         # Create domain-specific relationships
         logger.info("Creating domain-specific relationships...")
@@ -1075,6 +1137,130 @@ class TripletGenerator:
         
         return self.nodes, self.relations, self.text_nodes
 
+    def _split_into_windows(self,
+                            blocks_data: Any,
+                            economic_data: Any,
+                            onchain_data: Any,
+                            window_days: int) -> Dict[int, Dict[str, Any]]:
+        """
+        Group blocks, indicator values and metric values by window of `window_days` days
+        """
+        windows = defaultdict(lambda: {
+            'blocks': [],
+            'economic': defaultdict(list),
+            'onchain': defaultdict(list)
+        })
+        
+        if isinstance(blocks_data, dict):
+            blocks_data = [blocks_data]
+        for block in blocks_data or []:
+            block_time = int(block.get('time', 0)) if block else 0
+            if not block_time:
+                # Logged and skipped by process_block_data
+                self.process_block_data(block)
+                continue
+            window = datetime.fromtimestamp(block_time).toordinal() // window_days
+            windows[window]['blocks'].append(block)
+        
+        for indicator_name, indicator_data in (economic_data or {}).items():
+            if 'error' in indicator_data:
+                continue
+            for value_point in indicator_data.get('values', []):
+                try:
+                    date_dt = datetime.strptime(value_point.get('date', ''), '%Y-%m-%d')
+                except ValueError:
+                    logger.warning(f"Invalid date format: {value_point.get('date', '')}")
+                    continue
+                windows[date_dt.toordinal() // window_days]['economic'][indicator_name].append(value_point)
+        
+        for metric_name, metric_data in (onchain_data or {}).items():
+            if 'error' in metric_data:
+                continue
+            for value_point in metric_data.get('values', []):
+                timestamp = value_point.get('x', 0)
+                if not timestamp:
+                    continue
+                window = datetime.fromtimestamp(timestamp).toordinal() // window_days
+                windows[window]['onchain'][metric_name].append(value_point)
+        
+        return windows
+    
+    def stream_process_data(self,
+                            blocks_data: Any,
+                            economic_data: Any,
+                            onchain_data: Any,
+                            window_days: int = 1,
+                            create_embeddings: bool = True,
+                            max_blocks_per_date: Optional[int] = None,
+                            aggregate_by_date: bool = False) -> Iterator[Tuple[List[LabelledNode], List[Relation], List[TextNode]]]:
+        """
+        Process the data window by window, yielding the nodes, relations and text nodes of each window
+        
+        Same graph as load_and_process_data, but only the objects of one window
+        of `window_days` days are in memory at a time, so they can be written to
+        the graph store (see PropertyGraphWriter in llamaindex_utils) while the
+        next window is processed. All the nodes of a date are in the same window,
+        so the cross-domain relationships are complete. Relations to nodes of
+        earlier windows (e.g., FOLLOWS to the previous block) refer to them by id.
+        The domain-specific relationships are yielded last, in a window without nodes.
+        """
+        windows = self._split_into_windows(blocks_data, economic_data, onchain_data, window_days)
+        logger.info(f"Processing data in {len(windows)} windows of {window_days} day(s)...")
+        # Carry the last value of each metric across windows for the change
+        previous_metric_values = {}
+        total_nodes = 0
+        total_relations = 0
+        
+        for window in sorted(windows):
+            self.reset()
+            window_data = windows.pop(window)
+            try:
+                for block in window_data['blocks']:
+                    self.process_block_data(block)
+            except Exception as e:
+                logger.error(f"Error processing blockchain data: {str(e)}", exc_info=True)
+            try:
+                self.process_economic_indicators({
+                    name: {**economic_data[name], 'values': values}
+                    for name, values in window_data['economic'].items()
+                })
+            except Exception as e:
+                logger.error(f"Error processing economic indicators: {str(e)}", exc_info=True)
+            try:
+                self.process_onchain_metrics(
+                    {
+                        name: {**onchain_data[name], 'values': values}
+                        for name, values in window_data['onchain'].items()
+                    },
+                    previous_values=previous_metric_values
+                )
+            except Exception as e:
+                logger.error(f"Error processing on-chain metrics: {str(e)}", exc_info=True)
+            
+            self.create_cross_domain_relationships(
+                max_blocks_per_date=max_blocks_per_date,
+                aggregate_by_date=aggregate_by_date
+            )
+            if create_embeddings:
+                self.generate_text_nodes_for_embedding()
+            
+            total_nodes += len(self.nodes)
+            total_relations += len(self.relations)
+            yield self.nodes, self.relations, self.text_nodes
+        
+        # Relations between the base Indicator and Metric nodes
+        self.reset()
+        self.create_domain_specific_relationships()
+        if create_embeddings:
+            self.generate_text_nodes_for_embedding()
+        total_relations += len(self.relations)
+        yield self.nodes, self.relations, self.text_nodes
+        self.reset()
+        
+        logger.info(f"Streaming property graph generation complete:")
+        logger.info(f"  - {total_nodes} nodes created")
+        logger.info(f"  - {total_relations} relations created")
+
     def get_property_graph_data(self) -> Dict[str, Any]:
         """
         Get all property graph data in a format suitable for KG_NODES_KEY and KG_RELATIONS_KEY
@@ -5,15 +5,15 @@ Handles data collection, processing, and formatting for RAG system with improved
 
 import datetime
 import logging
+import os
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any, Optional, Union, Tuple
 from langchain.schema import Document
 import re
 from dateutil import parser
-from collections import defaultdict
 from sentiment_analyzer import CryptoSentimentAnalyzer
-from technical_indicators import TechnicalIndicators
+from technical_indicators import TechnicalIndicators, IndicatorState
 
 from api import CoinGeckoAPI, NewsAPI
 
@@ -37,6 +37,106 @@ if not logger.handlers:
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+# Directory with the persisted date-price indexes, one pair of .npy files per coin
+DATE_PRICE_LOOKUP_DIR = "date_price_lookup"
+
+
+class DatePriceIndex:
+    """
+    Sorted date -> price index of a coin.
+
+    Dates are stored as int64 days since the epoch and prices as float64, so
+    that exact and nearest-date lookups are a binary search with `np.searchsorted`
+    instead of a scan over date strings.
+    """
+
+    def __init__(self, days: np.ndarray, prices: np.ndarray):
+        """
+        Args:
+            days: Sorted, unique days since 1970-01-01
+            prices: Price on each day
+        """
+        self.days = days
+        self.prices = prices
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, date_col: str = 'date', price_col: str = 'price') -> "DatePriceIndex":
+        """Build the index from a DataFrame without iterating over its rows."""
+        dates = pd.to_datetime(df[date_col], errors='coerce')
+        if isinstance(dates.dtype, pd.DatetimeTZDtype):
+            # Keep the local calendar date, as `strftime` did, not the UTC one
+            dates = dates.dt.tz_localize(None)
+        prices = pd.to_numeric(df[price_col], errors='coerce').to_numpy(dtype=np.float64)
+        valid = dates.notna().to_numpy() & ~np.isnan(prices)
+        days = dates.to_numpy()[valid].astype('datetime64[D]').astype(np.int64)
+        prices = prices[valid]
+        # Stable sort, so that for duplicated days the last row wins as before
+        order = np.argsort(days, kind='stable')
+        days, prices = days[order], prices[order]
+        is_last = np.append(days[1:] != days[:-1], True) if len(days) else np.zeros(0, dtype=bool)
+        return cls(days[is_last], prices[is_last])
+
+    @staticmethod
+    def to_day(date) -> int:
+        """Convert a date, datetime or 'YYYY-MM-DD' string to days since the epoch."""
+        return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64))
+
+    @staticmethod
+    def to_date_str(day: int) -> str:
+        """Convert days since the epoch to a 'YYYY-MM-DD' string."""
+        return str(np.datetime64(int(day), 'D'))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __contains__(self, date) -> bool:
+        return self.get(date) is not None
+
+    def get(self, date, default: Optional[float] = None) -> Optional[float]:
+        """Return the price on a date, or `default` if the date is missing."""
+        day = self.to_day(date)
+        pos = np.searchsorted(self.days, day)
+        if pos < len(self.days) and self.days[pos] == day:
+            return float(self.prices[pos])
+        return default
+
+    def nearest(self, date) -> Optional[Tuple[str, float]]:
+        """
+        Return the closest available date and its price.
+
+        On a tie between the previous and the next day, the previous one is
+        returned.
+        """
+        if len(self.days) == 0:
+            return None
+        day = self.to_day(date)
+        pos = int(np.searchsorted(self.days, day))
+        if pos == len(self.days):
+            pos -= 1
+        elif pos > 0 and day - self.days[pos - 1] <= self.days[pos] - day:
+            pos -= 1
+        return self.to_date_str(self.days[pos]), float(self.prices[pos])
+
+    def date_range(self) -> Optional[Tuple[str, str]]:
+        """Return the first and last available dates."""
+        if len(self.days) == 0:
+            return None
+        return self.to_date_str(self.days[0]), self.to_date_str(self.days[-1])
+
+    def save(self, directory: str, coin: str):
+        """Write the index as `<coin>.days.npy` and `<coin>.prices.npy`."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, f"{coin}.days.npy"), np.asarray(self.days))
+        np.save(os.path.join(directory, f"{coin}.prices.npy"), np.asarray(self.prices))
+
+    @classmethod
+    def load(cls, directory: str, coin: str) -> "DatePriceIndex":
+        """Load an index saved with `save()`, memory-mapping the arrays."""
+        days = np.load(os.path.join(directory, f"{coin}.days.npy"), mmap_mode='r')
+        prices = np.load(os.path.join(directory, f"{coin}.prices.npy"), mmap_mode='r')
+        return cls(days, prices)
+
+
 class CryptoData:
     """Handles collecting and processing cryptocurrency data with enhanced NLP support."""
     
@@ -46,7 +146,7 @@ class CryptoData:
         self.news_data = []
         self.historical_data = {}
         self.last_update = None
-        self.date_price_lookup = {}  # For quick date-to-price lookups
+        self.date_price_lookup: Dict[str, DatePriceIndex] = {}  # For quick date-to-price lookups
         self.coin_aliases = {
             "bitcoin": ["btc", "bitcoin", "xbt"],
              
@@ -66,6 +166,8 @@ class CryptoData:
         # Store sentiment and technical analysis results
         self.sentiment_results = {}
         self.technical_analysis = {}
+        # Running indicator state per coin, for O(1) refreshes on new prices
+        self.indicator_states: Dict[str, IndicatorState] = {}
     
     def normalize_coin_name(self, coin_name: str) -> str:
         """Convert various coin name formats to standard CoinGecko format."""
@@ -118,6 +220,10 @@ class CryptoData:
                 
                 self.update_sentiment_analysis()
                 self.update_technical_analysis(valid_coins)
+                # The daily history ends yesterday: evaluate today's bar at the live price
+                self.refresh_technical_analysis({
+                    coin: self.price_data.get(coin, {}).get('usd') for coin in valid_coins
+                })
                 
                 self.last_update = datetime.datetime.now()
                 logger.info(f"All data updated at {self.last_update}")
@@ -132,24 +238,28 @@ class CryptoData:
             logger.error(traceback.format_exc())
             return False
 
-    def _save_date_price_lookup(self):
+    def _save_date_price_lookup(self, directory: str = DATE_PRICE_LOOKUP_DIR):
         """Save date-price lookup to disk"""
-        import pickle
-        with open("date_price_lookup.pkl", "wb") as f:
-            pickle.dump(self.date_price_lookup, f)
+        for coin, index in self.date_price_lookup.items():
+            index.save(directory, coin)
 
-    def _load_date_price_lookup(self):
-        """Load date-price lookup from disk"""
-        import pickle
-        try:
-            with open("date_price_lookup.pkl", "rb") as f:
-                self.date_price_lookup = pickle.load(f)
-        except FileNotFoundError:
-            self.date_price_lookup = defaultdict(dict)
+    def _load_date_price_lookup(self, directory: str = DATE_PRICE_LOOKUP_DIR):
+        """Load date-price lookup from disk, memory-mapping the arrays"""
+        self.date_price_lookup = {}
+        if not os.path.isdir(directory):
+            return
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith(".days.npy"):
+                continue
+            coin = file_name[:-len(".days.npy")]
+            try:
+                self.date_price_lookup[coin] = DatePriceIndex.load(directory, coin)
+            except Exception as e:
+                logger.error(f"Error loading date-price lookup for {coin}: {str(e)}")
     
     def _build_date_price_lookup(self):
-        """Build a lookup dictionary for quick date-to-price queries."""
-        self.date_price_lookup = defaultdict(dict)
+        """Build a sorted date-price index per coin for quick date-to-price queries."""
+        self.date_price_lookup = {}
         
         for coin, df in self.historical_data.items():
             if df is None or df.empty:
@@ -157,7 +267,7 @@ class CryptoData:
                 continue
                 
             try:
-                # Ensure date column exists and is in datetime format
+                # Ensure date column exists
                 if 'date' not in df.columns:
                     logger.warning(f"No 'date' column in data for {coin}")
                     logger.warning(f"Available columns: {df.columns.tolist()}")
@@ -174,26 +284,13 @@ class CryptoData:
                     logger.warning(f"No 'price' or 'close' column in data for {coin}")
                     continue
                     
-                # Log the date range being processed
-                min_date = df['date'].min()
-                max_date = df['date'].max()
-                logger.info(f"Building date-price lookup for {coin} from {min_date} to {max_date}")
-                
-                # Build the lookup dictionary with proper error handling
-                count = 0
-                for _, row in df.iterrows():
-                    try:
-                        # Fix: Handle DataFrame index and date conversion properly
-                        if isinstance(row['date'], pd.Timestamp):
-                            date_str = row['date'].strftime('%Y-%m-%d')
-                        else:
-                            date_str = pd.to_datetime(row['date']).strftime('%Y-%m-%d')
-                        self.date_price_lookup[coin][date_str] = float(row['price'])
-                        count += 1
-                    except Exception as e:
-                        logger.error(f"Error processing row {_} for {coin}: {str(e)}")
-                        
-                logger.info(f"Added {count} date-price entries for {coin}")
+                index = DatePriceIndex.from_frame(df)
+                if len(index) == 0:
+                    logger.warning(f"No valid date-price entries for {coin}")
+                    continue
+                self.date_price_lookup[coin] = index
+                min_date, max_date = index.date_range()
+                logger.info(f"Added {len(index)} date-price entries for {coin} from {min_date} to {max_date}")
             except Exception as e:
                 logger.error(f"Error building date-price lookup for {coin}: {str(e)}")
                 logger.error(f"Available columns: {df.columns.tolist()}")
@@ -221,31 +318,21 @@ class CryptoData:
                 except Exception as e:
                     logger.error(f"Could not parse date: {date_str}, error: {str(e)}")
                     return None
-                    
-            formatted_date_str = target_date.strftime('%Y-%m-%d')
             
             # Log what we're looking for
-            logger.debug(f"Looking up price for {coin} on {formatted_date_str}")
+            logger.debug(f"Looking up price for {coin} on {target_date.strftime('%Y-%m-%d')}")
             
+            index = self.date_price_lookup[coin]
             # Direct match
-            if formatted_date_str in self.date_price_lookup[coin]:
-                price = self.date_price_lookup[coin][formatted_date_str]
+            price = index.get(target_date)
+            if price is not None:
                 return price
                 
             # Find closest available date if no direct match
-            available_dates = sorted(
-                datetime.datetime.strptime(d, "%Y-%m-%d").date()
-                for d in self.date_price_lookup[coin].keys()
-            )
-            
-            if not available_dates:
+            closest = index.nearest(target_date)
+            if closest is None:
                 return None
-                
-            target_date_only = target_date.date()
-            closest_date = min(available_dates, key=lambda d: abs(d - target_date_only))
-            closest_date_str = closest_date.strftime("%Y-%m-%d")
-            
-            return self.date_price_lookup[coin].get(closest_date_str)
+            return closest[1]
             
         except Exception as e:
             logger.error(f"Error in date fallback for {coin} on {date_str}: {str(e)}")
@@ -879,15 +966,15 @@ class CryptoData:
                         else:
                             # Add information about what dates are available
                             if coin in self.date_price_lookup:
-                                dates = list(self.date_price_lookup[coin].keys())
-                                if dates:
+                                index = self.date_price_lookup[coin]
+                                if len(index):
                                     # Try nearby dates as fallback
                                     nearby_date = parser.parse(formatted_date)
                                     for offset in [1, 2, -1, -2]:
                                         test_date = nearby_date + datetime.timedelta(days=offset)
                                         test_date_str = test_date.strftime('%Y-%m-%d')
-                                        if test_date_str in self.date_price_lookup[coin]:
-                                            fallback_price = self.date_price_lookup[coin][test_date_str]
+                                        fallback_price = index.get(test_date)
+                                        if fallback_price is not None:
                                             return True, f"I don't have data specifically for {formatted_date}, but on {test_date_str}, the Bitcoin price was ${fallback_price:.2f}."
                             
                             return True, f"I couldn't find the price of {coin} on {formatted_date}. The data might not be available for that specific date."
@@ -1188,14 +1275,9 @@ class CryptoData:
                     
                 logger.info(f"Performing technical analysis for {coin}")
                 
-                # Calculate indicators
-                df_with_indicators = df.copy()
-                df_with_indicators = self.technical_indicators.calculate_rsi(df_with_indicators)
-                df_with_indicators = self.technical_indicators.calculate_macd(df_with_indicators)
-                df_with_indicators = self.technical_indicators.calculate_bollinger_bands(df_with_indicators)
-                
-                # Generate signals
-                df_with_indicators = self.technical_indicators.generate_signals(df_with_indicators)
+                # Calculate indicators and signals in one pass, which also
+                # seeds the running state used by refresh_technical_analysis
+                df_with_indicators, state = self.technical_indicators.calculate_all_with_state(df)
                 
                 # Store the enhanced dataframe
                 self.historical_data[coin] = df_with_indicators
@@ -1203,6 +1285,7 @@ class CryptoData:
                 # Generate analysis summary
                 analysis = self.technical_indicators.analyze_historical_data(df_with_indicators)
                 self.technical_analysis[coin] = analysis
+                self.indicator_states[coin] = state
                 
                 logger.info(f"Technical analysis complete for {coin}: {analysis['signal']}")
             
@@ -1211,6 +1294,27 @@ class CryptoData:
             logger.error(f"Error updating technical analysis: {str(e)}")
             return False
 
+    def refresh_technical_analysis(self, prices: Dict[str, float]):
+        """
+        Refresh the technical analysis of coins with their live prices.
+        
+        The live price is treated as the close of the current bar, so the daily
+        indicators are not changed; each refresh is O(1) per coin.
+        
+        Args:
+            prices: Coin -> live price
+        """
+        for coin, price in prices.items():
+            coin = self.normalize_coin_name(coin)
+            state = self.indicator_states.get(coin)
+            if state is None or price is None:
+                continue
+            analysis = self.technical_indicators.analyze_state(state, price)
+            previous = self.technical_analysis.get(coin, {})
+            analysis["timestamp"] = previous.get("timestamp")
+            analysis["macd_histogram_prev"] = state.current.get('macd_histogram')
+            self.technical_analysis[coin] = analysis
+
     def get_sentiment_summary(self) -> str:
         """Get a summary of current market sentiment."""
         if not hasattr(self, 'sentiment_results') or not self.sentiment_results:
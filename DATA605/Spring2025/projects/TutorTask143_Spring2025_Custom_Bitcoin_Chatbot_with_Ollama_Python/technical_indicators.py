@@ -1,8 +1,13 @@
 """
 Technical indicators module for cryptocurrency analysis.
 Implements common technical indicators like RSI, MACD, etc.
+
+All the indicators and signals of a price series are computed in one pass over
+NumPy arrays by `compute_indicators`. `IndicatorState` keeps the running
+averages of a series so that a new bar updates the indicators in O(1).
 """
 
+import collections
 import pandas as pd
 import numpy as np
 import logging
@@ -10,258 +15,563 @@ from typing import Dict, List, Optional, Union, Tuple, Any
 
 logger = logging.getLogger(__name__)
 
+# Default indicator parameters
+RSI_PERIOD = 14
+MACD_FAST_PERIOD = 12
+MACD_SLOW_PERIOD = 26
+MACD_SIGNAL_PERIOD = 9
+BB_PERIOD = 20
+BB_STD_DEV = 2.0
+
+# Columns added to a DataFrame by `TechnicalIndicators.calculate_all`
+INDICATOR_COLUMNS = ['rsi', 'macd_line', 'macd_signal', 'macd_histogram',
+                     'bb_middle', 'bb_upper', 'bb_lower']
+SIGNAL_COLUMNS = ['rsi_signal', 'macd_cross', 'macd_signal_action', 'signal']
+
+
+def _ema(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponential moving average seeded with the first value (pandas' compiled kernel)."""
+    return pd.Series(values, dtype=np.float64).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _wilder_averages(prices: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wilder's smoothed average gain and loss of a price series.
+
+    The first average (at index `period`) is the mean of the first `period`
+    changes; the following ones are smoothed with alpha = 1 / period.
+    """
+    avg_gain = np.full(len(prices), np.nan)
+    avg_loss = np.full(len(prices), np.nan)
+    if len(prices) < period + 1:
+        return avg_gain, avg_loss
+    changes = np.diff(prices)
+    gains = np.clip(changes, 0, None)
+    losses = np.clip(-changes, 0, None)
+    avg_gain[period:] = _ema(np.r_[gains[:period].mean(), gains[period:]], 1 / period)
+    avg_loss[period:] = _ema(np.r_[losses[:period].mean(), losses[period:]], 1 / period)
+    return avg_gain, avg_loss
+
+
+def _rsi(avg_gain, avg_loss):
+    """RSI from the average gain and loss, equal to 100 - 100 / (1 + RS)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 * avg_gain / (avg_gain + avg_loss)
+
+
+def _rsi_signal(rsi):
+    """'buy' when oversold, 'sell' when overbought, 'hold' otherwise (None for NaN)."""
+    rsi = np.asarray(rsi, dtype=np.float64)
+    return np.select([rsi < 30, rsi > 70, rsi <= 70], ['buy', 'sell', 'hold'], default=None)
+
+
+def _macd_cross(macd_line: np.ndarray, macd_signal: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Last MACD crossover at each bar and the corresponding action.
+
+    A crossover ('bullish' or 'bearish') is carried forward until the next one.
+    """
+    n = len(macd_line)
+    prev_line = np.r_[np.nan, macd_line[:-1]]
+    prev_signal = np.r_[np.nan, macd_signal[:-1]]
+    bullish = (macd_line > macd_signal) & (prev_line <= prev_signal)
+    bearish = (macd_line < macd_signal) & (prev_line >= prev_signal)
+    # Index of the last crossover at each bar, -1 before the first one
+    cross_idx = np.maximum.accumulate(np.where(bullish | bearish, np.arange(n), -1)) if n else np.zeros(0, dtype=int)
+    labels = np.where(bullish, 'bullish', 'bearish').astype(object)
+    macd_cross = np.where(cross_idx >= 0, labels[np.maximum(cross_idx, 0)] if n else labels, None)
+    macd_action = np.select([macd_cross == 'bullish', macd_cross == 'bearish'],
+                            ['buy', 'sell'], default='hold').astype(object)
+    return macd_cross, macd_action
+
+
+def _combine_signals(rsi_signal, macd_action):
+    """Combine the RSI and MACD signals, strong signals taking precedence."""
+    rsi_signal = np.asarray(rsi_signal, dtype=object)
+    macd_action = np.asarray(macd_action, dtype=object)
+    rsi_buy, rsi_sell = rsi_signal == 'buy', rsi_signal == 'sell'
+    macd_buy, macd_sell = macd_action == 'buy', macd_action == 'sell'
+    conditions = [
+        # Both RSI and MACD agree
+        rsi_buy & macd_buy,
+        rsi_sell & macd_sell,
+        # Either suggests buying (or selling) and the other does not disagree
+        (rsi_buy & ~macd_sell) | (macd_buy & ~rsi_sell),
+        (rsi_sell & ~macd_buy) | (macd_sell & ~rsi_buy),
+    ]
+    return np.select(conditions, ['strong_buy', 'strong_sell', 'buy', 'sell'], default='hold')
+
+
+def compute_indicators(prices: Union[np.ndarray, pd.Series, List[float]],
+                       rsi_period: int = RSI_PERIOD,
+                       fast_period: int = MACD_FAST_PERIOD,
+                       slow_period: int = MACD_SLOW_PERIOD,
+                       signal_period: int = MACD_SIGNAL_PERIOD,
+                       bb_period: int = BB_PERIOD,
+                       bb_std_dev: float = BB_STD_DEV) -> Dict[str, np.ndarray]:
+    """
+    Compute RSI (Wilder), MACD, Bollinger Bands and signals of a price series.
+
+    See `_compute_indicators` for the arguments.
+
+    Returns:
+        Dictionary of column name -> array aligned with the prices; indicators
+        are NaN where there is not enough history
+    """
+    return _compute_indicators(prices, rsi_period, fast_period, slow_period,
+                               signal_period, bb_period, bb_std_dev)[0]
+
+
+def _compute_indicators(prices: Union[np.ndarray, pd.Series, List[float]],
+                        rsi_period: int = RSI_PERIOD,
+                        fast_period: int = MACD_FAST_PERIOD,
+                        slow_period: int = MACD_SLOW_PERIOD,
+                        signal_period: int = MACD_SIGNAL_PERIOD,
+                        bb_period: int = BB_PERIOD,
+                        bb_std_dev: float = BB_STD_DEV) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Compute the indicators of a price series and the running averages behind them.
+
+    Args:
+        prices: Prices in chronological order
+        rsi_period: RSI period
+        fast_period: Fast EMA period of the MACD
+        slow_period: Slow EMA period of the MACD
+        signal_period: Signal line period of the MACD
+        bb_period: Moving average period of the Bollinger Bands
+        bb_std_dev: Number of standard deviations of the Bollinger Bands
+
+    Returns:
+        Tuple of the indicators (column name -> array aligned with the prices,
+        NaN where there is not enough history) and the running averages used
+        to seed an `IndicatorState` (Wilder averages, EMAs and the MACD tracked
+        from the first bar)
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    n = len(prices)
+
+    # RSI
+    avg_gain, avg_loss = _wilder_averages(prices, rsi_period)
+    rsi = _rsi(avg_gain, avg_loss)
+
+    # MACD, tracked from the first bar and reported once there is enough history
+    ema_fast = _ema(prices, 2 / (fast_period + 1))
+    ema_slow = _ema(prices, 2 / (slow_period + 1))
+    running_macd_line = ema_fast - ema_slow
+    running_macd_signal = _ema(running_macd_line, 2 / (signal_period + 1))
+    if n >= slow_period + signal_period:
+        macd_line = running_macd_line
+        macd_signal = running_macd_signal
+    else:
+        macd_line = np.full(n, np.nan)
+        macd_signal = np.full(n, np.nan)
+
+    # Bollinger Bands
+    bb_middle = np.full(n, np.nan)
+    bb_std = np.full(n, np.nan)
+    if n >= bb_period:
+        windows = np.lib.stride_tricks.sliding_window_view(prices, bb_period)
+        bb_middle[bb_period - 1:] = windows.mean(axis=1)
+        bb_std[bb_period - 1:] = windows.std(axis=1, ddof=1)
+
+    macd_cross, macd_action = _macd_cross(macd_line, macd_signal)
+    rsi_signal = _rsi_signal(rsi)
+
+    running = {
+        'avg_gain': avg_gain,
+        'avg_loss': avg_loss,
+        'ema_fast': ema_fast,
+        'ema_slow': ema_slow,
+        'macd_line': running_macd_line,
+        'macd_signal': running_macd_signal,
+    }
+    return {
+        'rsi': rsi,
+        'macd_line': macd_line,
+        'macd_signal': macd_signal,
+        'macd_histogram': macd_line - macd_signal,
+        'bb_middle': bb_middle,
+        'bb_upper': bb_middle + bb_std * bb_std_dev,
+        'bb_lower': bb_middle - bb_std * bb_std_dev,
+        'rsi_signal': rsi_signal,
+        'macd_cross': macd_cross,
+        'macd_signal_action': macd_action,
+        'signal': _combine_signals(rsi_signal, macd_action),
+    }, running
+
+
+def summarize_indicators(current: Dict[str, Any], price: Optional[float]) -> Dict[str, str]:
+    """Derive the market condition, trend and volatility from the latest indicators."""
+    rsi = current.get('rsi')
+    market_condition = "neutral"
+    if rsi is not None and rsi < 30:
+        market_condition = "oversold"
+    elif rsi is not None and rsi > 70:
+        market_condition = "overbought"
+
+    # Determine trend based on MACD
+    trend = "sideways"
+    macd_line, macd_signal = current.get('macd_line'), current.get('macd_signal')
+    if macd_line is not None and macd_signal is not None:
+        if macd_line > macd_signal and macd_line > 0:
+            trend = "bullish"
+        elif macd_line < macd_signal and macd_line < 0:
+            trend = "bearish"
+
+    # Check if price is near Bollinger Bands
+    volatility_condition = "normal"
+    upper, lower = current.get('bb_upper'), current.get('bb_lower')
+    if price is not None and upper is not None and lower is not None:
+        if price > upper * 0.95:  # Within 5% of upper band
+            volatility_condition = "high_volatility_upper"
+        elif price < lower * 1.05:  # Within 5% of lower band
+            volatility_condition = "high_volatility_lower"
+
+    return {"market_condition": market_condition, "trend": trend, "volatility": volatility_condition}
+
+
+class IndicatorState:
+    """
+    Running state of the indicators of one price series.
+
+    Usage:
+        state = IndicatorState.from_prices(df['price'])
+        state.update(new_close)     # A new bar: O(1)
+        state.preview(live_price)   # Indicators if the bar closed now, without updating
+    """
+
+    def __init__(self, rsi_period: int = RSI_PERIOD, fast_period: int = MACD_FAST_PERIOD,
+                 slow_period: int = MACD_SLOW_PERIOD, signal_period: int = MACD_SIGNAL_PERIOD,
+                 bb_period: int = BB_PERIOD, bb_std_dev: float = BB_STD_DEV):
+        self.rsi_period = rsi_period
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.signal_period = signal_period
+        self.bb_period = bb_period
+        self.bb_std_dev = bb_std_dev
+        self.count = 0
+        self.last_price = np.nan
+        # Sums of the first RSI changes, until the Wilder averages are seeded
+        self.sum_gain = 0.0
+        self.sum_loss = 0.0
+        self.avg_gain = np.nan
+        self.avg_loss = np.nan
+        self.ema_fast = np.nan
+        self.ema_slow = np.nan
+        self.macd_signal = np.nan
+        self.macd_line = np.nan
+        self.macd_cross = None
+        self.window = collections.deque(maxlen=bb_period)
+        self.current: Dict[str, Any] = {}
+
+    @classmethod
+    def from_prices(cls, prices, **params) -> "IndicatorState":
+        """Initialize the state from a price history, vectorially."""
+        state = cls(**params)
+        prices = np.asarray(prices, dtype=np.float64)
+        values, running = _compute_indicators(prices, state.rsi_period, state.fast_period, state.slow_period,
+                                              state.signal_period, state.bb_period, state.bb_std_dev)
+        state._seed(prices, values, running)
+        return state
+
+    def _seed(self, prices: np.ndarray, values: Dict[str, np.ndarray], running: Dict[str, np.ndarray]) -> None:
+        """Set the state from the output of `_compute_indicators` on `prices`."""
+        n = len(prices)
+        if n == 0:
+            return
+        self.count = n
+        self.last_price = prices[-1]
+        if n > self.rsi_period:
+            self.avg_gain, self.avg_loss = running['avg_gain'][-1], running['avg_loss'][-1]
+        else:
+            changes = np.diff(prices)
+            self.sum_gain = float(np.clip(changes, 0, None).sum())
+            self.sum_loss = float(np.clip(-changes, 0, None).sum())
+        # The MACD is tracked from the first bar even when it is not reported yet
+        self.ema_fast, self.ema_slow = running['ema_fast'][-1], running['ema_slow'][-1]
+        self.macd_line, self.macd_signal = running['macd_line'][-1], running['macd_signal'][-1]
+        if n >= self.slow_period + self.signal_period:
+            self.macd_cross = values['macd_cross'][-1]
+        else:
+            self.macd_cross = _macd_cross(running['macd_line'], running['macd_signal'])[0][-1]
+        self.window.extend(prices[-self.bb_period:])
+        self.current = {key: self._to_scalar(array[-1]) for key, array in values.items()}
+        self.current['price'] = float(prices[-1])
+
+    def update(self, price: float) -> Dict[str, Any]:
+        """Add a new bar and return the latest indicators."""
+        new_state = self._step(price)
+        self.__dict__.update(new_state)
+        return self.current
+
+    def preview(self, price: float) -> Dict[str, Any]:
+        """Return the indicators if a bar closed at `price`, without changing the state."""
+        return self._step(price)['current']
+
+    def _step(self, price: float) -> Dict[str, Any]:
+        price = float(price)
+        count = self.count + 1
+        sum_gain, sum_loss = self.sum_gain, self.sum_loss
+        avg_gain, avg_loss = self.avg_gain, self.avg_loss
+        if count > 1:
+            change = price - self.last_price
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            if count <= self.rsi_period:
+                sum_gain, sum_loss = sum_gain + gain, sum_loss + loss
+            elif count == self.rsi_period + 1:
+                avg_gain = (sum_gain + gain) / self.rsi_period
+                avg_loss = (sum_loss + loss) / self.rsi_period
+            else:
+                avg_gain += (gain - avg_gain) / self.rsi_period
+                avg_loss += (loss - avg_loss) / self.rsi_period
+        rsi = float(_rsi(avg_gain, avg_loss))
+
+        # MACD
+        if count == 1:
+            ema_fast = ema_slow = price
+        else:
+            ema_fast = self.ema_fast + 2 / (self.fast_period + 1) * (price - self.ema_fast)
+            ema_slow = self.ema_slow + 2 / (self.slow_period + 1) * (price - self.ema_slow)
+        macd_line = ema_fast - ema_slow
+        if count == 1:
+            macd_signal = macd_line
+        else:
+            macd_signal = self.macd_signal + 2 / (self.signal_period + 1) * (macd_line - self.macd_signal)
+        has_macd = count >= self.slow_period + self.signal_period
+        macd_cross = self.macd_cross
+        if count > 1:
+            if macd_line > macd_signal and self.macd_line <= self.macd_signal:
+                macd_cross = 'bullish'
+            elif macd_line < macd_signal and self.macd_line >= self.macd_signal:
+                macd_cross = 'bearish'
+
+        # Bollinger Bands over the last `bb_period` prices
+        window = collections.deque(self.window, maxlen=self.bb_period)
+        window.append(price)
+        bb_middle = bb_upper = bb_lower = np.nan
+        if len(window) == self.bb_period:
+            values = np.fromiter(window, dtype=np.float64, count=self.bb_period)
+            bb_middle = values.mean()
+            bb_std = values.std(ddof=1)
+            bb_upper = bb_middle + bb_std * self.bb_std_dev
+            bb_lower = bb_middle - bb_std * self.bb_std_dev
+
+        rsi_signal = self._to_scalar(_rsi_signal(rsi)[()])
+        macd_action = {'bullish': 'buy', 'bearish': 'sell'}.get(macd_cross, 'hold') if has_macd else 'hold'
+        nan = float('nan')
+        current = {
+            'price': price,
+            'rsi': rsi,
+            'macd_line': macd_line if has_macd else nan,
+            'macd_signal': macd_signal if has_macd else nan,
+            'macd_histogram': macd_line - macd_signal if has_macd else nan,
+            'bb_middle': bb_middle,
+            'bb_upper': bb_upper,
+            'bb_lower': bb_lower,
+            'rsi_signal': rsi_signal,
+            'macd_cross': macd_cross if has_macd else None,
+            'macd_signal_action': macd_action,
+            'signal': str(_combine_signals(rsi_signal, macd_action)[()]),
+        }
+        return {
+            'count': count, 'last_price': price, 'sum_gain': sum_gain, 'sum_loss': sum_loss,
+            'avg_gain': avg_gain, 'avg_loss': avg_loss, 'ema_fast': ema_fast, 'ema_slow': ema_slow,
+            'macd_line': macd_line, 'macd_signal': macd_signal, 'macd_cross': macd_cross,
+            'window': window, 'current': current,
+        }
+
+    @staticmethod
+    def _to_scalar(value):
+        return value.item() if isinstance(value, np.generic) else value
+
+
 class TechnicalIndicators:
     """Implements technical indicators for cryptocurrency analysis."""
-    
+
+    @staticmethod
+    def calculate_all(data: pd.DataFrame, price_col: str = 'price', **params) -> pd.DataFrame:
+        """
+        Calculate RSI, MACD, Bollinger Bands and signals in a single pass.
+
+        Args:
+            data: DataFrame with price data
+            price_col: Column name containing price data
+            params: Indicator parameters passed to `compute_indicators`
+
+        Returns:
+            Copy of the DataFrame with the indicator and signal columns added
+        """
+        values = compute_indicators(data[price_col].to_numpy(dtype=np.float64), **params)
+        return data.assign(**values)
+
+    @staticmethod
+    def calculate_all_with_state(data: pd.DataFrame, price_col: str = 'price',
+                                 **params) -> Tuple[pd.DataFrame, IndicatorState]:
+        """
+        Like `calculate_all`, also returning the running state of the series.
+
+        The state is seeded from the same pass, so that the following bars can
+        be added with `IndicatorState.update` without recomputing the history.
+
+        Returns:
+            Copy of the DataFrame with the indicator and signal columns added,
+            and the indicator state at its last row
+        """
+        state = IndicatorState(**params)
+        prices = data[price_col].to_numpy(dtype=np.float64)
+        values, running = _compute_indicators(prices, state.rsi_period, state.fast_period, state.slow_period,
+                                              state.signal_period, state.bb_period, state.bb_std_dev)
+        state._seed(prices, values, running)
+        return data.assign(**values), state
+
     @staticmethod
     def calculate_rsi(data: pd.DataFrame, period: int = 14, price_col: str = 'price') -> pd.DataFrame:
         """
-        Calculate Relative Strength Index (RSI).
-        
+        Calculate Relative Strength Index (RSI) with Wilder's smoothing.
+
         Args:
             data: DataFrame with price data
             period: RSI period (typically 14)
             price_col: Column name containing price data
-            
+
         Returns:
             DataFrame with RSI values added
         """
         if len(data) < period + 1:
             logger.warning(f"Not enough data to calculate RSI (need {period+1}, got {len(data)})")
             return data
-            
-        # Make a copy to avoid modifying the original
-        df = data.copy()
-        
-        # Calculate price changes
-        df['price_change'] = df[price_col].diff()
-        
-        # Calculate gains and losses
-        df['gain'] = df['price_change'].apply(lambda x: x if x > 0 else 0)
-        df['loss'] = df['price_change'].apply(lambda x: abs(x) if x < 0 else 0)
-        
-        # Calculate average gains and losses
-        df['avg_gain'] = df['gain'].rolling(window=period).mean()
-        df['avg_loss'] = df['loss'].rolling(window=period).mean()
-        
-        # Calculate RS and RSI
-        df['rs'] = df['avg_gain'] / df['avg_loss']
-        df['rsi'] = 100 - (100 / (1 + df['rs']))
-        
-        # Clean up intermediate columns
-        df = df.drop(['price_change', 'gain', 'loss', 'avg_gain', 'avg_loss', 'rs'], axis=1)
-        
-        return df
-    
+
+        avg_gain, avg_loss = _wilder_averages(data[price_col].to_numpy(dtype=np.float64), period)
+        return data.assign(rsi=_rsi(avg_gain, avg_loss))
+
     @staticmethod
-    def calculate_macd(data: pd.DataFrame, fast_period: int = 12, slow_period: int = 26, 
+    def calculate_macd(data: pd.DataFrame, fast_period: int = 12, slow_period: int = 26,
                        signal_period: int = 9, price_col: str = 'price') -> pd.DataFrame:
         """
         Calculate Moving Average Convergence Divergence (MACD).
-        
+
         Args:
             data: DataFrame with price data
             fast_period: Fast EMA period (typically 12)
             slow_period: Slow EMA period (typically 26)
             signal_period: Signal line period (typically 9)
             price_col: Column name containing price data
-            
+
         Returns:
             DataFrame with MACD values added
         """
         if len(data) < slow_period + signal_period:
             logger.warning(f"Not enough data to calculate MACD (need {slow_period+signal_period}, got {len(data)})")
             return data
-            
-        # Make a copy to avoid modifying the original
-        df = data.copy()
-        
-        # Calculate EMAs
-        df['ema_fast'] = df[price_col].ewm(span=fast_period, adjust=False).mean()
-        df['ema_slow'] = df[price_col].ewm(span=slow_period, adjust=False).mean()
-        
-        # Calculate MACD line and signal line
-        df['macd_line'] = df['ema_fast'] - df['ema_slow']
-        df['macd_signal'] = df['macd_line'].ewm(span=signal_period, adjust=False).mean()
-        
-        # Calculate MACD histogram
-        df['macd_histogram'] = df['macd_line'] - df['macd_signal']
-        
-        # Clean up intermediate columns
-        df = df.drop(['ema_fast', 'ema_slow'], axis=1)
-        
-        return df
-    
+
+        prices = data[price_col].to_numpy(dtype=np.float64)
+        macd_line = _ema(prices, 2 / (fast_period + 1)) - _ema(prices, 2 / (slow_period + 1))
+        macd_signal = _ema(macd_line, 2 / (signal_period + 1))
+        return data.assign(macd_line=macd_line, macd_signal=macd_signal,
+                           macd_histogram=macd_line - macd_signal)
+
     @staticmethod
-    def calculate_bollinger_bands(data: pd.DataFrame, period: int = 20, 
+    def calculate_bollinger_bands(data: pd.DataFrame, period: int = 20,
                                  std_dev: float = 2.0, price_col: str = 'price') -> pd.DataFrame:
         """
         Calculate Bollinger Bands.
-        
+
         Args:
             data: DataFrame with price data
             period: Moving average period (typically 20)
             std_dev: Number of standard deviations (typically 2)
             price_col: Column name containing price data
-            
+
         Returns:
             DataFrame with Bollinger Bands values added
         """
         if len(data) < period:
             logger.warning(f"Not enough data to calculate Bollinger Bands (need {period}, got {len(data)})")
             return data
-            
-        # Make a copy to avoid modifying the original
-        df = data.copy()
-        
-        # Calculate middle band (SMA)
-        df['bb_middle'] = df[price_col].rolling(window=period).mean()
-        
-        # Calculate standard deviation
-        df['bb_std'] = df[price_col].rolling(window=period).std()
-        
-        # Calculate upper and lower bands
-        df['bb_upper'] = df['bb_middle'] + (df['bb_std'] * std_dev)
-        df['bb_lower'] = df['bb_middle'] - (df['bb_std'] * std_dev)
-        
-        # Clean up intermediate columns
-        df = df.drop(['bb_std'], axis=1)
-        
-        return df
-    
+
+        windows = np.lib.stride_tricks.sliding_window_view(data[price_col].to_numpy(dtype=np.float64), period)
+        bb_middle = np.full(len(data), np.nan)
+        bb_std = np.full(len(data), np.nan)
+        bb_middle[period - 1:] = windows.mean(axis=1)
+        bb_std[period - 1:] = windows.std(axis=1, ddof=1)
+        return data.assign(bb_middle=bb_middle, bb_upper=bb_middle + bb_std * std_dev,
+                           bb_lower=bb_middle - bb_std * std_dev)
+
     @staticmethod
     def generate_signals(data: pd.DataFrame) -> pd.DataFrame:
         """Generate trading signals based on technical indicators."""
-        df = data.copy()
-        
-        # Initialize signals column
-        df['signal'] = 'hold'
-        
+        columns = {'signal': np.full(len(data), 'hold', dtype=object)}
+
         # RSI signals
-        if 'rsi' in df.columns:
-            # Ensure RSI values are numeric
-            df['rsi'] = pd.to_numeric(df['rsi'], errors='coerce')
-            
-            # Create the column with appropriate dtype first
-            df['rsi_signal'] = pd.Series(dtype='object')
-            
-            # Now apply the conditions
-            df.loc[df['rsi'] < 30, 'rsi_signal'] = 'buy'
-            df.loc[df['rsi'] > 70, 'rsi_signal'] = 'sell'
-            df.loc[(df['rsi'] >= 30) & (df['rsi'] <= 70), 'rsi_signal'] = 'hold'
-        
+        if 'rsi' in data.columns:
+            columns['rsi_signal'] = _rsi_signal(pd.to_numeric(data['rsi'], errors='coerce'))
+
         # MACD signals
-        if all(col in df.columns for col in ['macd_line', 'macd_signal']):
-            # Ensure MACD values are numeric
-            df['macd_line'] = pd.to_numeric(df['macd_line'], errors='coerce')
-            df['macd_signal'] = pd.to_numeric(df['macd_signal'], errors='coerce')
-            
-            # Create macd_cross column with object dtype
-            df['macd_cross'] = pd.Series(dtype='object')
-            
-            # MACD line crosses above signal line
-            mask = (df['macd_line'] > df['macd_signal']) & (df['macd_line'].shift(1) <= df['macd_signal'].shift(1))
-            df.loc[mask, 'macd_cross'] = 'bullish'
-            
-            # MACD line crosses below signal line
-            mask = (df['macd_line'] < df['macd_signal']) & (df['macd_line'].shift(1) >= df['macd_signal'].shift(1))
-            df.loc[mask, 'macd_cross'] = 'bearish'
-            
-            # Fill NaN values with previous value
-            df['macd_cross'] = df['macd_cross'].ffill()
-            
-            # Create macd_signal column with appropriate dtype
-            df['macd_signal_indicator'] = pd.Series(dtype='object')
-            
-            # Generate MACD signals
-            df.loc[df['macd_cross'] == 'bullish', 'macd_signal_indicator'] = 'buy'
-            df.loc[df['macd_cross'] == 'bearish', 'macd_signal_indicator'] = 'sell'
-            df['macd_signal_indicator'] = df['macd_signal_indicator'].fillna('hold')
-            
-            # Rename to avoid confusion with the original macd_signal column
-            if 'macd_signal_indicator' in df.columns:
-                df.rename(columns={'macd_signal_indicator': 'macd_signal_action'}, inplace=True)
-        
+        if all(col in data.columns for col in ['macd_line', 'macd_signal']):
+            macd_line = pd.to_numeric(data['macd_line'], errors='coerce').to_numpy(dtype=np.float64)
+            macd_signal = pd.to_numeric(data['macd_signal'], errors='coerce').to_numpy(dtype=np.float64)
+            columns['macd_cross'], columns['macd_signal_action'] = _macd_cross(macd_line, macd_signal)
+
         # Combined signal (RSI and MACD)
-        if 'rsi_signal' in df.columns and 'macd_signal_action' in df.columns:
-            # Strong buy: Both RSI and MACD suggest buying
-            df.loc[(df['rsi_signal'] == 'buy') & (df['macd_signal_action'] == 'buy'), 'signal'] = 'strong_buy'
-            
-            # Strong sell: Both RSI and MACD suggest selling
-            df.loc[(df['rsi_signal'] == 'sell') & (df['macd_signal_action'] == 'sell'), 'signal'] = 'strong_sell'
-            
-            # Weak buy: Either RSI or MACD suggests buying
-            mask1 = (df['rsi_signal'] == 'buy') & (df['macd_signal_action'] != 'sell')
-            mask2 = (df['macd_signal_action'] == 'buy') & (df['rsi_signal'] != 'sell')
-            df.loc[mask1 | mask2, 'signal'] = 'buy'
-            
-            # Weak sell: Either RSI or MACD suggests selling
-            mask1 = (df['rsi_signal'] == 'sell') & (df['macd_signal_action'] != 'buy')
-            mask2 = (df['macd_signal_action'] == 'sell') & (df['rsi_signal'] != 'buy')
-            df.loc[mask1 | mask2, 'signal'] = 'sell'
-        
-        return df
-    
+        if 'rsi_signal' in columns and 'macd_signal_action' in columns:
+            columns['signal'] = _combine_signals(columns['rsi_signal'], columns['macd_signal_action'])
+
+        return data.assign(**columns)
+
     @staticmethod
     def analyze_historical_data(data: pd.DataFrame, price_col: str = 'price') -> Dict[str, Any]:
         """
         Perform comprehensive technical analysis on historical data.
-        
+
+        The indicators are reused if the DataFrame already has them (e.g., from
+        `calculate_all`), and computed in one pass otherwise.
+
         Args:
             data: DataFrame with price data
             price_col: Column name containing price data
-            
+
         Returns:
             Dictionary with technical analysis results
         """
         if len(data) < 50:  # Need sufficient data for meaningful analysis
             return {"error": "Insufficient data for technical analysis"}
-            
-        # Make a copy to avoid modifying the original
-        df = data.copy()
-        
-        # Calculate all indicators
-        df = TechnicalIndicators.calculate_rsi(df, price_col=price_col)
-        df = TechnicalIndicators.calculate_macd(df, price_col=price_col)
-        df = TechnicalIndicators.calculate_bollinger_bands(df, price_col=price_col)
-        
-        # Generate signals
-        df = TechnicalIndicators.generate_signals(df)
-        
+
+        df = data
+        if not all(col in df.columns for col in INDICATOR_COLUMNS + SIGNAL_COLUMNS):
+            df = TechnicalIndicators.calculate_all(df, price_col=price_col)
+
         # Get current values (most recent data point)
         current = df.iloc[-1].to_dict()
-        
-        # Determine current market condition
-        market_condition = "neutral"
-        if current.get('rsi', 50) < 30:
-            market_condition = "oversold"
-        elif current.get('rsi', 50) > 70:
-            market_condition = "overbought"
-            
-        # Determine trend based on MACD
-        trend = "sideways"
-        if 'macd_line' in current and 'macd_signal' in current:
-            if current['macd_line'] > current['macd_signal'] and current['macd_line'] > 0:
-                trend = "bullish"
-            elif current['macd_line'] < current['macd_signal'] and current['macd_line'] < 0:
-                trend = "bearish"
-        
-        # Check if price is near Bollinger Bands
-        volatility_condition = "normal"
-        if 'bb_upper' in current and 'bb_lower' in current and price_col in current:
-            price = current[price_col]
-            upper = current['bb_upper']
-            lower = current['bb_lower']
-            
-            if price > upper * 0.95:  # Within 5% of upper band
-                volatility_condition = "high_volatility_upper"
-            elif price < lower * 1.05:  # Within 5% of lower band
-                volatility_condition = "high_volatility_lower"
-        
-        # Prepare analysis summary
-        analysis = {
-            "timestamp": df.index[-1] if isinstance(df.index, pd.DatetimeIndex) else None,
-            "price": current.get(price_col),
+        previous = df.iloc[-2].to_dict()
+
+        analysis = TechnicalIndicators._format_analysis(current, current.get(price_col))
+        analysis["timestamp"] = df.index[-1] if isinstance(df.index, pd.DatetimeIndex) else None
+        analysis["macd_histogram_prev"] = previous.get('macd_histogram')
+        return analysis
+
+    @staticmethod
+    def analyze_state(state: IndicatorState, price: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Technical analysis from the running state of a series, in O(1).
+
+        Args:
+            state: Running indicator state of the series
+            price: Live price to preview as the close of a new bar; None for the last bar
+
+        Returns:
+            Dictionary with technical analysis results, like `analyze_historical_data`
+        """
+        current = state.current if price is None else state.preview(price)
+        analysis = TechnicalIndicators._format_analysis(current, current.get('price'))
+        analysis["timestamp"] = None
+        return analysis
+
+    @staticmethod
+    def _format_analysis(current: Dict[str, Any], price: Optional[float]) -> Dict[str, Any]:
+        """Build the analysis summary from the latest indicators."""
+        conditions = summarize_indicators(current, price)
+        return {
+            "price": price,
             "rsi": current.get('rsi'),
             "macd_line": current.get('macd_line'),
             "macd_signal": current.get('macd_signal'),
@@ -269,11 +579,9 @@ class TechnicalIndicators:
             "bollinger_middle": current.get('bb_middle'),
             "bollinger_upper": current.get('bb_upper'),
             "bollinger_lower": current.get('bb_lower'),
-            "market_condition": market_condition,
-            "trend": trend,
-            "volatility": volatility_condition,
+            "market_condition": conditions["market_condition"],
+            "trend": conditions["trend"],
+            "volatility": conditions["volatility"],
             "signal": current.get('signal', 'hold'),
             "analysis_date": pd.Timestamp.now().isoformat()
         }
-        
-        return analysis
\ No newline at end of file
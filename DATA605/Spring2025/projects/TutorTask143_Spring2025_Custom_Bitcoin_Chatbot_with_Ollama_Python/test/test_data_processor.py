@@ -0,0 +1,49 @@
+import warnings
+
+import pandas as pd
+
+import helpers.hunit_test as hunitest
+
+import data_processor as dproc
+
+
+# #############################################################################
+# TestDatePriceIndex
+# #############################################################################
+
+
+class TestDatePriceIndex(hunitest.TestCase):
+    def test_from_frame1(self) -> None:
+        """
+        Check that the last row of a duplicated date wins.
+        """
+        df = pd.DataFrame(
+            {
+                "date": ["2024-01-02", "2024-01-01", "2024-01-02", None],
+                "price": [2.0, 1.0, 3.0, 4.0],
+            }
+        )
+        index = dproc.DatePriceIndex.from_frame(df)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.get("2024-01-01"), 1.0)
+        self.assertEqual(index.get("2024-01-02"), 3.0)
+        self.assertEqual(index.date_range(), ("2024-01-01", "2024-01-02"))
+
+    def test_from_frame2(self) -> None:
+        """
+        Check that tz-aware dates are indexed by their local calendar date.
+        """
+        # 23:00 in New York is already the next day in UTC.
+        dates = pd.Series(
+            pd.to_datetime(["2024-03-01 23:00", "2024-03-02 23:00"]).tz_localize(
+                "America/New_York"
+            )
+        )
+        df = pd.DataFrame({"date": dates, "price": [1.0, 2.0]})
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            index = dproc.DatePriceIndex.from_frame(df)
+        self.assertEqual(index.date_range(), ("2024-03-01", "2024-03-02"))
+        self.assertEqual(index.get("2024-03-01"), 1.0)
+        self.assertEqual(index.get(dates[1]), 2.0)
+        self.assertIsNone(index.get("2024-03-03"))
@@ -0,0 +1,88 @@
+import datetime
+from typing import List
+from unittest import mock
+
+import helpers.hunit_test as hunitest
+
+import vector_store as vecstore
+
+
+class _FakeEmbeddings:
+    """
+    Embed a text as the counts of a few words.
+    """
+
+    _WORDS = ["bitcoin", "price", "current", "ethereum", "drop", "week"]
+
+    def embed_query(self, text: str) -> List[float]:
+        words = text.lower().replace("?", "").split()
+        return [float(words.count(word)) + 0.01 for word in self._WORDS]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def _get_rag_system() -> vecstore.RAGSystem:
+    """
+    Build a `RAGSystem` with fake embeddings, data and QA chain.
+    """
+    crypto_data = mock.MagicMock()
+    crypto_data.last_update = datetime.datetime.now()
+    crypto_data.answer_date_price_query.return_value = (False, None)
+    crypto_data.process_query_for_nlp_enhancement.return_value = {
+        "coins": [],
+        "is_comparison_query": False,
+        "is_price_query": False,
+        "is_trend_query": False,
+        "is_date_query": False,
+        "timeframes": [],
+        "dates": [],
+        "keywords": [],
+    }
+    with mock.patch.object(vecstore, "OllamaEmbeddings", return_value=_FakeEmbeddings()):
+        rag_system = vecstore.RAGSystem(crypto_data, "llama3")
+    rag_system.qa_chain = mock.MagicMock(
+        side_effect=lambda inputs: {
+            "answer": f"Answer to: {inputs['question']}",
+            "source_documents": [],
+        }
+    )
+    return rag_system
+
+
+# #############################################################################
+# TestRAGSystemQueryCache
+# #############################################################################
+
+
+class TestRAGSystemQueryCache(hunitest.TestCase):
+    def test_hit_after_chat_history(self) -> None:
+        """
+        Check that a standalone question hits the cache later in a conversation.
+        """
+        rag_system = _get_rag_system()
+        question = "What is the current Bitcoin price?"
+        result = rag_system.answer_question(question)
+        self.assertNotIn("cached", result)
+        # Continue the conversation.
+        rag_system.answer_question("How did Ethereum do this week?")
+        rag_system.answer_question("Why did it drop?")
+        self.assertEqual(len(rag_system.chat_history), 3)
+        # Ask the first question again.
+        result = rag_system.answer_question(question)
+        self.assertTrue(result.get("cached"))
+        self.assertEqual(result["answer"], f"Answer to: {question}")
+        self.assertEqual(rag_system.qa_chain.call_count, 3)
+        self.assertEqual(len(rag_system.chat_history), 4)
+
+    def test_follow_up_not_cached(self) -> None:
+        """
+        Check that a follow-up question is answered again in a new context.
+        """
+        rag_system = _get_rag_system()
+        rag_system.answer_question("How did Bitcoin do this week?")
+        rag_system.answer_question("Why did it drop?")
+        rag_system.answer_question("How did Ethereum do this week?")
+        result = rag_system.answer_question("Why did it drop?")
+        self.assertNotIn("cached", result)
+        self.assertEqual(rag_system.qa_chain.call_count, 4)
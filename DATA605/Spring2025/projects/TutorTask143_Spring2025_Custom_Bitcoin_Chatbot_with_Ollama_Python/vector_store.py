@@ -7,11 +7,18 @@ import os
 import logging
 import datetime
 import re
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
+import faiss
 import ollama
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import OllamaEmbeddings
+from langchain.embeddings.base import Embeddings
 from langchain.vectorstores import FAISS
 from langchain.chains import ConversationalRetrievalChain
 from langchain.schema import Document
@@ -23,6 +30,13 @@ from langchain.chains.query_constructor.base import AttributeInfo
 
 from data_processor import CryptoData
 OLLAMA_BASE_URL = "http://ollama:11434"
+# Questions that refer to earlier turns of the conversation (e.g., "what about
+# Ethereum?", "why did it drop?"), whose answers depend on the chat history
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|but|so|also|why|what about|how about)\b"
+    r"|\b(it|its|it's|that|those|these|they|them|their|same|previous|again|else|instead)\b",
+    re.IGNORECASE,
+)
 # Setup logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -44,15 +58,17 @@ class RAGSystem:
         """
         self.crypto_data = crypto_data
         self.model_name = model_name
-        self.embeddings = OllamaEmbeddings(
+        # The vector of the question being answered is reused by the retrievers
+        self.embeddings = QueryVectorEmbeddings(OllamaEmbeddings(
             model="nomic-embed-text",
             base_url=OLLAMA_BASE_URL  # Add this parameter
-        )
+        ))
         self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=200, separators=["\n\n", "\n", ". ", " ", ""])
         self.vectorstore = None
         self.qa_chain = None
         self.chat_history = []
-        self.query_cache = {}
+        # Answers of past questions, looked up by the similarity of the questions
+        self.query_cache = SemanticQueryCache()
         self.last_updated = None
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
@@ -630,13 +646,6 @@ class RAGSystem:
             Dictionary containing the answer and source documents
         """
         
-        # Check cache first
-        if hasattr(self, 'query_cache') and question in self.query_cache:
-            cached_result = self.query_cache[question]
-            if cached_result["expires_at"] > datetime.datetime.now():
-                logger.info(f"Using cached response for query: {question[:50]}...")
-                return cached_result
-        
         if not self.qa_chain:
             logger.error("Cannot answer question: QA chain not initialized")
             return {"answer": "System not initialized. Please try again later."}
@@ -669,6 +678,20 @@ class RAGSystem:
                 
                 return result
             
+            # Check the cache of past answers, embedding the question only once.
+            # The answer to a follow-up question depends on the conversation, so
+            # only the questions that stand on their own are cached.
+            question_vector = self._embed_question(question)
+            data_version = self._get_data_version()
+            use_cache = question_vector is not None and not self._is_follow_up_question(question)
+            if use_cache:
+                cached_result = self.query_cache.get(question, question_vector, data_version)
+                if cached_result is not None:
+                    self.chat_history.append((question, cached_result["answer"]))
+                    if len(self.chat_history) > 10:
+                        self.chat_history.pop(0)
+                    return {**cached_result, "cached": True}
+            
             # Get metadata filter
             metadata_filter = self._construct_metadata_filter(query_features)
             logger.debug(f"Using metadata filter: {metadata_filter}")
@@ -676,6 +699,9 @@ class RAGSystem:
             # Get the current time for timing the response
             start_time = datetime.datetime.now()
             
+            if question_vector is not None:
+                # A retriever searching with the question doesn't embed it again
+                self.embeddings.set_query(processed_question, question_vector)
             try:
                 # Instead of trying to swap retrievers dynamically, we'll create a temporary chain with the filtered retriever
                 if metadata_filter and hasattr(self.qa_chain, 'retriever'):
@@ -722,6 +748,8 @@ class RAGSystem:
                     "last_updated": last_updated,
                     "chat_history": self.chat_history
                 })
+            finally:
+                self.embeddings.clear_query()
             
             # Calculate response time
             response_time = (datetime.datetime.now() - start_time).total_seconds()
@@ -741,6 +769,9 @@ class RAGSystem:
             if self.crypto_data.last_update:
                 result["data_last_updated"] = self.crypto_data.last_update.isoformat()
             
+            if use_cache:
+                self.query_cache.put(question, question_vector, result, data_version)
+            
             logger.info(f"Successfully answered question: {question[:50]}...")
             return result
         except Exception as e:
@@ -848,43 +879,219 @@ class RAGSystem:
         self.last_updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         logger.info(f"Vector store incrementally updated with {len(splits)} new chunks at {self.last_updated}")
 
-    # In vector_store.py, add a method to the RAGSystem class:
-    def precompute_common_queries(self):
-        """Precompute embeddings for common queries to improve response time."""
-        common_queries = [
-            "What is the current Bitcoin price?",
-            "How has Bitcoin performed this week?",
-            "What's the Bitcoin price trend?",
-            "Bitcoin price yesterday"
-        ]
+    @staticmethod
+    def _is_follow_up_question(question: str) -> bool:
+        """Return whether a question refers to the previous turns of the conversation."""
+        return bool(FOLLOW_UP_PATTERN.search(question))
+
+    def _embed_question(self, question: str) -> Optional[List[float]]:
+        """Embed a question for the query cache, or return None on failure."""
+        try:
+            return self.embeddings.embed_query(question)
+        except Exception as e:
+            logger.warning(f"Could not embed question for the query cache: {e}")
+            return None
+    
+    def _get_data_version(self) -> Tuple[Any, Any]:
+        """Return the freshness of the data, which invalidates cached answers when it changes."""
+        return (self.last_updated, self.crypto_data.last_update)
+
+    def precompute_common_queries(self, queries: List[str] = None):
+        """
+        Warm the query cache with answers to common queries to improve response time.
         
-        # Pre-compute and store results for common queries
-        for query in common_queries:
-            processed_question, query_features = self._preprocess_query(query)
-            result = self.qa_chain({
-                "question": processed_question,
-                "system_prompt": self.system_prompt,
-                "current_datetime": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "last_updated": getattr(self, 'last_updated', 'Never'),
-                "chat_history": []
-            })
-            # Store in a query cache
-            self.query_cache[query] = {
-                "answer": result["answer"],
-                "timestamp": datetime.datetime.now(),
-                "expires_at": datetime.datetime.now() + datetime.timedelta(minutes=30)
-        }
+        Args:
+            queries: Questions to answer (default: a few common Bitcoin price questions)
+        """
+        if queries is None:
+            queries = [
+                "What is the current Bitcoin price?",
+                "How has Bitcoin performed this week?",
+                "What's the Bitcoin price trend?",
+                "Bitcoin price yesterday"
+            ]
+        
+        # Answer the queries without adding them to the current conversation
+        chat_history = self.chat_history
+        for query in queries:
+            self.chat_history = []
+            self.answer_question(query)
+        self.chat_history = chat_history
+        logger.info(f"Precomputed answers for {len(queries)} common queries")
+
+
+
+class SemanticQueryCache:
+    """
+    In-memory cache of answers keyed by the embedding of the question.
+
+    A question is a hit when a cached question has a cosine similarity above
+    `threshold` with it, mentions the same numbers (e.g., dates), was answered
+    with the same version of the data, and is younger than `ttl_seconds`. The
+    cache holds at most `max_entries` answers and evicts the least recently
+    used one. The vectors live in a preallocated matrix, so a lookup is one
+    matrix-vector product, which for a few hundred entries is faster than any
+    approximate index.
+    """
+
+    def __init__(self, threshold=0.95, ttl_seconds=1800, max_entries=256):
+        """
+        Args:
+            threshold: Min cosine similarity between two questions to reuse an answer
+            ttl_seconds: Max age of a cached answer
+            max_entries: Max number of cached answers
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._vectors = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        # Slot -> entry, in least to most recently used order
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, question, vector, data_version):
+        """Return the cached result for a question, or None."""
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+            vector = self._normalize(vector)
+            scores = self._vectors @ vector
+            scores[~self._valid] = -np.inf
+            slot = int(np.argmax(scores))
+            entry = self._entries.get(slot)
+            if (
+                entry is None
+                or scores[slot] < self.threshold
+                or entry["numbers"] != self._get_numbers(question)
+            ):
+                self.misses += 1
+                return None
+            if entry["data_version"] != data_version or entry["expires_at"] <= datetime.datetime.now():
+                # The data changed since the answer was cached
+                self._remove(slot)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            logger.info(f"Semantic cache hit (similarity {scores[slot]:.3f}) with: {entry['question'][:50]}...")
+            return entry["result"]
+
+    def put(self, question, vector, result, data_version):
+        """Cache the result for a question."""
+        with self._lock:
+            vector = self._normalize(vector)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if len(self._entries) >= self.max_entries:
+                # Evict the least recently used entry
+                slot, _ = self._entries.popitem(last=False)
+                self._valid[slot] = False
+            slot = int(np.argmin(self._valid))
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = {
+                "question": question,
+                "numbers": self._get_numbers(question),
+                "result": result,
+                "data_version": data_version,
+                "expires_at": datetime.datetime.now() + datetime.timedelta(seconds=self.ttl_seconds),
+            }
+
+    def clear(self):
+        """Remove all the cached answers."""
+        with self._lock:
+            self._entries.clear()
+            self._valid[:] = False
+
+    def _remove(self, slot):
+        del self._entries[slot]
+        self._valid[slot] = False
 
+    @staticmethod
+    def _get_numbers(question):
+        # "price on 2021-01-01" and "price on 2022-01-01" embed almost identically
+        return tuple(re.findall(r"\d+", question))
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+
+
+class QueryVectorEmbeddings(Embeddings):
+    """
+    Embeddings that return a precomputed vector for the query being answered.
+
+    `answer_question` embeds the question for the query cache; on a miss, the
+    retriever searching with the same text gets that vector instead of
+    embedding the question again. Everything else is delegated to `embeddings`.
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        # The question being answered, per thread
+        self._local = threading.local()
+
+    def set_query(self, text, vector):
+        self._local.query = (text, vector)
+
+    def clear_query(self):
+        self._local.query = None
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        query = getattr(self._local, "query", None)
+        if query is not None and query[0] == text:
+            return list(query[1])
+        return self.embeddings.embed_query(text)
 
 
 class ShardedVectorStore:
-    """A sharded vector store implementation for improved performance."""
+    """
+    A sharded vector store implementation for improved performance.
+
+    Documents are grouped into shards by their 'type' metadata. All documents
+    are embedded with one batched call, and each shard keeps its normalized
+    vectors next to a FAISS inner-product index (so scores are cosine
+    similarities). A query is embedded once, the shards are searched in
+    parallel and the hits are merged with a heap, re-ranked with the stored
+    vectors instead of re-embedding them.
+    """
     
-    def __init__(self, embeddings, num_shards=3):
+    def __init__(self, embeddings, num_shards=3, index_type="flat", max_workers=None,
+                 hnsw_m=32, ivf_nlist=100, ivf_nprobe=8):
+        """
+        Args:
+            embeddings: Embeddings used for documents and queries
+            num_shards: Number of shards
+            index_type: 'flat' (exact), 'hnsw' or 'ivf' index for each shard
+            max_workers: Threads used to search the shards (default: one per shard)
+            hnsw_m: Number of neighbors per node of the HNSW graph
+            ivf_nlist: Number of IVF clusters; smaller shards use a flat index
+            ivf_nprobe: Number of IVF clusters visited per query
+        """
+        if index_type not in ("flat", "hnsw", "ivf"):
+            raise ValueError(f"Unknown index type: {index_type}")
         self.embeddings = embeddings
         self.num_shards = num_shards
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
         self.shards = [None] * num_shards
         self.shard_mapping = {}  # Maps document types to shards
+        # FAISS releases the GIL while searching, so threads run the shards in parallel
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or num_shards)
         
     def initialize_shards(self, documents: List[Document]):
         """Initialize shards with documents based on type."""
@@ -902,37 +1109,101 @@ class ShardedVectorStore:
             shard_idx = i % self.num_shards
             self.shard_mapping[doc_type] = shard_idx
         
-        # Initialize each shard with its documents
-        for shard_idx in range(self.num_shards):
-            shard_docs = []
-            for doc_type, idx in self.shard_mapping.items():
-                if idx == shard_idx and doc_type in doc_groups:
-                    shard_docs.extend(doc_groups[doc_type])
-            
-            if shard_docs:
-                self.shards[shard_idx] = FAISS.from_documents(shard_docs, self.embeddings)
-        
-    def similarity_search(self, query, k=4, **kwargs):
-        """Search across all shards and merge results."""
-        all_results = []
-        for shard in self.shards:
-            if shard is not None:
-                results = shard.similarity_search(query, k=k, **kwargs)
-                all_results.extend(results)
-        
-        # Re-rank all results
-        if all_results:
-            query_embedding = self.embeddings.embed_query(query)
-            for doc in all_results:
-                doc_embedding = self.embeddings.embed_documents([doc.page_content])[0]
-                doc.metadata['score'] = self._cosine_similarity(query_embedding, doc_embedding)
-            
-            # Sort by similarity score
-            all_results.sort(key=lambda x: x.metadata.get('score', 0), reverse=True)
+        # Group the documents of each shard
+        shard_docs = [[] for _ in range(self.num_shards)]
+        for doc_type, idx in self.shard_mapping.items():
+            if doc_type in doc_groups:
+                shard_docs[idx].extend(doc_groups[doc_type])
+        
+        # Embed all the documents with a single batched call
+        ordered_docs = [doc for docs in shard_docs for doc in docs]
+        if not ordered_docs:
+            return
+        vectors = self._normalize(self.embeddings.embed_documents(
+            [doc.page_content for doc in ordered_docs]))
+        
+        # Initialize each shard with its documents and vectors
+        start = 0
+        for shard_idx, docs in enumerate(shard_docs):
+            if docs:
+                shard_vectors = vectors[start:start + len(docs)]
+                self.shards[shard_idx] = {
+                    "index": self._build_index(shard_vectors),
+                    "docs": docs,
+                    "vectors": shard_vectors,
+                }
+                start += len(docs)
+        logger.info(f"Initialized {sum(s is not None for s in self.shards)} {self.index_type} shards "
+                    f"with {len(ordered_docs)} documents")
+        
+    def similarity_search(self, query, k=4, filter=None, fetch_k=None, **kwargs):
+        """
+        Search across all shards and merge results.
         
-        # Return top k results
-        return all_results[:k]
+        Args:
+            query: Query text
+            k: Number of documents to return
+            filter: Optional metadata key -> value that the documents must match
+            fetch_k: Number of candidates per shard (default: k, or 4 * k with a filter)
+        
+        Returns:
+            Top k documents, each with its cosine similarity in metadata['score']
+        """
+        query_vector = self._normalize([self.embeddings.embed_query(query)])
+        return self.similarity_search_by_vector(query_vector[0], k=k, filter=filter, fetch_k=fetch_k)
+    
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, fetch_k=None):
+        """Search across all shards with an already normalized query vector."""
+        if fetch_k is None:
+            fetch_k = k if filter is None else 4 * k
+        shards = [shard for shard in self.shards if shard is not None]
+        if not shards:
+            return []
+        query_vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        shard_hits = self._executor.map(
+            lambda shard: self._search_shard(shard, query_vector, fetch_k, filter), shards)
+        
+        # Merge the per-shard hits, keeping the top k by score
+        top_hits = heapq.nlargest(k, itertools.chain.from_iterable(shard_hits), key=lambda hit: hit[0])
+        return [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, 'score': score})
+            for score, doc in top_hits
+        ]
+    
+    def _search_shard(self, shard, query_vector, fetch_k, filter):
+        """Search a shard and re-rank its hits with the stored vectors."""
+        _, positions = shard["index"].search(query_vector, min(fetch_k, len(shard["docs"])))
+        positions = positions[0][positions[0] >= 0]
+        if filter:
+            positions = [
+                pos for pos in positions
+                if all(shard["docs"][pos].metadata.get(key) == value for key, value in filter.items())
+            ]
+        if len(positions) == 0:
+            return []
+        # Exact cosine similarities, also for approximate (IVF / HNSW) indices
+        scores = shard["vectors"][positions] @ query_vector[0]
+        return [(float(score), shard["docs"][pos]) for score, pos in zip(scores, positions)]
+    
+    def _build_index(self, vectors):
+        """Build the FAISS index of a shard."""
+        dim = vectors.shape[1]
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        elif self.index_type == "ivf" and len(vectors) >= 39 * self.ivf_nlist:
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, self.ivf_nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+            index.nprobe = self.ivf_nprobe
+        else:
+            # Too few vectors to train the IVF clusters: search exhaustively
+            index = faiss.IndexFlatIP(dim)
+        index.add(vectors)
+        return index
     
-    def _cosine_similarity(self, a, b):
-        """Calculate cosine similarity between two vectors."""
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+    @staticmethod
+    def _normalize(vectors):
+        """Convert vectors to a float32 matrix with unit-norm rows."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
@@ -23,6 +23,63 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# -----------------------------------------------------------------------------
+# Packed Price History Format
+# -----------------------------------------------------------------------------
+
+# Each history point is stored as a fixed-width binary member of a sorted set
+# (scored by timestamp) instead of a JSON string, so that a range of points is
+# decoded with a single `np.frombuffer` call. Big-endian fields, missing
+# values are stored as NaN.
+PRICE_RECORD_DTYPE = np.dtype([
+    ('timestamp', '>i8'),
+    ('price', '>f8'),
+    ('market_cap', '>f8'),
+    ('volume_24h', '>f8'),
+    ('change_24h', '>f8'),
+    ('last_updated_at', '>f8'),
+])
+# Same layout, in the notation of the `struct` library of Redis Lua scripts
+_LUA_RECORD_FORMAT = '>i8ddddd'
+
+# Server-side downsampling of a range of packed points into fixed-size time
+# buckets. Each bucket is returned as one packed point, timestamped with the
+# start of the bucket, with the aggregated price and the other fields of the
+# last point of the bucket.
+_DOWNSAMPLE_SCRIPT = """
+local fmt = ARGV[5]
+local rows = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[2])
+local bucket_size = tonumber(ARGV[3])
+local aggregation = ARGV[4]
+local out = {}
+local bucket, first, last, total, count, low, high
+local function flush()
+    if bucket == nil then return end
+    local price = last[2]
+    if aggregation == 'avg' then price = total / count
+    elseif aggregation == 'min' then price = low
+    elseif aggregation == 'max' then price = high
+    elseif aggregation == 'first' then price = first end
+    out[#out + 1] = struct.pack(fmt, bucket, price, last[3], last[4], last[5], last[6])
+end
+for _, member in ipairs(rows) do
+    local ts, price, cap, vol, change, updated = struct.unpack(fmt, member)
+    local b = ts - (ts % bucket_size)
+    if b ~= bucket then
+        flush()
+        bucket, first, total, count, low, high = b, price, 0, 0, price, price
+    end
+    total = total + price
+    count = count + 1
+    if price < low then low = price end
+    if price > high then high = price end
+    last = {ts, price, cap, vol, change, updated}
+end
+flush()
+return out
+"""
+_DOWNSAMPLE_AGGREGATIONS = ('last', 'first', 'avg', 'min', 'max')
+
 # -----------------------------------------------------------------------------
 # Redis Connection
 # -----------------------------------------------------------------------------
@@ -54,6 +111,29 @@ def connect_to_redis(host: str, port: int, password: str) -> redis.Redis:
         logger.error(f"Failed to connect to Redis: {e}")
         raise
 
+def _get_binary_conn(redis_conn: redis.Redis) -> redis.Redis:
+    """
+    Get a client sharing the settings of `redis_conn` that returns raw bytes.
+
+    The packed history members are binary, so they cannot go through a
+    connection created with `decode_responses=True`. The client is created
+    once per connection and cached on it.
+    """
+    binary_conn = getattr(redis_conn, '_binary_conn', None)
+    if binary_conn is None:
+        connection_kwargs = dict(redis_conn.connection_pool.connection_kwargs)
+        if not connection_kwargs.get('decode_responses'):
+            return redis_conn
+        connection_kwargs['decode_responses'] = False
+        binary_conn = redis.Redis(
+            connection_pool=redis.ConnectionPool(
+                connection_class=redis_conn.connection_pool.connection_class,
+                **connection_kwargs
+            )
+        )
+        redis_conn._binary_conn = binary_conn
+    return binary_conn
+
 # -----------------------------------------------------------------------------
 # Bitcoin Data Fetching from CoinGecko API
 # -----------------------------------------------------------------------------
@@ -111,47 +191,122 @@ def fetch_bitcoin_historical(days: int = 1, currency: str = 'usd') -> Dict[str,
 # Redis Data Storage
 # -----------------------------------------------------------------------------
 
-def store_bitcoin_price(redis_conn: redis.Redis, price_data: Dict[str, Any], currency: str = 'usd') -> bool:
+def _get_history_key(currency: str) -> str:
+    return f"bitcoin:price_ticks:{currency}"
+
+def pack_price_records(price_data_list: List[Dict[str, Any]], currency: str = 'usd') -> np.ndarray:
     """
-    Store Bitcoin price data in Redis.
+    Pack CoinGecko price data points into fixed-width binary records.
+    
+    Args:
+        price_data_list (list): Bitcoin price data points from CoinGecko API
+        currency (str): Currency of the price data (default: 'usd')
+        
+    Returns:
+        np.ndarray: Array of records with dtype `PRICE_RECORD_DTYPE`
+    """
+    fields = {
+        'price': currency,
+        'market_cap': f"{currency}_market_cap",
+        'volume_24h': f"{currency}_24h_vol",
+        'change_24h': f"{currency}_24h_change",
+        'last_updated_at': 'last_updated_at',
+    }
+    records = np.empty(len(price_data_list), dtype=PRICE_RECORD_DTYPE)
+    records['timestamp'] = [item['timestamp'] for item in price_data_list]
+    for field, key in fields.items():
+        values = [item.get(key) for item in price_data_list]
+        records[field] = np.array(values, dtype=float)
+    return records
+
+def unpack_price_records(members: List[bytes]) -> np.ndarray:
+    """
+    Decode packed history members into a record array.
+    
+    Args:
+        members (list): Binary members of the price history sorted set
+        
+    Returns:
+        np.ndarray: Array of records with dtype `PRICE_RECORD_DTYPE`
+    """
+    return np.frombuffer(b''.join(members), dtype=PRICE_RECORD_DTYPE)
+
+def store_bitcoin_prices(redis_conn: redis.Redis, price_data_list: List[Dict[str, Any]],
+                         currency: str = 'usd', channel: Optional[str] = None) -> bool:
+    """
+    Store Bitcoin price data points in Redis in a single round trip.
+    
+    The current price, last update time and data hash are set from the most
+    recent point, and all the points are added to the packed price history.
+    All the commands are sent as one MULTI/EXEC pipeline, so readers never see
+    the current price and the history out of sync.
     
     Args:
         redis_conn (redis.Redis): Redis connection object
-        price_data (dict): Bitcoin price data from CoinGecko API
+        price_data_list (list): Bitcoin price data points from CoinGecko API
         currency (str): Currency of the price data (default: 'usd')
+        channel (str): Channel to also publish the latest point to, in the same
+            round trip (default: None for no publishing)
         
     Returns:
         bool: True if storage was successful
     """
+    if not price_data_list:
+        return True
     try:
+        records = pack_price_records(price_data_list, currency)
+        latest = max(price_data_list, key=lambda item: item['timestamp'])
+        pipe = _get_binary_conn(redis_conn).pipeline(transaction=True)
+        
         # Store current price as a string
-        redis_conn.set(f"bitcoin:current_price:{currency}", price_data[currency])
+        pipe.set(f"bitcoin:current_price:{currency}", latest[currency])
         
         # Store timestamp of last update
-        redis_conn.set("bitcoin:last_updated", price_data['timestamp'])
+        pipe.set("bitcoin:last_updated", latest['timestamp'])
         
         # Store all data as a hash
-        redis_conn.hset(f"bitcoin:data:{currency}", mapping={
-            'price': price_data[currency],
-            'market_cap': price_data[f"{currency}_market_cap"],
-            'volume_24h': price_data[f"{currency}_24h_vol"],
-            'change_24h': price_data[f"{currency}_24h_change"],
-            'last_updated_at': price_data['last_updated_at'],
-            'timestamp': price_data['timestamp']
+        pipe.hset(f"bitcoin:data:{currency}", mapping={
+            'price': latest[currency],
+            'market_cap': latest[f"{currency}_market_cap"],
+            'volume_24h': latest[f"{currency}_24h_vol"],
+            'change_24h': latest[f"{currency}_24h_change"],
+            'last_updated_at': latest['last_updated_at'],
+            'timestamp': latest['timestamp']
         })
         
         # Add to time series (using sorted set with timestamp as score)
-        redis_conn.zadd(
-            f"bitcoin:price_history:{currency}", 
-            {json.dumps(price_data): price_data['timestamp']}
+        pipe.zadd(
+            _get_history_key(currency),
+            {record.tobytes(): int(record['timestamp']) for record in records}
         )
         
-        logger.info(f"Successfully stored Bitcoin price data in Redis")
+        if channel is not None:
+            pipe.publish(channel, json.dumps(latest))
+        
+        pipe.execute()
+        logger.info(f"Successfully stored {len(price_data_list)} Bitcoin price data points in Redis")
         return True
     except redis.RedisError as e:
         logger.error(f"Error storing Bitcoin price data in Redis: {e}")
         return False
 
+def store_bitcoin_price(redis_conn: redis.Redis, price_data: Dict[str, Any], currency: str = 'usd',
+                        channel: Optional[str] = None) -> bool:
+    """
+    Store Bitcoin price data in Redis.
+    
+    Args:
+        redis_conn (redis.Redis): Redis connection object
+        price_data (dict): Bitcoin price data from CoinGecko API
+        currency (str): Currency of the price data (default: 'usd')
+        channel (str): Channel to also publish the data to, in the same round
+            trip (default: None for no publishing)
+        
+    Returns:
+        bool: True if storage was successful
+    """
+    return store_bitcoin_prices(redis_conn, [price_data], currency, channel=channel)
+
 def get_current_bitcoin_price(redis_conn: redis.Redis, currency: str = 'usd') -> float:
     """
     Get current Bitcoin price from Redis.
@@ -200,11 +355,49 @@ def get_bitcoin_data(redis_conn: redis.Redis, currency: str = 'usd') -> Dict[str
         logger.error(f"Error retrieving Bitcoin data from Redis: {e}")
         raise
 
+def get_price_records(redis_conn: redis.Redis, start_time: int = None, end_time: int = None,
+                      currency: str = 'usd', bucket_seconds: int = None,
+                      aggregation: str = 'last') -> np.ndarray:
+    """
+    Get the packed Bitcoin price history within a time range as a record array.
+    
+    Args:
+        redis_conn (redis.Redis): Redis connection object
+        start_time (int): Start time as Unix timestamp (default: None for no lower bound)
+        end_time (int): End time as Unix timestamp (default: None for no upper bound)
+        currency (str): Currency of the price data (default: 'usd')
+        bucket_seconds (int): Downsample the points in the server into buckets of
+            this size (default: None for all the points)
+        aggregation (str): Price of a bucket, one of 'last', 'first', 'avg',
+            'min', 'max' (default: 'last')
+        
+    Returns:
+        np.ndarray: Array of records with dtype `PRICE_RECORD_DTYPE`
+    """
+    if start_time is None:
+        start_time = '-inf'
+    if end_time is None:
+        end_time = '+inf'
+    binary_conn = _get_binary_conn(redis_conn)
+    if bucket_seconds is None:
+        members = binary_conn.zrangebyscore(_get_history_key(currency), start_time, end_time)
+    else:
+        if aggregation not in _DOWNSAMPLE_AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation: {aggregation}")
+        members = binary_conn.eval(
+            _DOWNSAMPLE_SCRIPT, 1, _get_history_key(currency),
+            start_time, end_time, int(bucket_seconds), aggregation, _LUA_RECORD_FORMAT
+        )
+    return unpack_price_records(members)
+
 def get_price_history(redis_conn: redis.Redis, start_time: int = None, end_time: int = None, 
                      currency: str = 'usd') -> List[Dict[str, Any]]:
     """
     Get Bitcoin price history from Redis within a specific time range.
     
+    Prefer `get_price_dataframe(redis_conn, ...)` for long ranges, which skips
+    building a dict per point.
+    
     Args:
         redis_conn (redis.Redis): Redis connection object
         start_time (int): Start time as Unix timestamp (default: None for no lower bound)
@@ -212,28 +405,21 @@ def get_price_history(redis_conn: redis.Redis, start_time: int = None, end_time:
         currency (str): Currency of the price data (default: 'usd')
         
     Returns:
-        list: List of Bitcoin price data points
+        list: List of Bitcoin price data points, with the CoinGecko keys
     """
     try:
-        # Set default time range if not provided
-        if start_time is None:
-            start_time = '-inf'
-        if end_time is None:
-            end_time = '+inf'
-            
-        # Get data from sorted set within time range
-        result = redis_conn.zrangebyscore(
-            f"bitcoin:price_history:{currency}", 
-            start_time, 
-            end_time, 
-            withscores=True
-        )
+        records = get_price_records(redis_conn, start_time, end_time, currency)
         
-        # Parse JSON data
-        history = []
-        for item, score in result:
-            data = json.loads(item)
-            history.append(data)
+        # Convert to dicts with the same keys as the CoinGecko data
+        columns = {
+            'timestamp': records['timestamp'].tolist(),
+            currency: records['price'].tolist(),
+            f"{currency}_market_cap": records['market_cap'].tolist(),
+            f"{currency}_24h_vol": records['volume_24h'].tolist(),
+            f"{currency}_24h_change": records['change_24h'].tolist(),
+            'last_updated_at': records['last_updated_at'].tolist(),
+        }
+        history = [dict(zip(columns, values)) for values in zip(*columns.values())]
             
         logger.info(f"Retrieved {len(history)} Bitcoin price records from history")
         return history
@@ -291,30 +477,49 @@ def create_subscriber(redis_conn: redis.Redis, channel: str = 'bitcoin_price_upd
 # Time Series Analysis
 # -----------------------------------------------------------------------------
 
-def get_price_dataframe(price_history: List[Dict[str, Any]], currency: str = 'usd') -> pd.DataFrame:
+def get_price_dataframe(price_history: Union[List[Dict[str, Any]], redis.Redis], currency: str = 'usd',
+                        start_time: int = None, end_time: int = None, bucket_seconds: int = None,
+                        aggregation: str = 'last') -> pd.DataFrame:
     """
-    Convert price history list to a Pandas DataFrame.
+    Convert price history to a Pandas DataFrame.
+    
+    When a Redis connection is passed instead of a list, the history is read
+    from Redis and decoded directly into NumPy arrays (see `get_price_records`).
     
     Args:
-        price_history (list): List of Bitcoin price data points
+        price_history (list or redis.Redis): List of Bitcoin price data points,
+            or Redis connection object to read them from
         currency (str): Currency of the price data (default: 'usd')
+        start_time (int): Start time as Unix timestamp, when reading from Redis
+        end_time (int): End time as Unix timestamp, when reading from Redis
+        bucket_seconds (int): Downsampling bucket size, when reading from Redis
+        aggregation (str): Price of a downsampled bucket (default: 'last')
         
     Returns:
         pd.DataFrame: DataFrame with price data
     """
-    # Extract relevant data
-    data = []
-    for item in price_history:
-        data.append({
-            'timestamp': item['timestamp'],
-            'price': item[currency],
-            'market_cap': item.get(f"{currency}_market_cap"),
-            'volume_24h': item.get(f"{currency}_24h_vol"),
-            'change_24h': item.get(f"{currency}_24h_change")
+    if isinstance(price_history, redis.Redis):
+        records = get_price_records(price_history, start_time, end_time, currency,
+                                    bucket_seconds=bucket_seconds, aggregation=aggregation)
+        # Convert the big-endian fields to native arrays
+        df = pd.DataFrame({
+            name: records[name].astype(PRICE_RECORD_DTYPE[name].newbyteorder('='))
+            for name in ['timestamp', 'price', 'market_cap', 'volume_24h', 'change_24h']
         })
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
+    else:
+        # Extract relevant data
+        data = []
+        for item in price_history:
+            data.append({
+                'timestamp': item['timestamp'],
+                'price': item[currency],
+                'market_cap': item.get(f"{currency}_market_cap"),
+                'volume_24h': item.get(f"{currency}_24h_vol"),
+                'change_24h': item.get(f"{currency}_24h_change")
+            })
+        
+        # Create DataFrame
+        df = pd.DataFrame(data)
     
     # Convert timestamp to datetime
     df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
@@ -397,11 +602,8 @@ def collect_bitcoin_data(redis_conn: redis.Redis, interval: int = 60,
             # Fetch Bitcoin price data
             price_data = fetch_bitcoin_price(currency)
             
-            # Store in Redis
-            store_bitcoin_price(redis_conn, price_data, currency)
-            
-            # Publish price update
-            publish_price_update(redis_conn, price_data)
+            # Store in Redis and publish the price update in one round trip
+            store_bitcoin_price(redis_conn, price_data, currency, channel='bitcoin_price_updates')
             
             # Wait for next interval
             time.sleep(interval)
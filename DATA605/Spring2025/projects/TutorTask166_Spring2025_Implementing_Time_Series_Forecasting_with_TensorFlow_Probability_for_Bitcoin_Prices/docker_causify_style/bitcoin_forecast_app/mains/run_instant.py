@@ -386,11 +386,9 @@ class BitcoinForecastApp:
                     
                     # Update model with the actual price for continuous learning
                     try:
-                        # Add the actual price to the end of the price series
-                        updated_series = np.append(price_series, actual_price)
-                        
-                        # Use the update method to incorporate the new observation
-                        self.model.update(updated_series[-60:])  # Use the last 60 points for efficiency
+                        # The model keeps its own history buffer, so only the new
+                        # observation is passed
+                        self.model.update(actual_price)
                         self.logger.debug("Updated model with actual price for continuous learning")
                     except Exception as update_error:
                         self.logger.warning(f"Could not update model with actual price: {update_error}")
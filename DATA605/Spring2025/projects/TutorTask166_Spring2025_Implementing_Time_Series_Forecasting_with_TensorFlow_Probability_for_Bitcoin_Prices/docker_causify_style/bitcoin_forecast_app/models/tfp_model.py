@@ -113,10 +113,30 @@ class BitcoinForecastModel:
         # Get VI steps from config
         self.vi_steps = model_config.get('vi_steps', 100)
 
-        # # Add missing attributes for history size management
-        # self.max_history_size = model_config.get('max_history_size', 1000)
-        # self.min_points_req = model_config.get('min_points_req', 10)
-        # self.num_variational_steps = model_config.get('vi_steps', 100)
+        # History size management
+        self.max_history_size = model_config.get('max_history_size', 1000)
+        self.min_points_req = model_config.get('min_points_req', 10)
+        self.num_variational_steps = model_config.get('vi_steps', 100)
+
+        # Online updates: once the history buffer is full, each new tick runs
+        # a few warm-started VI steps on the current model instead of
+        # rebuilding and refitting it
+        self.online_vi_steps = model_config.get('online_vi_steps', 5)
+        # Z-score of a tick w.r.t. the last forecast above which the tick is
+        # treated as a regime change and the model is fully rebuilt
+        self.regime_change_z = model_config.get('regime_change_z', 4.0)
+        # Ticks after which the model is rebuilt anyway to refresh the priors
+        # that depend on the data (e.g., the initial level)
+        self.rebuild_interval = model_config.get(
+            'rebuild_interval', self.max_history_size)
+
+        # Fixed-capacity ring buffer with the most recent observations
+        self._history_buffer = np.zeros(self.max_history_size, dtype=np.float64)
+        self._history_size = 0
+        self._history_pos = 0
+        self._ticks_since_rebuild = 0
+        self._online_vi_step = None
+
         # Store num_samples for forecasting
         self.num_samples = model_config.get('num_samples', 50)
 
@@ -664,6 +684,8 @@ class BitcoinForecastModel:
         
             # Convert to tensor and ensure float64
             self.observed_time_series = processed_data
+            # Seed the history buffer used by `update()`
+            self._reset_history(processed_data.numpy())
 
             # Choose between MCMC or Variational Inference
             # Only use MCMC with sufficient data
@@ -1158,20 +1180,19 @@ class BitcoinForecastModel:
                         volatility_increased = True
                         print(f"Volatility increase detected: {(new_std/recent_std-1)*100:.1f}%. Using enhanced update.")
 
-            # Append new data to observed time series
-            if self.observed_time_series is None:
-                self.observed_time_series = tf.convert_to_tensor(new_data, dtype=tf.float64)
-            else:
-                # Append the new data, ensuring it's a tensor
-                new_data_tensor = tf.convert_to_tensor(new_data, dtype=tf.float64)
-                self.observed_time_series = tf.concat(
-                    [self.observed_time_series, new_data_tensor], axis=0)
-            
-            # Limit dataset size to prevent unbounded growth
-            if len(self.observed_time_series) > self.max_history_size:
-                # Keep more recent data for crypto (more relevant for prediction)
-                print(f"Limiting history to {self.max_history_size} points")
-                self.observed_time_series = self.observed_time_series[-self.max_history_size:]
+            # Check the new price against the last forecast before storing it
+            regime_change = self._is_regime_change(new_data[-1])
+
+            # Append new data to the fixed-capacity history buffer, which
+            # drops the oldest points once it is full
+            self._append_to_history(new_data)
+            self.observed_time_series = tf.convert_to_tensor(
+                self._get_history(), dtype=tf.float64)
+
+            # Fast path: a few warm-started VI steps on the current model
+            if not regime_change and self._can_update_online():
+                return self._update_online(
+                    len(new_data), significant_change or volatility_increased)
 
             # Store the number of timesteps
             self.num_timesteps = len(self.observed_time_series)
@@ -1180,6 +1201,8 @@ class BitcoinForecastModel:
             preprocessed_data = self.preprocess_data(self.observed_time_series)
             if preprocessed_data is not None:
                 self.observed_time_series = preprocessed_data
+                # Keep the cleaned values for the next online updates
+                self._reset_history(preprocessed_data.numpy())
             
             # Verify that we have sufficient data for model fitting
             if len(self.observed_time_series) < self.min_points_req:
@@ -1232,6 +1255,147 @@ class BitcoinForecastModel:
             print(f"Error updating model: {e}\n{traceback.format_exc()}")
             return False
 
+    def _reset_history(self, data):
+        """
+        Replace the history buffer with the most recent points of `data` and
+        restart the online updates from the current model.
+
+        Args:
+            data: Array of observations
+        """
+        data = np.asarray(data, dtype=np.float64).ravel()[-self.max_history_size:]
+        self._history_buffer[:len(data)] = data
+        self._history_size = len(data)
+        self._history_pos = len(data) % self.max_history_size
+        self._ticks_since_rebuild = 0
+        self._online_vi_step = None
+
+    def _append_to_history(self, new_data):
+        """
+        Append observations to the ring buffer, overwriting the oldest ones
+        once it is full. The cost depends only on the number of new points.
+
+        Args:
+            new_data: Array of new observations
+        """
+        for value in np.asarray(new_data, dtype=np.float64).ravel():
+            self._history_buffer[self._history_pos] = value
+            self._history_pos = (self._history_pos + 1) % self.max_history_size
+            self._history_size = min(self._history_size + 1, self.max_history_size)
+
+    def _get_history(self):
+        """
+        Get the buffered observations in chronological order.
+
+        Returns:
+            Array with at most `max_history_size` observations
+        """
+        if self._history_size < self.max_history_size:
+            return self._history_buffer[:self._history_size].copy()
+        # The oldest point is the next one to be overwritten
+        return np.concatenate((
+            self._history_buffer[self._history_pos:],
+            self._history_buffer[:self._history_pos]))
+
+    def _is_regime_change(self, new_price):
+        """
+        Check whether a new price is too far from the last forecast for the
+        current model to absorb it with a few VI steps.
+
+        Args:
+            new_price: New observed price
+
+        Returns:
+            True if the forecast error exceeds `regime_change_z` forecast stds
+        """
+        if self.last_mean is None or self.last_upper is None:
+            return False
+        # `forecast()` returns mean +- 2.58 std
+        scale = (self.last_upper - self.last_lower) / (2 * 2.58)
+        if scale <= 0:
+            return False
+        z_score = abs(extract_scalar_from_prediction(new_price) - self.last_mean) / scale
+        if z_score > self.regime_change_z:
+            print(f"Regime change detected (z-score={z_score:.1f}). Rebuilding model.")
+            return True
+        return False
+
+    def _can_update_online(self):
+        """
+        Check whether the next update can reuse the current model and
+        posterior.
+
+        The posterior must be a variational one and the history must hold at
+        least `min_points_req` points, i.e., the minimum window the model is
+        fitted on. The buffer doesn't need to be full: while it fills up the
+        window grows by one point per tick and the compiled VI step is traced
+        with a relaxed shape (see `_build_online_vi_step()`).
+        """
+        return (
+            self.model is not None
+            and not self.use_mcmc
+            and hasattr(self.posterior, 'trainable_variables')
+            and self._history_size >= self.min_points_req
+            and self._ticks_since_rebuild < self.rebuild_interval
+        )
+
+    def _build_online_vi_step(self):
+        """
+        Build a compiled VI step that continues optimizing the current
+        surrogate posterior on a new window of observations.
+
+        The window is an argument of the function. Once the buffer is full it
+        always has `max_history_size` points; while the buffer fills up its
+        length changes at every tick, and `reduce_retracing` generalizes the
+        traced shape after the first retrace instead of tracing once per
+        length.
+        """
+        model = self.model
+        surrogate = self.posterior
+        optimizer = tf.keras.optimizers.legacy.Adam(learning_rate=self.learning_rate)
+
+        @tf.function(reduce_retracing=True)
+        def online_vi_step(observed_time_series):
+            def target_log_prob_fn(**params):
+                return model.joint_distribution(
+                    observed_time_series=observed_time_series
+                ).log_prob(**params)
+
+            with tf.GradientTape() as tape:
+                loss = tfp.vi.monte_carlo_variational_loss(
+                    target_log_prob_fn, surrogate, sample_size=1)
+            grads = tape.gradient(loss, surrogate.trainable_variables)
+            grads, _ = tf.clip_by_global_norm(grads, 5.0)
+            optimizer.apply_gradients(zip(grads, surrogate.trainable_variables))
+            return loss
+
+        return online_vi_step
+
+    def _update_online(self, num_new_points, boost_steps):
+        """
+        Incorporate new observations by running a few VI steps warm-started
+        from the current surrogate posterior, without rebuilding the model.
+
+        Args:
+            num_new_points: Number of observations added to the buffer
+            boost_steps: Whether to run more steps (e.g., after a large move)
+
+        Returns:
+            True if the update succeeded
+        """
+        if self._online_vi_step is None:
+            self._online_vi_step = self._build_online_vi_step()
+        vi_steps = self.online_vi_steps * (2 if boost_steps else 1)
+        for _ in range(vi_steps):
+            loss = self._online_vi_step(self.observed_time_series)
+        self._ticks_since_rebuild += 1
+        print(
+            f"[{datetime.now().isoformat()}] Online update of model v{self.model_version} "
+            f"with {num_new_points} new data points and {vi_steps} VI steps, loss={loss.numpy():.4f}")
+        # Simulate an immediate forecast to update internal stat tracking
+        self.forecast()
+        return True
+
     def _fallback_forecast(self):
         """
         Create a fallback forecast when the primary model fails.
@@ -10,8 +10,10 @@ import time
 from kafka import KafkaProducer
 import json
 import traceback
+import atexit
 from utilities.timestamp_format import to_iso8601
 from utilities.logger import get_logger
+from src.trainers.result_sink import BatchedResultSink, KafkaRetryBuffer
 
 class InstantTrainer:
     def __init__(
@@ -49,10 +51,42 @@ class InstantTrainer:
             bootstrap_servers=self.kafka_bootstrap_servers,
             value_serializer=lambda x: json.dumps(x).encode('utf-8')
         )
+
+        # Predictions and metrics are written in batches by a background
+        # thread, so the prediction loop does no file I/O
+        instant_data_config = config['data']['predictions']['instant_data']
+        self.sink = BatchedResultSink(
+            {
+                'predictions': (
+                    self.predictions_file,
+                    config['data_format']['columns']['predictions']['names']),
+                'metrics': (
+                    self.metrics_file,
+                    config['data_format']['columns']['metrics']['names']),
+            },
+            flush_size=instant_data_config.get('flush_size', 100),
+            flush_interval=instant_data_config.get('flush_interval', 5.0),
+            logger=self.logger,
+        )
+        self.sink.start()
+        # Failed Kafka messages are kept in memory and spilled to disk only
+        # when there are too many of them
+        self.kafka_retry = KafkaRetryBuffer(
+            spill_file="kafka_failed_buffer.jsonl", logger=self.logger)
+        # Write the rows still queued when the process exits
+        atexit.register(self.close)
         
         self.logger.info(f"Initialized trainer with predictions file: {self.predictions_file}")
         self.logger.info(f"Initialized trainer with metrics file: {self.metrics_file}")
 
+    def close(self):
+        """Write the queued rows and wait for the pending Kafka sends."""
+        self.sink.close()
+        try:
+            self.producer.flush(timeout=5)
+        except Exception as e:
+            self.logger.error(f"Error flushing Kafka producer: {e}")
+
     def evaluate_model(self, series: pd.DataFrame, forecast_dist) -> Dict[str, float]:
         """
         Evaluate model performance on historical data.
@@ -74,113 +108,68 @@ class InstantTrainer:
         }
 
     def save_metrics(self, timestamp, std, mae, rmse):
-        """Save metrics to CSV file using config-driven columns."""
+        """Queue metrics to be written to the CSV file with config-driven columns."""
         try:
-            metrics_cols = self.config['data_format']['columns']['metrics']['names']
             metrics_row = {
                 'timestamp': to_iso8601(timestamp),
                 'std': float(std),
                 'mae': float(mae),
                 'rmse': float(rmse)
             }
-            df = pd.DataFrame([metrics_row], columns=metrics_cols)
-            os.makedirs(os.path.dirname(self.metrics_file), exist_ok=True)
-            with open(self.metrics_file, 'a' if os.path.exists(self.metrics_file) else 'w') as f:
-                import fcntl
-                fcntl.flock(f, fcntl.LOCK_EX)
-                try:
-                    if f.tell() == 0:
-                        df.to_csv(f, index=False)
-                    else:
-                        df.to_csv(f, mode='a', header=False, index=False)
-                finally:
-                    fcntl.flock(f, fcntl.LOCK_UN)
-            self.logger.info(f"Saved metrics for {timestamp}")
+            if not self.sink.put('metrics', metrics_row):
+                raise RuntimeError("Result queue is full")
+            self.logger.debug(f"Queued metrics for {timestamp}")
         except Exception as e:
             self.logger.error(f"Error saving metrics: {e}")
             raise
 
     def save_prediction(self, timestamp, actual_price, predicted_price, confidence_interval):
-        """Save prediction to CSV file using config-driven columns."""
+        """Queue a prediction to be written to the CSV file with config-driven columns."""
+        pred_row = None
         try:
-            pred_cols = self.config['data_format']['columns']['predictions']['names']
             pred_row = {
                 'timestamp': to_iso8601(timestamp),
                 'pred_price': float(predicted_price),
                 'pred_lower': float(confidence_interval[0]),
                 'pred_upper': float(confidence_interval[1])
             }
-            df = pd.DataFrame([pred_row], columns=pred_cols)
-            os.makedirs(os.path.dirname(self.predictions_file), exist_ok=True)
-            with open(self.predictions_file, 'a' if os.path.exists(self.predictions_file) else 'w') as f:
-                import fcntl
-                fcntl.flock(f, fcntl.LOCK_EX)
-                try:
-                    if f.tell() == 0:
-                        df.to_csv(f, index=False)
-                    else:
-                        df.to_csv(f, mode='a', header=False, index=False)
-                finally:
-                    fcntl.flock(f, fcntl.LOCK_UN)
-            self.logger.info(f"Saved prediction for {timestamp}")
+            if not self.sink.put('predictions', pred_row):
+                raise RuntimeError("Result queue is full")
+            self.logger.debug(f"Queued prediction for {timestamp}")
         except Exception as e:
             self.logger.error(f"Error saving prediction: {e}\nData: {pred_row}\n{traceback.format_exc()}")
             raise
 
     def append_to_csv(self, data, filename):
-        """Append data to CSV file, creating it if it doesn't exist."""
+        """Queue data to be appended to a CSV file, creating it if it doesn't exist."""
         try:
-            # Create DataFrame from data
-            df = pd.DataFrame([data])
-            
             # Filter columns based on file type
             if 'predictions' in filename:
                 # For predictions file: timestamp, mean, lower, upper
                 # pred_cols = self.config['data_format']['columns']['predictions']['names']  # TODO: the naming in config is different from the metadata keys defined above, thus hard code here
-                df = df[['timestamp', 'mean', 'lower', 'upper']]
+                columns = ['timestamp', 'mean', 'lower', 'upper']
             elif 'metrics' in filename:
                 # For metrics file: timestamp, std, mae, rmse
                 # metrics_cols = self.config['data_format']['columns']['metrics']['names']  # TODO: the naming in config is different from the metadata keys defined above, thus hard code here
-                df = df[['timestamp', 'std', 'mae', 'rmse']]
-            
-            if not os.path.exists(filename):
-                df.to_csv(filename, index=False)
-                self.logger.info(f"Created new file: {filename}")
+                columns = ['timestamp', 'std', 'mae', 'rmse']
             else:
-                df.to_csv(filename, mode='a', header=False, index=False)
-                self.logger.debug(f"Appended data to: {filename}")
+                columns = list(data.keys())
+            # Each file is an output of the sink, registered on first use
+            self.sink.add_output(filename, filename, columns)
+            if not self.sink.put(filename, data):
+                self.logger.error(f"Result queue is full, dropped row for {filename}")
         except Exception as e:
             self.logger.error(f"Error appending to {filename}: {str(e)}")
 
     def buffer_kafka_message(self, message):
-        buffer_file = "kafka_failed_buffer.jsonl"
-        try:
-            with open(buffer_file, "a") as f:
-                f.write(json.dumps(message) + "\n")
-            self.logger.warning("Buffered Kafka message to disk.")
-        except Exception as e:
-            self.logger.error(f"Failed to buffer Kafka message: {e}")
+        """Keep a message that failed to be sent, to be retried later."""
+        self.kafka_retry.add(message)
+        self.logger.warning(
+            f"Buffered Kafka message ({self.kafka_retry.queue_depth} pending).")
 
     def resend_buffered_kafka_messages(self):
-        buffer_file = "kafka_failed_buffer.jsonl"
-        if not os.path.exists(buffer_file):
-            return
-        lines_to_keep = []
-        try:
-            with open(buffer_file, "r") as f:
-                for line in f:
-                    try:
-                        msg = json.loads(line)
-                        self.producer.send(self.kafka_topic, value=msg)
-                        self.producer.flush()
-                    except Exception as e:
-                        self.logger.error(f"Failed to resend buffered Kafka message: {e}")
-                        lines_to_keep.append(line)
-            # Rewrite buffer file with unsent messages
-            with open(buffer_file, "w") as f:
-                f.writelines(lines_to_keep)
-        except Exception as e:
-            self.logger.error(f"Error processing Kafka buffer file: {e}")
+        """Resend the buffered Kafka messages; a no-op when there are none."""
+        self.kafka_retry.retry(self.producer, self.kafka_topic)
 
     def backup_failed_row(self, row, backup_file, kind='predictions'):
         try:
@@ -288,15 +277,14 @@ class InstantTrainer:
                         kind='metrics'
                     )
 
-                # Send to Kafka with error handling and buffer fallback
-                try:
-                    self.producer.send(self.kafka_topic, value=metadata)
-                    self.producer.flush()
-                except Exception as e:
-                    self.logger.error(f"Error sending to Kafka: {e}")
-                    self.buffer_kafka_message(metadata)
+                # Send to Kafka without waiting for the ack: failed sends are
+                # buffered by the error callback and retried later
+                self.kafka_retry.send(self.producer, self.kafka_topic, metadata)
 
-                self.logger.info(f"Prediction made for {current_time}: mean={metadata['mean']:.2f}, std={metadata['std']:.2f}")
+                self.logger.info(
+                    f"Prediction made for {current_time}: mean={metadata['mean']:.2f}, std={metadata['std']:.2f}, "
+                    f"result queue depth={self.sink.queue_depth}, "
+                    f"Kafka retry queue depth={self.kafka_retry.queue_depth}")
 
                 time.sleep(1)
 
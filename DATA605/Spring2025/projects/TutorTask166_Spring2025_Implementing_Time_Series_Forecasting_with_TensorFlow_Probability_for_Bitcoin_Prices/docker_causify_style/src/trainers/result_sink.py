@@ -0,0 +1,324 @@
+"""
+Asynchronous, batched sinks for the outputs of the instant trainer.
+
+- `BatchedResultSink` queues prediction / metric rows in memory and writes
+  them from a background thread in batches (by size or time), keeping one
+  open handle per output file, so that the prediction loop does no file I/O.
+- `KafkaRetryBuffer` keeps the messages that failed to be sent in memory,
+  coalescing retries of the same message, and spills them to a JSONL file
+  only when the in-memory buffer is full.
+"""
+import collections
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from utilities.logger import get_logger
+
+
+class BatchedResultSink:
+    """
+    Write rows to CSV or Parquet files in batches from a background thread.
+
+    Usage:
+        sink = BatchedResultSink({'predictions': ('predictions.csv', pred_cols)})
+        sink.start()
+        sink.put('predictions', row)   # Never touches the file system
+        ...
+        sink.close()                   # Flushes the pending rows
+    """
+
+    def __init__(
+        self,
+        outputs: Dict[str, tuple],
+        flush_size: int = 100,
+        flush_interval: float = 5.0,
+        max_queue_size: int = 100000,
+        logger=None,
+    ):
+        """
+        Args:
+            outputs: Output name -> (file path, columns); files ending in
+                `.parquet` are written as Parquet, the others as CSV
+            flush_size: Number of pending rows of an output that triggers a write
+            flush_interval: Max seconds a row waits before being written
+            max_queue_size: Max number of queued rows; `put()` drops rows
+                (and counts them) beyond this, instead of blocking the caller
+            logger: Logger to use
+        """
+        self.outputs = dict(outputs)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        # Rows read from the queue and not yet written, only accessed by the
+        # writer thread
+        self._pending: Dict[str, List[dict]] = collections.defaultdict(list)
+        # Open file handles / Parquet writers, created on the first write
+        self._handles: Dict[str, object] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.num_flushes = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of rows queued and not yet written."""
+        return self._queue.qsize() + sum(
+            len(rows) for rows in list(self._pending.values()))
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters for monitoring."""
+        return {
+            'queue_depth': self.queue_depth,
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'num_flushes': self.num_flushes,
+        }
+
+    def start(self):
+        """Start the writer thread."""
+        if self._thread is not None:
+            return
+        for path, _ in self.outputs.values():
+            dir_name = os.path.dirname(path)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name="batched-result-sink", daemon=True)
+        self._thread.start()
+
+    def add_output(self, name: str, path: str, columns: List[str]):
+        """Register an output, if not already registered."""
+        if name in self.outputs:
+            return
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        self.outputs[name] = (path, columns)
+
+    def put(self, name: str, row: dict) -> bool:
+        """
+        Queue a row for an output without blocking.
+
+        Returns:
+            False if the queue is full and the row was dropped
+        """
+        try:
+            self._queue.put_nowait((name, row))
+            return True
+        except queue.Full:
+            self.rows_dropped += 1
+            return False
+
+    def close(self, timeout: float = 10.0):
+        """Stop the writer thread, write the pending rows and close the files."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for handle in self._handles.values():
+            try:
+                handle.close()
+            except Exception as e:
+                self.logger.error(f"Error closing output: {e}")
+        self._handles = {}
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            stopping = self._stop_event.is_set()
+            # Wait for rows until the next scheduled flush
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                name, row = self._queue.get(timeout=min(timeout, 0.5))
+                self._pending[name].append(row)
+                # Drain what is already queued without waiting
+                while True:
+                    name, row = self._queue.get_nowait()
+                    self._pending[name].append(row)
+            except queue.Empty:
+                pass
+            is_due = time.monotonic() - last_flush >= self.flush_interval
+            for name, rows in list(self._pending.items()):
+                if rows and (is_due or stopping or len(rows) >= self.flush_size):
+                    self._flush(name)
+            if is_due:
+                last_flush = time.monotonic()
+            if stopping and self._queue.empty():
+                break
+
+    def _flush(self, name: str):
+        rows = self._pending[name]
+        self._pending[name] = []
+        path, columns = self.outputs[name]
+        try:
+            df = pd.DataFrame(rows, columns=columns)
+            if path.endswith('.parquet'):
+                self._write_parquet(name, path, df)
+            else:
+                self._write_csv(name, path, df)
+            self.rows_written += len(rows)
+            self.num_flushes += 1
+            self.logger.debug(f"Wrote {len(rows)} rows to {path}")
+        except Exception as e:
+            self.logger.error(f"Error writing {len(rows)} rows to {path}: {e}")
+
+    def _write_csv(self, name: str, path: str, df: pd.DataFrame):
+        handle = self._handles.get(name)
+        if handle is None:
+            handle = open(path, 'a', newline='')
+            self._handles[name] = handle
+        # Lock the file only once per batch, for the readers of the CSV
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            df.to_csv(handle, header=handle.tell() == 0, index=False)
+            handle.flush()
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _write_parquet(self, name: str, path: str, df: pd.DataFrame):
+        # Only needed for Parquet outputs
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        writer = self._handles.get(name)
+        if writer is None:
+            # A Parquet file cannot be appended to once closed, so each run
+            # writes a new file next to the configured one
+            if os.path.exists(path):
+                root, ext = os.path.splitext(path)
+                path = f"{root}.{int(time.time())}{ext}"
+            writer = pq.ParquetWriter(path, table.schema)
+            self._handles[name] = writer
+        else:
+            # E.g., a column with only NaNs in a batch is inferred as null
+            table = table.cast(writer.schema)
+        # Each batch becomes a row group
+        writer.write_table(table)
+
+
+class KafkaRetryBuffer:
+    """
+    Keep the Kafka messages that failed to be sent and retry them.
+
+    Messages with the same key (e.g., the prediction timestamp) are coalesced,
+    so only the latest version of each is retried. When more than
+    `max_in_memory` messages are pending, the oldest are spilled to
+    `spill_file`, which is read back only when there is something in it.
+    """
+
+    def __init__(
+        self,
+        spill_file: str = "kafka_failed_buffer.jsonl",
+        max_in_memory: int = 10000,
+        key_field: str = 'timestamp',
+        retry_interval: float = 10.0,
+        logger=None,
+    ):
+        """
+        Args:
+            spill_file: JSONL file for the messages that do not fit in memory
+            max_in_memory: Max number of messages kept in memory
+            key_field: Message field used to coalesce retries of a message
+            retry_interval: Min seconds between two rounds of retries
+            logger: Logger to use
+        """
+        self.spill_file = spill_file
+        self.max_in_memory = max_in_memory
+        self.key_field = key_field
+        self.retry_interval = retry_interval
+        self._last_retry = 0.0
+        self.logger = logger if logger is not None else get_logger(__name__)
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Number of messages in the spill file, tracked in memory so that an
+        # empty buffer costs no syscall
+        self._num_spilled = 0
+        if os.path.exists(spill_file):
+            with open(spill_file) as f:
+                self._num_spilled = sum(1 for _ in f)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of messages waiting to be resent."""
+        return len(self._pending) + self._num_spilled
+
+    def add(self, message: dict):
+        """Store a message that failed to be sent. Thread-safe."""
+        key = message.get(self.key_field) if isinstance(message, dict) else None
+        if key is None:
+            key = json.dumps(message, sort_keys=True, default=str)
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = message
+            if len(self._pending) > self.max_in_memory:
+                self._spill()
+
+    def retry(self, producer, topic: str) -> int:
+        """
+        Resend the pending messages asynchronously.
+
+        Messages that fail again are added back to the buffer by the error
+        callback of the send.
+
+        Returns:
+            Number of messages handed to the producer
+        """
+        if self.queue_depth == 0:
+            return 0
+        now = time.monotonic()
+        if now - self._last_retry < self.retry_interval:
+            return 0
+        self._last_retry = now
+        with self._lock:
+            messages = list(self._pending.values())
+            self._pending.clear()
+            messages = self._load_spilled() + messages
+        for message in messages:
+            self.send(producer, topic, message)
+        self.logger.info(f"Resending {len(messages)} buffered Kafka messages")
+        return len(messages)
+
+    def send(self, producer, topic: str, message: dict):
+        """Send a message without blocking, buffering it if the send fails."""
+        try:
+            future = producer.send(topic, value=message)
+            future.add_errback(lambda e: self._on_send_error(message, e))
+        except Exception as e:
+            self._on_send_error(message, e)
+
+    def _on_send_error(self, message: dict, error):
+        self.logger.error(f"Error sending to Kafka: {error}")
+        self.add(message)
+
+    def _spill(self):
+        # Move the older half to disk to amortize the write
+        num_to_spill = len(self._pending) - self.max_in_memory // 2
+        with open(self.spill_file, 'a') as f:
+            for _ in range(num_to_spill):
+                _, message = self._pending.popitem(last=False)
+                f.write(json.dumps(message, default=str) + "\n")
+        self._num_spilled += num_to_spill
+        self.logger.warning(f"Spilled {num_to_spill} Kafka messages to {self.spill_file}")
+
+    def _load_spilled(self) -> List[dict]:
+        if self._num_spilled == 0:
+            return []
+        messages = []
+        try:
+            with open(self.spill_file) as f:
+                messages = [json.loads(line) for line in f if line.strip()]
+            os.remove(self.spill_file)
+            self._num_spilled = 0
+        except Exception as e:
+            self.logger.error(f"Error reading Kafka spill file: {e}")
+        return messages
@@ -1,15 +1,16 @@
 import os
 from datetime import datetime
-import pyarrow.parquet as pq
 
 from utils import (
     fetch_and_append_new_data,
     calculate_moving_average,
     detect_anomalies,
-    save_to_parquet,
     create_log_entry,
     append_log_entry,
-    generate_forecast_report
+    generate_forecast_report,
+    get_dataset_row_count,
+    migrate_parquet_to_dataset,
+    read_dataset
 )
 
 # 🔐 Import API key from config
@@ -18,27 +19,27 @@ try:
 except ImportError:
     raise ImportError("Missing COINGECKO_API_KEY in config.py")
 
-PARQUET_PATH = "/workspace/bitcoin-pyarrow/data_ingestion/datalake/bitcoin_price_stream.parquet"
+# Single-file history of the previous versions, migrated once to the dataset
+LEGACY_PARQUET_PATH = "/workspace/bitcoin-pyarrow/data_ingestion/datalake/bitcoin_price_stream.parquet"
+DATASET_PATH = "/workspace/bitcoin-pyarrow/data_ingestion/datalake/bitcoin_price_stream"
 LOG_PATH = "data_ingestion/datalake/load_log.parquet"
 REPORT_PATH = "data_ingestion/reports/forecast_report.html"
 
 print("🚀 Starting container and updating from last available timestamp...")
 
-# Track previous row count
-try:
-    previous_table = pq.read_table(PARQUET_PATH)
-    previous_row_count = previous_table.num_rows
-except Exception:
-    previous_row_count = 0
+if not os.path.isdir(DATASET_PATH) and os.path.isfile(LEGACY_PARQUET_PATH):
+    migrate_parquet_to_dataset(LEGACY_PARQUET_PATH, DATASET_PATH)
+
+# Track previous row count (from the dataset manifest)
+previous_row_count = get_dataset_row_count(DATASET_PATH)
 
-# Step 1: Fetch new data
-fetch_and_append_new_data(api_key=COINGECKO_API_KEY, parquet_path=PARQUET_PATH)
+# Step 1: Fetch new data, appended as new files of the dataset
+fetch_and_append_new_data(api_key=COINGECKO_API_KEY, parquet_path=DATASET_PATH)
 
-# Step 2: Re-load and post-process the full table
-table = pq.read_table(PARQUET_PATH)
+# Step 2: Load and post-process the full table (derived columns are not stored)
+table = read_dataset(DATASET_PATH)
 table = calculate_moving_average(table)
 table = detect_anomalies(table)
-save_to_parquet(table, PARQUET_PATH)
 
 # Step 3: Log the update
 new_row_count = table.num_rows - previous_row_count
@@ -1,10 +1,14 @@
 import requests
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
 from datetime import datetime, timedelta
-import statistics
+import glob
+import json
 import os
+import uuid
 import matplotlib.pyplot as plt
 from statsmodels.tsa.arima.model import ARIMA
 
@@ -13,36 +17,148 @@ def arrowify_data(data_dict: dict) -> pa.Table:
     batch = {k: [v] for k, v in data_dict.items()}
     return pa.table(batch)
 
+# The price history is a Hive-partitioned Parquet dataset: each refresh adds
+# new files under `date=YYYY-MM-DD/` instead of rewriting the history, and a
+# small manifest keeps the max timestamp and row count so that a refresh never
+# has to scan the existing data.
+MANIFEST_NAME = "_manifest.json"
+PARTITION_COL = "date"
+
+
 def calculate_moving_average(table: pa.Table, window_size: int = 3) -> pa.Table:
-    prices = table.column("price_usd").to_pylist()
-    ma = [None if i < window_size - 1 else
-          round(sum(prices[i - window_size + 1:i + 1]) / window_size, 2)
-          for i in range(len(prices))]
-    return table.append_column("moving_average", pa.array(ma))
+    # Rolling mean from the differences of the cumulative sum
+    prices = pc.cast(table.column("price_usd"), pa.float64()).combine_chunks()
+    n = len(prices)
+    if n < window_size:
+        ma = pa.nulls(n, pa.float64())
+    else:
+        csum = pc.cumulative_sum(prices)
+        lower = pa.concat_arrays([pa.array([0.0]), csum.slice(0, n - window_size)])
+        window_sum = pc.subtract(csum.slice(window_size - 1), lower)
+        ma = pa.concat_arrays([
+            pa.nulls(window_size - 1, pa.float64()),
+            pc.round(pc.divide(window_sum, window_size), 2),
+        ])
+    return table.append_column("moving_average", ma)
 
 def detect_anomalies(table: pa.Table, threshold: float = 2.0) -> pa.Table:
-    prices = table.column("price_usd").to_pylist()
-    mean = statistics.mean(prices)
-    stdev = statistics.stdev(prices) if len(prices) > 1 else 0
-    anomalies = [abs((p - mean) / stdev) > threshold if stdev else False for p in prices]
-    return table.append_column("is_anomaly", pa.array(anomalies))
+    prices = pc.cast(table.column("price_usd"), pa.float64())
+    mean = pc.mean(prices)
+    stdev = pc.stddev(prices, ddof=1) if len(prices) > 1 else pa.scalar(0.0)
+    if not stdev.is_valid or stdev.as_py() == 0:
+        anomalies = pa.array([False] * len(prices))
+    else:
+        z_scores = pc.divide(pc.subtract(prices, mean), stdev)
+        anomalies = pc.greater(pc.abs(z_scores), threshold)
+    return table.append_column("is_anomaly", anomalies)
 
 def save_to_parquet(table: pa.Table, path: str) -> None:
     pq.write_table(table, path)
 
+def _read_manifest(dataset_path: str) -> dict:
+    try:
+        with open(os.path.join(dataset_path, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _write_manifest(dataset_path: str, manifest: dict) -> None:
+    path = os.path.join(dataset_path, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def _get_max_from_footers(paths, column: str = "timestamp"):
+    # Max of a column from the row group statistics, without reading the data
+    max_value = None
+    for path in paths:
+        metadata = pq.ParquetFile(path).metadata
+        col_idx = metadata.schema.to_arrow_schema().get_field_index(column)
+        stats = [metadata.row_group(i).column(col_idx).statistics
+                 for i in range(metadata.num_row_groups)]
+        if all(s is not None and s.has_min_max for s in stats):
+            values = [s.max for s in stats]
+        else:
+            # No statistics: read the column of this file
+            values = [pc.max(pq.read_table(path, columns=[column]).column(column)).as_py()]
+        for value in values:
+            if value is not None and (max_value is None or value > max_value):
+                max_value = value
+    return max_value
+
+def _get_dataset_files(dataset_path: str):
+    return sorted(glob.glob(os.path.join(dataset_path, f"{PARTITION_COL}=*", "*.parquet")))
+
 def get_latest_timestamp_from_parquet(parquet_path: str) -> datetime:
-    table = pq.read_table(parquet_path, columns=["timestamp"])
-    timestamps = table.column("timestamp").to_pylist()
-    return datetime.fromisoformat(max(timestamps))
+    # Works on a single Parquet file or on a partitioned dataset directory
+    if os.path.isdir(parquet_path):
+        latest = _read_manifest(parquet_path).get("max_timestamp")
+        if latest is None:
+            latest = _get_max_from_footers(_get_dataset_files(parquet_path))
+    else:
+        latest = _get_max_from_footers([parquet_path])
+    return datetime.fromisoformat(latest)
+
+def append_to_dataset(table: pa.Table, dataset_path: str) -> int:
+    # Write the new rows as new files under their date partitions
+    if table.num_rows == 0:
+        return 0
+    os.makedirs(dataset_path, exist_ok=True)
+    table = table.select(["timestamp", "price_usd"])
+    dates = pc.utf8_slice_codeunits(table.column("timestamp"), 0, 10)
+    pq.write_to_dataset(
+        table.append_column(PARTITION_COL, dates),
+        root_path=dataset_path,
+        partition_cols=[PARTITION_COL],
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+    )
+    manifest = _read_manifest(dataset_path)
+    if not manifest:
+        # E.g., first write, or manifest lost: rebuild it from the footers
+        files = _get_dataset_files(dataset_path)
+        manifest = {
+            "max_timestamp": _get_max_from_footers(files),
+            "num_rows": sum(pq.ParquetFile(f).metadata.num_rows for f in files),
+        }
+    else:
+        new_max = pc.max(table.column("timestamp")).as_py()
+        manifest["max_timestamp"] = max(filter(None, [manifest.get("max_timestamp"), new_max]))
+        manifest["num_rows"] = manifest.get("num_rows", 0) + table.num_rows
+    manifest["updated_at"] = datetime.utcnow().isoformat()
+    _write_manifest(dataset_path, manifest)
+    return table.num_rows
 
-def fetch_and_append_new_data(api_key: str, parquet_path: str):
+def read_dataset(dataset_path: str) -> pa.Table:
+    # Full price history sorted by time, without the partition column
+    # Files starting with "_" (e.g., the manifest) are ignored by the scan
+    dataset = ds.dataset(dataset_path, format="parquet", partitioning="hive")
+    table = dataset.to_table(columns=["timestamp", "price_usd"])
+    return table.sort_by("timestamp")
+
+def get_dataset_row_count(dataset_path: str) -> int:
+    if not os.path.isdir(dataset_path):
+        return 0
+    manifest = _read_manifest(dataset_path)
+    if "num_rows" in manifest:
+        return manifest["num_rows"]
+    return sum(pq.ParquetFile(f).metadata.num_rows for f in _get_dataset_files(dataset_path))
+
+def migrate_parquet_to_dataset(parquet_path: str, dataset_path: str) -> int:
+    # One-off conversion of the single-file history to the partitioned dataset
+    table = pq.read_table(parquet_path, columns=["timestamp", "price_usd"])
+    num_rows = append_to_dataset(table, dataset_path)
+    print(f"Migrated {num_rows} rows from {parquet_path} to {dataset_path}.")
+    return num_rows
+
+def fetch_and_append_new_data(api_key: str, parquet_path: str) -> int:
     last_timestamp = get_latest_timestamp_from_parquet(parquet_path)
     next_time = int((last_timestamp + timedelta(hours=1)).timestamp())
     now_time = int(datetime.utcnow().timestamp())
 
     if next_time >= now_time:
         print("No new data to fetch.")
-        return
+        return 0
 
     url = "https://api.coingecko.com/api/v3/coins/bitcoin/market_chart/range"
     headers = {"x-cg-demo-api-key": api_key}
@@ -65,14 +181,19 @@ def fetch_and_append_new_data(api_key: str, parquet_path: str):
     ]
 
     if records:
-        df = pd.DataFrame(records)
-        new_table = pa.Table.from_pandas(df)
-        existing_table = pq.read_table(parquet_path)
-        combined_table = pa.concat_tables([existing_table, new_table])
-        save_to_parquet(combined_table, parquet_path)
+        new_table = pa.Table.from_pylist(records)
+        if os.path.isdir(parquet_path):
+            append_to_dataset(new_table, parquet_path)
+        else:
+            # Single-file history: the whole file has to be rewritten
+            existing_table = pq.read_table(parquet_path)
+            combined_table = pa.concat_tables([existing_table, new_table], promote_options="default")
+            save_to_parquet(combined_table, parquet_path)
         print(f"Appended {len(records)} new rows.")
+        return len(records)
     else:
         print("No new records found.")
+        return 0
 
 def create_log_entry(timestamp: datetime, num_rows: int, source: str, status: str, message: str = "") -> pa.Table:
     data = {
@@ -85,12 +206,17 @@ def create_log_entry(timestamp: datetime, num_rows: int, source: str, status: st
     return pa.table(data)
 
 def append_log_entry(log_table: pa.Table, log_path: str = "load_log.parquet"):
-    if os.path.exists(log_path):
-        existing = pq.read_table(log_path)
-        combined = pa.concat_tables([existing, log_table])
-    else:
-        combined = log_table
-    pq.write_table(combined, log_path)
+    # The log is a directory with one small file per entry, so that logging
+    # does not rewrite the previous entries
+    if os.path.isfile(log_path):
+        # Move a single-file log into the directory as its first part
+        legacy_path = log_path + ".legacy"
+        os.replace(log_path, legacy_path)
+        os.makedirs(log_path)
+        os.replace(legacy_path, os.path.join(log_path, "part-0-legacy.parquet"))
+    os.makedirs(log_path, exist_ok=True)
+    entry_name = f"part-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}.parquet"
+    pq.write_table(log_table, os.path.join(log_path, entry_name))
     print("\n📋Loaded Log:")
     df = log_table.to_pandas()
     print(df.tail(10))
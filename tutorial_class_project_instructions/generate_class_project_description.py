@@ -9,16 +9,28 @@ file.
     --max_projects 3 \
     -v INFO
 
+# Generate concurrently, reusing the cached descriptions of unchanged rows.
+> project_description.py \
+    --markdown_path ./projects/MSML610_Projects.md \
+    --max_workers 8 \
+    --cache_path ./projects/MSML610_Projects.cache.jsonl
+
 Import as:
 
 import DATA605.project_description as dprodesc
 """
 
 import argparse
+import concurrent.futures
+import contextlib
+import hashlib
+import json
 import logging
+import os
 import pathlib
+import threading
 import time
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional
 
 import pandas as pd
 
@@ -72,6 +84,13 @@ DEFAULT_MARKDOWN_PATH = "./projects/MSML610_Projects.md"
 # The maximum number of projects.
 # Set the value to None to disable the limit.
 DEFAULT_MAX_PROJECTS = None
+# Parameters of the completions.
+MODEL = "gpt-4o-mini"
+MAX_TOKENS = 400
+TEMPERATURE = 0.3
+# Rate limits used in concurrent mode, below the OpenAI tier-1 limits.
+DEFAULT_REQUESTS_PER_MINUTE = 450
+DEFAULT_TOKENS_PER_MINUTE = 180_000
 
 
 def _read_google_sheet(url: str, secret_path: str) -> pd.DataFrame:
@@ -97,6 +116,27 @@ def _generate_project_description(project_name: str, difficulty: str) -> Any:
     :param difficulty: the difficulty level of the project
     :return: the project description
     """
+    prompt = _get_prompt(project_name, difficulty)
+    project_desc = hopenai.get_completion(
+        prompt,
+        system_prompt=GLOBAL_PROMPT,
+        model=MODEL,
+        cache_mode="FALLBACK",
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        print_cost=True,
+    )
+    return project_desc
+
+
+def _get_prompt(project_name: str, difficulty: str) -> str:
+    """
+    Build the user prompt for a project.
+
+    :param project_name: the name of the project
+    :param difficulty: the difficulty level of the project
+    :return: the prompt
+    """
     if False:
         # Potential (v3) prompt if needed to use.
         # Change False to True to use it.
@@ -119,16 +159,7 @@ def _generate_project_description(project_name: str, difficulty: str) -> Any:
         # while conveying the same information.
         prompt = f"Technology: {project_name}\nDifficulty: {difficulty}"
         # Short, to the point and concise. Saves the most tokens while achieving similar results.
-    project_desc = hopenai.get_completion(
-        prompt,
-        system_prompt=GLOBAL_PROMPT,
-        model="gpt-4o-mini",
-        cache_mode="FALLBACK",
-        temperature=0.3,
-        max_tokens=400,
-        print_cost=True,
-    )
-    return project_desc
+    return prompt
 
 
 def create_markdown_file(
@@ -163,6 +194,194 @@ def create_markdown_file(
     hio.to_file(markdown_path, content)
 
 
+# #############################################################################
+# _RateLimiter
+# #############################################################################
+
+
+class _RateLimiter:
+    """
+    Thread-safe limiter on requests and tokens per minute.
+
+    Each call to `acquire()` reserves one request and an estimate of its
+    tokens, blocking until both fit in the budget of the last minute.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        # Times and token counts of the requests in the last minute.
+        self._history: List[List[float]] = []
+
+    def acquire(self, num_tokens: int) -> None:
+        """
+        Block until a request of `num_tokens` tokens can be issued.
+        """
+        hdbg.dassert_lte(num_tokens, self._tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._history = [h for h in self._history if now - h[0] < 60]
+                used_tokens = sum(h[1] for h in self._history)
+                if (
+                    len(self._history) < self._requests_per_minute
+                    and used_tokens + num_tokens <= self._tokens_per_minute
+                ):
+                    self._history.append([now, num_tokens])
+                    return
+                # Wait until the oldest request leaves the window.
+                wait_sec = 60 - (now - self._history[0][0])
+            time.sleep(max(wait_sec, 0.01))
+
+
+# #############################################################################
+# _PromptCache
+# #############################################################################
+
+
+class _PromptCache:
+    """
+    Persistent cache of completions keyed by the hash of the full request.
+
+    The key covers the model, the parameters, and both prompts, so editing
+    `GLOBAL_PROMPT` or a row invalidates only the affected entries.
+
+    The file has one JSON entry per line and each completion is appended to
+    it, so storing a completion doesn't rewrite the whole cache.
+    """
+
+    def __init__(self, cache_path: str) -> None:
+        self._lock = threading.Lock()
+        self._cache: Dict[str, str] = {}
+        ends_with_newline = True
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                for line in f:
+                    ends_with_newline = line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        _LOG.warning("Skipping a truncated cache entry")
+                        continue
+                    # The last entry of a key wins.
+                    self._cache[entry["key"]] = entry["value"]
+        _LOG.info("Loaded %s cached completions", len(self._cache))
+        hio.create_enclosing_dir(cache_path, incremental=True)
+        self._file = open(cache_path, "a", encoding="utf-8")
+        if not ends_with_newline:
+            # Don't append to the line cut by an interrupted write.
+            self._file.write("\n")
+
+    @staticmethod
+    def get_key(prompt: str) -> str:
+        request = [MODEL, TEMPERATURE, MAX_TOKENS, GLOBAL_PROMPT, prompt]
+        key = hashlib.sha256(json.dumps(request).encode()).hexdigest()
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a completion and append it to the cache file.
+        """
+        with self._lock:
+            self._cache[key] = value
+            self._file.write(json.dumps({"key": key, "value": value}) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _generate_project_description_cached(
+    project_name: str,
+    difficulty: str,
+    cache: _PromptCache,
+    limiter: _RateLimiter,
+) -> str:
+    """
+    Generate a project description, reusing the cached one if present.
+
+    :param project_name: the name of the project
+    :param difficulty: the difficulty level of the project
+    :param cache: cache of the completions
+    :param limiter: rate limiter shared by the workers
+    :return: the project description
+    """
+    prompt = _get_prompt(project_name, difficulty)
+    key = cache.get_key(prompt)
+    project_desc = cache.get(key)
+    if project_desc is not None:
+        return project_desc
+    # Estimate ~4 characters per token for the prompts, plus the completion.
+    num_tokens = (len(GLOBAL_PROMPT) + len(prompt)) // 4 + MAX_TOKENS
+    limiter.acquire(num_tokens)
+    project_desc = hopenai.get_completion(
+        prompt,
+        system_prompt=GLOBAL_PROMPT,
+        model=MODEL,
+        cache_mode="FALLBACK",
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        print_cost=True,
+    )
+    cache.set(key, project_desc)
+    return project_desc
+
+
+def create_markdown_file_concurrently(
+    df: pd.DataFrame,
+    markdown_path: str,
+    max_projects: Optional[int],
+    cache_path: str,
+    *,
+    max_workers: int = 8,
+    requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+    tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+) -> None:
+    """
+    Create the markdown file generating the descriptions concurrently.
+
+    Descriptions are cached by prompt hash in `cache_path`, so only the
+    (Tool, Difficulty) rows that changed since the previous run call the LLM.
+    Sections are written to the file in row order as soon as they are ready.
+
+    :param df: the dataframe containing the project descriptions
+    :param markdown_path: the path to the markdown file
+    :param max_projects: limit to the rows processed
+    :param cache_path: path to the JSON Lines cache of the completions
+    :param max_workers: number of concurrent requests
+    :param requests_per_minute: maximum number of requests per minute
+    :param tokens_per_minute: maximum number of tokens per minute
+    """
+    cache = _PromptCache(cache_path)
+    limiter = _RateLimiter(requests_per_minute, tokens_per_minute)
+    rows = df.head(max_projects) if max_projects is not None else df
+    project_names = rows["Tool"].tolist()
+    difficulties = rows["Difficulty"].tolist()
+    hio.create_enclosing_dir(markdown_path, incremental=True)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    with contextlib.closing(cache), executor:
+        # `map()` yields in row order, so each section is written as soon as
+        # it and all the previous ones are ready.
+        descriptions = executor.map(
+            lambda args: _generate_project_description_cached(
+                *args, cache, limiter
+            ),
+            zip(project_names, difficulties),
+        )
+        with open(markdown_path, "w", encoding="utf-8") as f:
+            f.write("# MSML610 Projects\n\n")
+            for project_name, description in zip(project_names, descriptions):
+                f.write(f"## {project_name}\n")
+                f.write(f"{description}\n\n")
+                f.flush()
+
+
 def _parse() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
@@ -186,6 +405,18 @@ def _parse() -> argparse.ArgumentParser:
         default=DEFAULT_MAX_PROJECTS,
         help="Limit rows processed (None = all).",
     )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=1,
+        help="Number of concurrent LLM requests (1 = sequential).",
+    )
+    parser.add_argument(
+        "--cache_path",
+        default=None,
+        help="JSON Lines cache of the completions used with --max_workers > 1 "
+        "(default: next to --markdown_path).",
+    )
     parser.add_argument(
         "--openai_key",
         type=str,
@@ -205,11 +436,23 @@ def _main(parser: argparse.ArgumentParser) -> None:
     _LOG.info("Reading sheet %s", args.sheet_url)
     sheet_df = _read_google_sheet(args.sheet_url, secret_path)
     _LOG.info("Generating Markdown → %s", markdown_path)
-    create_markdown_file(
-        sheet_df,
-        markdown_path,
-        args.max_projects,
-    )
+    if args.max_workers > 1:
+        cache_path = args.cache_path or str(
+            pathlib.Path(markdown_path).with_suffix(".cache.jsonl")
+        )
+        create_markdown_file_concurrently(
+            sheet_df,
+            markdown_path,
+            args.max_projects,
+            cache_path,
+            max_workers=args.max_workers,
+        )
+    else:
+        create_markdown_file(
+            sheet_df,
+            markdown_path,
+            args.max_projects,
+        )
     _LOG.info("Done: %s", markdown_path)
 
 
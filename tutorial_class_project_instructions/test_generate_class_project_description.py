@@ -46,3 +46,25 @@ class TestProjectDescriptionWithCache(hunitest.TestCase):
             mock_to_file.assert_called_once()
             written_content = mock_to_file.call_args[0][1]
             self.assertIn("Kafka", written_content)
+
+    def test_create_markdown_file_concurrently(self) -> None:
+        df = pd.DataFrame(
+            {"Tool": ["Kafka", "Spark", "Dask"], "Difficulty": ["2", "1", "3"]}
+        )
+        scratch_dir = self.get_scratch_space()
+        markdown_path = f"{scratch_dir}/projects.md"
+        cache_path = f"{scratch_dir}/projects.cache.jsonl"
+        mock_output = "Title: Project\nDifficulty: 2\n..."
+
+        with mock.patch("helpers_root.helpers.hopenai.get_completion", return_value=mock_output) as mock_completion:
+            projdesc.create_markdown_file_concurrently(df, markdown_path, None, cache_path, max_workers=2)
+            self.assertEqual(mock_completion.call_count, 3)
+            # Only the changed row is regenerated.
+            df.loc[1, "Difficulty"] = "2"
+            projdesc.create_markdown_file_concurrently(df, markdown_path, None, cache_path, max_workers=2)
+            self.assertEqual(mock_completion.call_count, 4)
+        with open(markdown_path) as f:
+            written_content = f.read()
+        # Sections are written in row order.
+        self.assertLess(written_content.index("## Kafka"), written_content.index("## Spark"))
+        self.assertLess(written_content.index("## Spark"), written_content.index("## Dask"))
@@ -4,10 +4,13 @@ Import as:
 import tutorial_github_causify_style.github_utils as tgcsgiut
 """
 
+import contextlib
 import datetime
 import itertools
+import json
 import logging
 import os
+import sqlite3
 import time
 from typing import Any, Dict, List, Literal, Optional, Tuple
 
@@ -736,6 +739,25 @@ def get_commit_datetimes_by_repo_period_intrinsic(
     :param until: end datetime
     :return: commit timestamps in ISO format
     """
+    timestamps = _fetch_commit_datetimes(
+        client, org, repo, username, since, until
+    )
+    return timestamps
+
+
+def _fetch_commit_datetimes(
+    client,
+    org: str,
+    repo: str,
+    username: Optional[str],
+    since: datetime.datetime,
+    until: datetime.datetime,
+) -> List[str]:
+    """
+    Fetch commit timestamps from the GitHub API without caching.
+
+    See `get_commit_datetimes_by_repo_period_intrinsic()` for params.
+    """
     timestamps: List[str] = []
     repo_obj = client.get_repo(f"{org}/{repo}")
     # Grab all commits in range, then filter by author or committer.
@@ -776,6 +798,23 @@ def get_pr_datetimes_by_repo_period_intrinsic(
     :param until: end datetime
     :return: PR created timestamps in ISO format
     """
+    timestamps = _fetch_pr_datetimes(client, org, repo, username, since, until)
+    return timestamps
+
+
+def _fetch_pr_datetimes(
+    client,
+    org: str,
+    repo: str,
+    username: str,
+    since: datetime.datetime,
+    until: datetime.datetime,
+) -> List[str]:
+    """
+    Fetch PR created timestamps from the GitHub API without caching.
+
+    See `get_pr_datetimes_by_repo_period_intrinsic()` for params.
+    """
     timestamps: List[str] = []
     since_date = since.date().isoformat()
     until_date = until.date().isoformat()
@@ -814,6 +853,23 @@ def get_issue_datetimes_by_repo_intrinsic(
     :param period: time window to filter issues
     :return: 'opened' and 'closed' issues containing ISO timestamps
     """
+    issue_data = _fetch_issue_datetimes(client, org, repo, username, period)
+    return issue_data
+
+
+def _fetch_issue_datetimes(
+    client,
+    org: str,
+    repo: str,
+    username: str,
+    period: Tuple[datetime.datetime, datetime.datetime],
+) -> Dict[str, List[str]]:
+    """
+    Fetch assigned and closed issue timestamps from the GitHub API without
+    caching.
+
+    See `get_issue_datetimes_by_repo_intrinsic()` for params.
+    """
     since_date = period[0].date().isoformat()
     until_date = period[1].date().isoformat()
     query = (
@@ -868,6 +924,23 @@ def get_loc_stats_by_repo_period_intrinsic(
     :param until: end datetime
     :return: additions, deletions in code
     """
+    stats_list = _fetch_loc_stats(client, org, repo, username, since, until)
+    return stats_list
+
+
+def _fetch_loc_stats(
+    client,
+    org: str,
+    repo: str,
+    username: str,
+    since: datetime.datetime,
+    until: datetime.datetime,
+) -> List[Dict[str, int]]:
+    """
+    Fetch commit LOC stats from the GitHub API without caching.
+
+    See `get_loc_stats_by_repo_period_intrinsic()` for params.
+    """
     stats_list: List[Dict[str, int]] = []
     repo_obj = client.get_repo(f"{org}/{repo}")
     # Grab all commits in range, then filter by author/committer.
@@ -897,12 +970,364 @@ def get_loc_stats_by_repo_period_intrinsic(
     return stats_list
 
 
+# #############################################################################
+# GitHubDailyCache
+# #############################################################################
+
+
+# Metric groups stored in the daily cache and the event kinds each one emits.
+_DAILY_CACHE_GROUPS = {
+    "commits": ["commit"],
+    "prs": ["pr"],
+    "loc": ["loc"],
+    "issues": ["issue_assigned", "issue_closed"],
+}
+
+
+def _to_utc_day(ts: str) -> str:
+    """
+    Convert an ISO timestamp to the ISO date of the corresponding UTC day.
+
+    :param ts: ISO timestamp, naive timestamps are assumed to be in UTC
+    :return: UTC date, e.g., "2025-05-01"
+    """
+    dt = datetime.datetime.fromisoformat(ts)
+    dt_utc = (
+        dt.replace(tzinfo=datetime.timezone.utc)
+        if dt.tzinfo is None
+        else dt.astimezone(datetime.timezone.utc)
+    )
+    day = dt_utc.date().isoformat()
+    return day
+
+
+def _fetch_daily_events(
+    client,
+    group: str,
+    org: str,
+    repo: str,
+    username: str,
+    since: datetime.datetime,
+    until: datetime.datetime,
+) -> List[Tuple[str, str, str]]:
+    """
+    Fetch the raw events of a metric group and bucket them by UTC day.
+
+    Issues are bucketed by creation day ("issue_assigned") and by closing day
+    ("issue_closed") so that each day can be cached independently of the
+    period it was requested in.
+
+    :param client: authenticated PyGithub client
+    :param group: metric group, one of `_DAILY_CACHE_GROUPS`
+    :param org: GitHub org name
+    :param repo: repository name
+    :param username: GitHub username
+    :param since: start datetime
+    :param until: end datetime
+    :return: (kind, day, value) tuples where value is an ISO timestamp or,
+        for LOC, a JSON-encoded stats dict
+    """
+    events: List[Tuple[str, str, str]] = []
+    if group == "commits":
+        for ts in _fetch_commit_datetimes(
+            client, org, repo, username, since, until
+        ):
+            events.append(("commit", _to_utc_day(ts), ts))
+    elif group == "prs":
+        for ts in _fetch_pr_datetimes(client, org, repo, username, since, until):
+            events.append(("pr", _to_utc_day(ts), ts))
+    elif group == "loc":
+        for stats in _fetch_loc_stats(client, org, repo, username, since, until):
+            events.append(("loc", stats["date"], json.dumps(stats)))
+    elif group == "issues":
+        since_date = since.date().isoformat()
+        until_date = until.date().isoformat()
+        for field, kind in (
+            ("created", "issue_assigned"),
+            ("closed", "issue_closed"),
+        ):
+            query = (
+                f"repo:{org}/{repo} type:issue assignee:{username} "
+                f"{field}:{since_date}..{until_date}"
+            )
+            for issue in client.search_issues(query):
+                if issue.pull_request is not None:
+                    continue
+                dt = issue.created_at if field == "created" else issue.closed_at
+                ts = dt.isoformat()
+                events.append((kind, _to_utc_day(ts), ts))
+    else:
+        raise ValueError(f"Unsupported metric group '{group}'")
+    return events
+
+
+class GitHubDailyCache:
+    """
+    Cache the intrinsic GitHub metrics per (group, org, repo, user, day).
+
+    The `simple_cache` functions are keyed on the exact `(since, until)`
+    tuple, so shifting a period by one day re-fetches all of it. This cache
+    stores events in an append-only SQLite table at day granularity: a
+    period is answered by unioning the cached days and only the missing days
+    are fetched, grouped in contiguous runs to minimize API calls.
+
+    Only days that are over in UTC are persisted, since the current day can
+    still receive new events. Writes happen in a single `BEGIN IMMEDIATE`
+    transaction that re-checks which days are already cached, so concurrent
+    writers (e.g., several notebooks or cron jobs) never duplicate events.
+    """
+
+    def __init__(self, db_path: str = "github_daily_cache.db") -> None:
+        """
+        Initialize the cache, creating the SQLite tables if needed.
+
+        :param db_path: path of the SQLite file backing the cache
+        """
+        self.db_path = db_path
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fetched_days (
+                    grp TEXT, org TEXT, repo TEXT, user TEXT, day TEXT,
+                    PRIMARY KEY (grp, org, repo, user, day)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS events (
+                    kind TEXT, org TEXT, repo TEXT, user TEXT, day TEXT,
+                    value TEXT
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS events_idx
+                ON events (kind, org, repo, user, day)
+                """
+            )
+
+    def get_events(
+        self,
+        client,
+        group: str,
+        org: str,
+        repo: str,
+        username: str,
+        period: Tuple[datetime.datetime, datetime.datetime],
+    ) -> Dict[str, List[str]]:
+        """
+        Return the events of a metric group for all the days in a period.
+
+        The period is widened to whole UTC days.
+
+        :param client: authenticated PyGithub client
+        :param group: metric group, one of "commits", "prs", "loc", "issues"
+        :param org: GitHub org name
+        :param repo: repository name
+        :param username: GitHub username
+        :param period: start and end datetime
+        :return: event kind to list of values sorted by day
+        """
+        if group not in _DAILY_CACHE_GROUPS:
+            raise ValueError(f"Unsupported metric group '{group}'")
+        since, until = normalize_period_to_utc(period)
+        days = [day.isoformat() for day in days_between((since, until))]
+        if not days:
+            # Empty or inverted period.
+            return {kind: [] for kind in _DAILY_CACHE_GROUPS[group]}
+        key = (group, org, repo, username)
+        cached_days = self._get_fetched_days(key, days[0], days[-1])
+        missing_days = [day for day in days if day not in cached_days]
+        # Events of the days that cannot be persisted yet.
+        transient: List[Tuple[str, str, str]] = []
+        today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        for run in self._get_contiguous_runs(missing_days):
+            run_since = datetime.datetime.fromisoformat(run[0]).replace(
+                tzinfo=datetime.timezone.utc
+            )
+            run_until = datetime.datetime.fromisoformat(run[-1]).replace(
+                tzinfo=datetime.timezone.utc
+            ) + datetime.timedelta(days=1, microseconds=-1)
+            _LOG.debug(
+                "Fetching %s for %s/%s user=%s days=%s..%s.",
+                group,
+                org,
+                repo,
+                username,
+                run[0],
+                run[-1],
+            )
+            events = _fetch_daily_events(
+                client, group, org, repo, username, run_since, run_until
+            )
+            # Search queries are day-granular, so drop events outside the run.
+            events = [e for e in events if run[0] <= e[1] <= run[-1]]
+            complete_days = [day for day in run if day < today]
+            self._store(key, complete_days, events)
+            transient.extend(e for e in events if e[1] >= today)
+        result = self._get_stored_events(group, org, repo, username, days)
+        for kind, _, value in sorted(transient, key=lambda e: e[1]):
+            result[kind].append(value)
+        return result
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open an autocommit connection to the cache.
+
+        The caller must close it, e.g., with `contextlib.closing()`: using the
+        connection as a context manager only ends the transaction.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        return conn
+
+    @staticmethod
+    def _get_contiguous_runs(days: List[str]) -> List[List[str]]:
+        """
+        Split sorted ISO days into runs of consecutive days.
+        """
+        runs: List[List[str]] = []
+        prev = None
+        for day in days:
+            curr = datetime.date.fromisoformat(day)
+            if prev is not None and curr - prev == datetime.timedelta(days=1):
+                runs[-1].append(day)
+            else:
+                runs.append([day])
+            prev = curr
+        return runs
+
+    def _get_fetched_days(
+        self, key: Tuple[str, str, str, str], first_day: str, last_day: str
+    ) -> set:
+        with contextlib.closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT day FROM fetched_days
+                WHERE grp = ? AND org = ? AND repo = ? AND user = ?
+                AND day BETWEEN ? AND ?
+                """,
+                (*key, first_day, last_day),
+            ).fetchall()
+        fetched_days = {row[0] for row in rows}
+        return fetched_days
+
+    def _store(
+        self,
+        key: Tuple[str, str, str, str],
+        days: List[str],
+        events: List[Tuple[str, str, str]],
+    ) -> None:
+        """
+        Atomically append the events of the given days and mark them fetched.
+        """
+        if not days:
+            return
+        _, org, repo, username = key
+        with contextlib.closing(self._connect()) as conn:
+            try:
+                # Take the write lock before checking to serialize the writers.
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    f"""
+                    SELECT day FROM fetched_days
+                    WHERE grp = ? AND org = ? AND repo = ? AND user = ?
+                    AND day IN ({",".join("?" * len(days))})
+                    """,
+                    (*key, *days),
+                ).fetchall()
+                new_days = set(days) - {row[0] for row in rows}
+                conn.executemany(
+                    "INSERT INTO fetched_days VALUES (?, ?, ?, ?, ?)",
+                    [(*key, day) for day in sorted(new_days)],
+                )
+                conn.executemany(
+                    "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (kind, org, repo, username, day, value)
+                        for kind, day, value in events
+                        if day in new_days
+                    ],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _get_stored_events(
+        self, group: str, org: str, repo: str, username: str, days: List[str]
+    ) -> Dict[str, List[str]]:
+        result: Dict[str, List[str]] = {}
+        with contextlib.closing(self._connect()) as conn:
+            for kind in _DAILY_CACHE_GROUPS[group]:
+                rows = conn.execute(
+                    """
+                    SELECT value FROM events
+                    WHERE kind = ? AND org = ? AND repo = ? AND user = ?
+                    AND day BETWEEN ? AND ?
+                    ORDER BY day
+                    """,
+                    (kind, org, repo, username, days[0], days[-1]),
+                ).fetchall()
+                result[kind] = [row[0] for row in rows]
+        return result
+
+
+def get_daily_cached_metrics(
+    daily_cache: GitHubDailyCache,
+    client,
+    org: str,
+    repo: str,
+    username: str,
+    period: Tuple[datetime.datetime, datetime.datetime],
+) -> Dict[str, Any]:
+    """
+    Fetch commits, PRs, LOC, and issues for a user-repo pair through the daily
+    cache.
+
+    The output has the same format as the intrinsic functions, so it can be
+    used in place of them.
+
+    :param daily_cache: daily cache to read from and append to
+    :param client: authenticated PyGithub client
+    :param org: GitHub org name
+    :param repo: repository name
+    :param username: GitHub username
+    :param period: start and end datetime
+    :return: dictionary with keys:
+        - commits: commit timestamps in ISO format
+        - prs: PR created timestamps in ISO format
+        - loc: dicts with date, additions, deletions
+        - issues: dict with 'assigned' and 'closed' ISO timestamps
+    """
+    commits = daily_cache.get_events(
+        client, "commits", org, repo, username, period
+    )
+    prs = daily_cache.get_events(client, "prs", org, repo, username, period)
+    loc = daily_cache.get_events(client, "loc", org, repo, username, period)
+    issues = daily_cache.get_events(client, "issues", org, repo, username, period)
+    metrics = {
+        "commits": commits["commit"],
+        "prs": prs["pr"],
+        "loc": [json.loads(value) for value in loc["loc"]],
+        "issues": {
+            "assigned": issues["issue_assigned"],
+            "closed": issues["issue_closed"],
+        },
+    }
+    return metrics
+
+
 def build_daily_commit_df(
     client,
     org: str,
     repo: str,
     username: str,
     period: Tuple[datetime.datetime, datetime.datetime],
+    *,
+    daily_cache: Optional[GitHubDailyCache] = None,
 ) -> pd.DataFrame:
     """
     Build daily commit counts for user and repo over period.
@@ -912,12 +1337,19 @@ def build_daily_commit_df(
     :param repo: repository name
     :param username: GitHub username
     :param period: start and end datetime objects
+    :param daily_cache: if provided, read the data through the daily cache
+        instead of the period-keyed intrinsic cache
     :return: data with date, commits, repo, user
     """
     since, until = period
-    timestamps = get_commit_datetimes_by_repo_period_intrinsic(
-        client, org, repo, username, since, until
-    )
+    if daily_cache is None:
+        timestamps = get_commit_datetimes_by_repo_period_intrinsic(
+            client, org, repo, username, since, until
+        )
+    else:
+        timestamps = daily_cache.get_events(
+            client, "commits", org, repo, username, period
+        )["commit"]
     df = pd.DataFrame({"ts": pd.to_datetime(timestamps)})
     df["date"] = df.ts.dt.date
     daily = df.groupby("date").size().reset_index(name="commits")
@@ -936,6 +1368,8 @@ def build_daily_issue_df(
     repo: str,
     username: str,
     period: Tuple[datetime.datetime, datetime.datetime],
+    *,
+    daily_cache: Optional[GitHubDailyCache] = None,
 ) -> pd.DataFrame:
     """
     Build daily assigned / closed issue counts for a user-repo pair.
@@ -945,12 +1379,23 @@ def build_daily_issue_df(
     :param repo: repository name
     :param username: GitHub username
     :param period: start and end datetime objects
+    :param daily_cache: if provided, read the data through the daily cache
+        instead of the period-keyed intrinsic cache
     :return: data with columns date, issues_assigned, issues_closed,
         repo, user
     """
-    issue_data = get_issue_datetimes_by_repo_intrinsic(
-        client, org, repo, username, period
-    )
+    if daily_cache is None:
+        issue_data = get_issue_datetimes_by_repo_intrinsic(
+            client, org, repo, username, period
+        )
+    else:
+        issues = daily_cache.get_events(
+            client, "issues", org, repo, username, period
+        )
+        issue_data = {
+            "assigned": issues["issue_assigned"],
+            "closed": issues["issue_closed"],
+        }
     df_assigned = pd.DataFrame(
         {"ts": pd.to_datetime(issue_data["assigned"]), "issues_assigned": 1}
     )
@@ -983,6 +1428,8 @@ def build_daily_pr_df(
     repo: str,
     username: str,
     period: Tuple[datetime.datetime, datetime.datetime],
+    *,
+    daily_cache: Optional[GitHubDailyCache] = None,
 ) -> pd.DataFrame:
     """
     Build daily PR counts for user and repo over period.
@@ -992,12 +1439,19 @@ def build_daily_pr_df(
     :param repo: repository name
     :param username: GitHub username
     :param period: start and end datetime objects
+    :param daily_cache: if provided, read the data through the daily cache
+        instead of the period-keyed intrinsic cache
     :return: data with date, prs, repo, user
     """
     since, until = period
-    timestamps = get_pr_datetimes_by_repo_period_intrinsic(
-        client, org, repo, username, since, until
-    )
+    if daily_cache is None:
+        timestamps = get_pr_datetimes_by_repo_period_intrinsic(
+            client, org, repo, username, since, until
+        )
+    else:
+        timestamps = daily_cache.get_events(
+            client, "prs", org, repo, username, period
+        )["pr"]
     df = pd.DataFrame({"ts": pd.to_datetime(timestamps)})
     df["date"] = df.ts.dt.date
     daily = df.groupby("date").size().reset_index(name="prs")
@@ -1016,6 +1470,8 @@ def build_daily_loc_df(
     repo: str,
     username: str,
     period: Tuple[datetime.datetime, datetime.datetime],
+    *,
+    daily_cache: Optional[GitHubDailyCache] = None,
 ) -> pd.DataFrame:
     """
     Build daily LOC additions and deletions for user and repo over period.
@@ -1025,26 +1481,25 @@ def build_daily_loc_df(
     :param repo: repository name
     :param username: GitHub username
     :param period: start and end datetime objects
+    :param daily_cache: if provided, read the data through the daily cache
+        instead of the period-keyed intrinsic cache
     :return: data with date, additions, deletions, repo, user
     """
     since, until = period
     # Fetch raw LOC stats list.
-    stats_list = get_loc_stats_by_repo_period_intrinsic(
-        client, org, repo, username, since, until
-    )
+    if daily_cache is None:
+        stats_list = get_loc_stats_by_repo_period_intrinsic(
+            client, org, repo, username, since, until
+        )
+    else:
+        loc = daily_cache.get_events(client, "loc", org, repo, username, period)
+        stats_list = [json.loads(value) for value in loc["loc"]]
     # If no stats, return zeros for full range.
     if not stats_list:
         all_days = pd.DataFrame({"date": days_between(period)})
         # Initialize zeroes.
-        all_days["additions"] = all_days["date"].apply(lambda _: 0)
-        all_days["deletions"] = all_days["date"].apply(lambda _: 0)
-        # Format signs.
-        all_days["additions"] = (
-            all_days["additions"].astype(str).apply(lambda x: "+" + x)
-        )
-        all_days["deletions"] = (
-            all_days["deletions"].astype(str).apply(lambda x: "-" + x)
-        )
+        all_days["additions"] = 0
+        all_days["deletions"] = 0
         # Add context.
         all_days["repo"] = repo
         all_days["user"] = username
@@ -1063,9 +1518,6 @@ def build_daily_loc_df(
     daily[["additions", "deletions"]] = (
         daily[["additions", "deletions"]].fillna(0).astype(int)
     )
-    # Apply sign formatting.
-    daily["additions"] = daily["additions"].astype(str).apply(lambda x: "+" + x)
-    daily["deletions"] = daily["deletions"].astype(str).apply(lambda x: "-" + x)
     # Add context.
     daily["repo"] = repo
     daily["user"] = username
@@ -1113,6 +1565,8 @@ def prefetch_periodic_user_repo_data(
     repos: List[str],
     users: List[str],
     period: Tuple[datetime.datetime, datetime.datetime],
+    *,
+    daily_cache: Optional[GitHubDailyCache] = None,
 ) -> None:
     """
     Prefetch and cache commits, PRs, and LOC for each user and repo over
@@ -1123,6 +1577,8 @@ def prefetch_periodic_user_repo_data(
     :param repos: repository names
     :param users: GitHub usernames
     :param period: start and end datetime objects
+    :param daily_cache: if provided, prefetch into the daily cache, which
+        only hits the API for the days that are not cached yet
     """
     # Validate input types.
     if not isinstance(org, str):
@@ -1134,22 +1590,16 @@ def prefetch_periodic_user_repo_data(
     # Initialize timer and pair up (repo, user) combinations.
     start = time.time()
     count = 0
-    since, until = period
     user_repo_pairs = list(itertools.product(repos, users))
     # Prefetch and cache GitHub data for each user-repo pair
     for repo, user in td.tqdm(user_repo_pairs, desc="Prefetching user-repo data"):
-        commits = get_commit_datetimes_by_repo_period_intrinsic(
-            client, org, repo, user, since, until
-        )
-        prs = get_pr_datetimes_by_repo_period_intrinsic(
-            client, org, repo, user, since, until
-        )
-        locs = get_loc_stats_by_repo_period_intrinsic(
-            client, org, repo, user, since, until
-        )
-        issues = get_issue_datetimes_by_repo_intrinsic(
-            client, org, repo, user, period
+        metrics = _get_user_repo_metrics(
+            client, org, repo, user, period, daily_cache=daily_cache
         )
+        commits = metrics["commits"]
+        prs = metrics["prs"]
+        locs = metrics["loc"]
+        issues = metrics["issues"]
         td.tqdm.write(
             f"{repo}/{user}: {len(commits)} commits, {len(prs)} PRs, "
             f"{len(locs)} LOC entries, {len(issues['assigned'])} issues assigned, "
@@ -1173,6 +1623,8 @@ def collect_all_metrics(
     repos: List[str],
     users: List[str],
     period: Tuple[datetime.datetime, datetime.datetime],
+    *,
+    daily_cache: Optional[GitHubDailyCache] = None,
 ) -> pd.DataFrame:
     """
     Collect daily metrics for all user-repo combinations.
@@ -1182,39 +1634,189 @@ def collect_all_metrics(
     :param repos: repository names
     :param users: github usernames
     :param period: start and end datetime
-    :return: concatenated data with date, commits, prs, additions,
-        deletions, repo, user
+    :param daily_cache: if provided, read the data through the daily cache
+    :return: data with one row per (date, repo, user) and numeric columns
+        commits, prs, additions, deletions, issues_assigned, issues_closed
     """
-    combined_frames: List[pd.DataFrame] = []
     for repo in repos:
         # Ensure repo is a string.
         if not isinstance(repo, str):
             raise ValueError(f"Expected repo to be a string but got {repo!r}")
-        for user in users:
-            # Ensure user is a string.
-            if not isinstance(user, str):
-                raise ValueError(f"Expected user to be a string but got {user!r}")
-            # Build each metric DataFrame.
-            df_c = build_daily_commit_df(client, org, repo, user, period)
-            df_p = build_daily_pr_df(client, org, repo, user, period)
-            df_l = build_daily_loc_df(client, org, repo, user, period)
-            df_i = build_daily_issue_df(client, org, repo, user, period)
-            # Merge on date, repo, and user.
-            df = (
-                df_c.merge(df_p, on=["date", "repo", "user"], how="inner")
-                .merge(df_l, on=["date", "repo", "user"], how="inner")
-                .merge(df_i, on=["date", "repo", "user"], how="inner")
-            )
-            combined_frames.append(df)
-    # Concatenate all DataFrames or return empty.
-    combined = (
-        pd.concat(combined_frames, ignore_index=True)
-        if combined_frames
-        else pd.DataFrame()
+    for user in users:
+        # Ensure user is a string.
+        if not isinstance(user, str):
+            raise ValueError(f"Expected user to be a string but got {user!r}")
+    events = build_event_table(
+        client, org, repos, users, period, daily_cache=daily_cache
     )
+    combined = build_daily_metrics_grid(events, repos, users, period)
     return combined
 
 
+# Metrics computed by `collect_all_metrics`, in output order.
+_DAILY_METRICS = [
+    "commits",
+    "prs",
+    "additions",
+    "deletions",
+    "issues_assigned",
+    "issues_closed",
+]
+
+
+def _get_user_repo_metrics(
+    client,
+    org: str,
+    repo: str,
+    username: str,
+    period: Tuple[datetime.datetime, datetime.datetime],
+    *,
+    daily_cache: Optional[GitHubDailyCache] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch commits, PRs, LOC, and issues for a user-repo pair.
+
+    See `get_daily_cached_metrics()` for the output format.
+    """
+    if daily_cache is not None:
+        metrics = get_daily_cached_metrics(
+            daily_cache, client, org, repo, username, period
+        )
+        return metrics
+    since, until = period
+    metrics = {
+        "commits": get_commit_datetimes_by_repo_period_intrinsic(
+            client, org, repo, username, since, until
+        ),
+        "prs": get_pr_datetimes_by_repo_period_intrinsic(
+            client, org, repo, username, since, until
+        ),
+        "loc": get_loc_stats_by_repo_period_intrinsic(
+            client, org, repo, username, since, until
+        ),
+        "issues": get_issue_datetimes_by_repo_intrinsic(
+            client, org, repo, username, period
+        ),
+    }
+    return metrics
+
+
+def build_event_table(
+    client,
+    org: str,
+    repos: List[str],
+    users: List[str],
+    period: Tuple[datetime.datetime, datetime.datetime],
+    *,
+    daily_cache: Optional[GitHubDailyCache] = None,
+) -> pd.DataFrame:
+    """
+    Build a long-format table with one row per event for all user-repo pairs.
+
+    Commits, PRs, and issues contribute a value of 1 per event, while LOC
+    contributes the number of lines added or deleted.
+
+    :param client: authenticated PyGithub client
+    :param org: GitHub org name
+    :param repos: repository names
+    :param users: GitHub usernames
+    :param period: start and end datetime
+    :param daily_cache: if provided, read the data through the daily cache
+    :return: data with columns repo, user, date (UTC day), metric, value
+    """
+    # Accumulate flat columns and build a single DataFrame at the end.
+    repo_col: List[str] = []
+    user_col: List[str] = []
+    ts_col: List[str] = []
+    metric_col: List[str] = []
+    value_col: List[int] = []
+
+    def _append(repo: str, user: str, ts: str, metric: str, value: int) -> None:
+        repo_col.append(repo)
+        user_col.append(user)
+        ts_col.append(ts)
+        metric_col.append(metric)
+        value_col.append(value)
+
+    for repo, user in itertools.product(repos, users):
+        metrics = _get_user_repo_metrics(
+            client, org, repo, user, period, daily_cache=daily_cache
+        )
+        for ts in metrics["commits"]:
+            _append(repo, user, ts, "commits", 1)
+        for ts in metrics["prs"]:
+            _append(repo, user, ts, "prs", 1)
+        for ts in metrics["issues"]["assigned"]:
+            _append(repo, user, ts, "issues_assigned", 1)
+        for ts in metrics["issues"]["closed"]:
+            _append(repo, user, ts, "issues_closed", 1)
+        for stats in metrics["loc"]:
+            _append(repo, user, stats["date"], "additions", stats["additions"])
+            _append(repo, user, stats["date"], "deletions", stats["deletions"])
+    events = pd.DataFrame(
+        {
+            "repo": repo_col,
+            "user": user_col,
+            "date": pd.to_datetime(ts_col, utc=True, format="ISO8601"),
+            "metric": metric_col,
+            "value": pd.Series(value_col, dtype="int64"),
+        }
+    )
+    events["date"] = events["date"].dt.tz_localize(None).dt.normalize()
+    _LOG.debug("Built event table rows=%d.", len(events))
+    return events
+
+
+def build_daily_metrics_grid(
+    events: pd.DataFrame,
+    repos: List[str],
+    users: List[str],
+    period: Tuple[datetime.datetime, datetime.datetime],
+) -> pd.DataFrame:
+    """
+    Aggregate an event table into a dense daily (repo, user, date) grid.
+
+    :param events: output of `build_event_table()`
+    :param repos: repository names
+    :param users: GitHub usernames
+    :param period: start and end datetime
+    :return: data with columns date, repo, user, and one integer column per
+        metric in `_DAILY_METRICS`, with zeros for days without events
+    """
+    days = pd.date_range(period[0].date(), period[1].date(), freq="D")
+    index = pd.MultiIndex.from_product(
+        [repos, users, days], names=["repo", "user", "date"]
+    )
+    grid = (
+        events.groupby(["repo", "user", "date", "metric"])["value"]
+        .sum()
+        .unstack("metric")
+        .reindex(index=index, columns=_DAILY_METRICS, fill_value=0)
+        .fillna(0)
+        .astype(int)
+        .reset_index()
+    )
+    grid.columns.name = None
+    grid["date"] = grid["date"].dt.date
+    grid = grid[["date", "repo", "user"] + _DAILY_METRICS]
+    _LOG.debug("Built daily metrics grid rows=%d.", len(grid))
+    return grid
+
+
+def _to_numeric_loc(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert legacy "+N" / "-N" LOC strings to integers.
+
+    :param df: data with additions and deletions columns
+    :return: copy of the data with integer additions and deletions
+    """
+    df = df.copy()
+    for col in ["additions", "deletions"]:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(str).str.lstrip("+-").astype(int)
+    return df
+
+
 # TODO(*): Separate summary functions for user-repo and repo-user metrics for clarity.
 def summarize_user_metrics_for_repo(
     combined: pd.DataFrame, repo: str
@@ -1228,11 +1830,7 @@ def summarize_user_metrics_for_repo(
     :return: data with columns user, commits, prs, additions, deletions,
         issues_assigned, issues_closed
     """
-    df = combined[combined["repo"] == repo].copy()
-    df["additions"] = df["additions"].str.replace("+", "").astype(int)
-    df["deletions"] = df["deletions"].str.replace("-", "").astype(int)
-    df["issues_assigned"] = df["issues_assigned"].astype(int)
-    df["issues_closed"] = df["issues_closed"].astype(int)
+    df = _to_numeric_loc(combined[combined["repo"] == repo])
     summary = (
         df.groupby("user")
         .agg(
@@ -1259,9 +1857,7 @@ def summarize_repo_metrics_for_user(
     :return: columns repo, commits, prs, additions, deletions,
         issues_assigned, issues_closed
     """
-    df = combined[combined["user"] == user].copy()
-    df["additions"] = df["additions"].str.replace("+", "").astype(int)
-    df["deletions"] = df["deletions"].str.replace("-", "").astype(int)
+    df = _to_numeric_loc(combined[combined["user"] == user])
     summary = (
         df.groupby("repo")
         .agg(
@@ -1295,16 +1891,7 @@ def summarize_users_across_repos(
         combined["user"].isin(users) & combined["repo"].isin(repos)
     ].copy()
     # Normalise numeric columns.
-    df["additions"] = df["additions"].str.replace("+", "").astype(int)
-    df["deletions"] = df["deletions"].str.replace("-", "").astype(int)
-    df.rename(
-        columns={
-            "issues_assigned": "issues_assigned",
-            "issues_closed": "issues_closed",
-        },
-        inplace=True,
-        errors="ignore",
-    )
+    df = _to_numeric_loc(df)
     # Aggregate across repos.
     summary = (
         df.groupby("user")
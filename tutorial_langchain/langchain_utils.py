@@ -1,8 +1,13 @@
+import concurrent.futures
 import hashlib
+import json
 import logging
 import os
 import pathlib
-from typing import Any, Dict, List, Optional
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
 
 import helpers.hdbg as hdbg
 import langchain
@@ -15,6 +20,8 @@ from langchain.schema import retriever
 import langchain.text_splitter
 from langchain_community.document_loaders import UnstructuredMarkdownLoader
 from langchain_community.vectorstores import FAISS
+import langchain_core.embeddings as lngchcoremb
+import numpy as np
 import tqdm
 
 _LOG = logging.getLogger(__name__)
@@ -64,24 +71,34 @@ def parse_markdown_files(file_paths: List[str]) -> List[lngchdocstordoc.Document
     documents = []
     # Use tqdm to show progress since parsing large files can be slow.
     for file_path in tqdm.tqdm(file_paths):
-        # `UnstructuredMarkdownLoader` handles various markdown formats robustly.
-        loader = UnstructuredMarkdownLoader(file_path)
-        docs = loader.load()
-        for doc in docs:
-            # Track source file for traceability.
-            doc.metadata["source"] = file_path
-            # Store modification time to detect changes later.
-            doc.metadata["last_modified"] = os.path.getmtime(file_path)
-            # Calculate checksum to identify content changes.
-            doc.metadata["checksum"] = hashlib.md5(
-                doc.page_content.encode()
-            ).hexdigest()
-        documents.extend(docs)
+        documents.extend(_parse_markdown_file(file_path))
     # Log success rate to help debug parsing issues.
     _LOG.info("Successfully parsed %d/%d files", len(documents), len(file_paths))
     return documents
 
 
+def _parse_markdown_file(file_path: str) -> List[lngchdocstordoc.Document]:
+    """
+    Parse a markdown file into LangChain Documents with metadata.
+
+    :param file_path: path to the markdown file
+    :return: list of Document objects with content and metadata
+    """
+    # `UnstructuredMarkdownLoader` handles various markdown formats robustly.
+    loader = UnstructuredMarkdownLoader(file_path)
+    docs = loader.load()
+    for doc in docs:
+        # Track source file for traceability.
+        doc.metadata["source"] = file_path
+        # Store modification time to detect changes later.
+        doc.metadata["last_modified"] = os.path.getmtime(file_path)
+        # Calculate checksum to identify content changes.
+        doc.metadata["checksum"] = hashlib.md5(
+            doc.page_content.encode()
+        ).hexdigest()
+    return docs
+
+
 def split_documents(
     documents: List[lngchdocstordoc.Document],
     chunk_size: int = 500,
@@ -103,17 +120,163 @@ def split_documents(
     return chunks
 
 
+class CachedEmbeddings(lngchcoremb.Embeddings):
+    """
+    Embeddings wrapper with a persistent, content-addressed cache.
+
+    Vectors are stored in SQLite as float32 blobs keyed by the hash of the
+    model name and of the chunk text, so re-embedding unchanged chunks (e.g.,
+    when rebuilding an index after changing a parameter) doesn't call the
+    embeddings API. Cache misses are deduplicated and embedded in batches,
+    and the least recently used vectors are evicted beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        embeddings: lngchcoremb.Embeddings,
+        cache_path: str,
+        *,
+        max_entries: int = 1_000_000,
+        batch_size: int = 256,
+    ) -> None:
+        """
+        Initialize the wrapper.
+
+        :param embeddings: embeddings model to wrap
+        :param cache_path: path to the SQLite cache file
+        :param max_entries: maximum number of cached vectors
+        :param batch_size: number of cache misses embedded per API call
+        """
+        self.embeddings = embeddings
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        # Vectors from different models are not interchangeable.
+        self.model_name = getattr(
+            embeddings, "model", type(embeddings).__name__
+        )
+        with sqlite3.connect(self.cache_path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY, vector BLOB, last_used REAL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS last_used_idx ON embeddings (last_used)"
+            )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, calling the wrapped model only for the cache misses.
+
+        :param texts: texts to embed
+        :return: one vector per text
+        """
+        keys = [_hash_text(f"{self.model_name}\0{text}") for text in texts]
+        vectors = self._load(keys)
+        # Deduplicate the misses, preserving the order.
+        misses = {
+            key: text for key, text in zip(keys, texts) if key not in vectors
+        }
+        miss_keys = list(misses)
+        for i in range(0, len(miss_keys), self.batch_size):
+            batch_keys = miss_keys[i : i + self.batch_size]
+            batch_vectors = self.embeddings.embed_documents(
+                [misses[key] for key in batch_keys]
+            )
+            batch = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(batch_keys, batch_vectors)
+            }
+            self._store(batch)
+            vectors.update(batch)
+        _LOG.debug(
+            "Embedded %d texts with %d cache misses", len(texts), len(misses)
+        )
+        result = [vectors[key].tolist() for key in keys]
+        return result
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries are rarely repeated, so they are not cached.
+        vector = self.embeddings.embed_query(text)
+        return vector
+
+    def _load(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        vectors: Dict[str, np.ndarray] = {}
+        unique_keys = list(set(keys))
+        now = time.time()
+        with sqlite3.connect(self.cache_path) as conn:
+            # Query in chunks to stay below the SQLite variables limit.
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i : i + 500]
+                rows = conn.execute(
+                    f"""
+                    SELECT key, vector FROM embeddings
+                    WHERE key IN ({",".join("?" * len(chunk))})
+                    """,
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    vectors[key] = np.frombuffer(blob, dtype=np.float32)
+            # Refresh the LRU timestamps of the hits.
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key in vectors],
+            )
+        return vectors
+
+    def _store(self, vectors: Dict[str, np.ndarray]) -> None:
+        now = time.time()
+        with sqlite3.connect(self.cache_path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(key, vector.tobytes(), now) for key, vector in vectors.items()],
+            )
+            # Evict the least recently used vectors.
+            (num_entries,) = conn.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()
+            if num_entries > self.max_entries:
+                conn.execute(
+                    """
+                    DELETE FROM embeddings WHERE key IN (
+                        SELECT key FROM embeddings ORDER BY last_used LIMIT ?
+                    )
+                    """,
+                    (num_entries - self.max_entries,),
+                )
+
+
+def _maybe_cache_embeddings(
+    embeddings: lngchcoremb.Embeddings, embedding_cache_path: Optional[str]
+) -> lngchcoremb.Embeddings:
+    """
+    Wrap embeddings in `CachedEmbeddings` if a cache path is provided.
+    """
+    if embedding_cache_path is None or isinstance(embeddings, CachedEmbeddings):
+        return embeddings
+    cached_embeddings = CachedEmbeddings(embeddings, embedding_cache_path)
+    return cached_embeddings
+
+
 def create_vector_store(
     documents: List[lngchdocstordoc.Document],
     embeddings: langchain.embeddings.OpenAIEmbeddings,
+    *,
+    embedding_cache_path: Optional[str] = None,
 ) -> FAISS:
     """
     Create FAISS vector store from documents.
 
     :param documents: list of Document objects
     :param embeddings: embeddings model to use
+    :param embedding_cache_path: if provided, path to the embedding cache
+        used to skip the API calls for chunks embedded before
     :return: FAISS vector store
     """
+    embeddings = _maybe_cache_embeddings(embeddings, embedding_cache_path)
     vector_store = FAISS.from_documents(documents, embeddings)
     _LOG.info("Created vector store with %d entries", len(documents))
     return vector_store
@@ -169,6 +332,8 @@ def update_vector_store(
     vector_store: FAISS,
     new_documents: List[lngchdocstordoc.Document],
     embeddings: langchain.embeddings.OpenAIEmbeddings,
+    *,
+    embedding_cache_path: Optional[str] = None,
 ) -> FAISS:
     """
     Update existing vector store with new documents.
@@ -176,8 +341,10 @@ def update_vector_store(
     :param vector_store: FAISS vector store
     :param new_documents: list of new Document objects
     :param embeddings: embeddings model to use
+    :param embedding_cache_path: if provided, path to the embedding cache
     :return: updated FAISS vector store
     """
+    embeddings = _maybe_cache_embeddings(embeddings, embedding_cache_path)
     if new_documents:
         new_vector_store = FAISS.from_documents(new_documents, embeddings)
         vector_store.merge_from(new_vector_store)
@@ -185,63 +352,349 @@ def update_vector_store(
     return vector_store
 
 
+def load_index_manifest(manifest_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the manifest of the indexed files.
+
+    The manifest maps each indexed file to:
+    - `mtime`: modification time when it was last indexed
+    - `file_hash`: MD5 of the file content, or `None` if unknown
+    - `chunks`: list of `[chunk_hash, chunk_id]` pairs, where `chunk_id` is
+      the id of the chunk in the vector store docstore
+
+    :param manifest_path: path to the JSON manifest
+    :return: manifest, empty if the file doesn't exist
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest
+
+
+def save_index_manifest(
+    manifest: Dict[str, Dict[str, Any]], manifest_path: str
+) -> None:
+    """
+    Save the manifest atomically so that a crash never leaves it truncated.
+
+    :param manifest: manifest to save
+    :param manifest_path: path to the JSON manifest
+    """
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def build_index_manifest(vector_store: FAISS) -> Dict[str, Dict[str, Any]]:
+    """
+    Rebuild the manifest from the documents stored in a vector store.
+
+    This allows indexing incrementally a vector store created with
+    `create_vector_store()` without re-embedding it.
+
+    :param vector_store: FAISS vector store with `source` and
+        `last_modified` metadata
+    :return: manifest
+    """
+    manifest: Dict[str, Dict[str, Any]] = {}
+    for chunk_id in vector_store.index_to_docstore_id.values():
+        doc = vector_store.docstore.search(chunk_id)
+        source = doc.metadata["source"]
+        entry = manifest.setdefault(
+            source,
+            {
+                "mtime": doc.metadata.get("last_modified", 0.0),
+                "file_hash": None,
+                "chunks": [],
+            },
+        )
+        entry["chunks"].append([_hash_text(doc.page_content), chunk_id])
+    _LOG.info("Built index manifest for %d files", len(manifest))
+    return manifest
+
+
+def _hash_text(text: str) -> str:
+    """
+    Compute the checksum used to detect changed content.
+    """
+    checksum = hashlib.md5(text.encode()).hexdigest()
+    return checksum
+
+
+def update_vector_store_incrementally(
+    dir_path: str,
+    vector_store: Optional[FAISS],
+    embeddings: langchain.embeddings.OpenAIEmbeddings,
+    manifest: Dict[str, Dict[str, Any]],
+    *,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    embedding_cache_path: Optional[str] = None,
+) -> Optional[FAISS]:
+    """
+    Synchronize a vector store with the markdown files in a directory.
+
+    - Files whose mtime and content hash are unchanged are skipped
+    - Changed files are re-parsed and re-split, but only the chunks whose
+      hash is not already indexed for the file are embedded
+    - Chunks that disappeared from a changed file and all the chunks of
+      deleted files are removed from the vector store by docstore id
+
+    The manifest is updated in place.
+
+    :param dir_path: path to directory containing markdown files
+    :param vector_store: FAISS vector store to update, or `None` to create
+        one from the new chunks
+    :param embeddings: embeddings model to use
+    :param manifest: manifest of the indexed files, see
+        `load_index_manifest()`
+    :param chunk_size: size of each chunk in characters
+    :param chunk_overlap: overlap between chunks in characters
+    :param embedding_cache_path: if provided, path to the embedding cache
+    :return: updated FAISS vector store, `None` if there is nothing indexed
+    """
+    embeddings = _maybe_cache_embeddings(embeddings, embedding_cache_path)
+    current_files = {
+        str(p): p.stat().st_mtime for p in pathlib.Path(dir_path).rglob("*.md")
+    }
+    ids_to_delete: List[str] = []
+    new_chunks: List[lngchdocstordoc.Document] = []
+    new_ids: List[str] = []
+    # Remove the chunks of deleted files.
+    for path in manifest.keys() - current_files.keys():
+        entry = manifest.pop(path)
+        ids_to_delete.extend(chunk_id for _, chunk_id in entry["chunks"])
+    for path, mtime in current_files.items():
+        entry = manifest.get(path)
+        if entry is not None and entry["mtime"] == mtime:
+            continue
+        file_hash = _hash_text(pathlib.Path(path).read_text(encoding="utf-8"))
+        if entry is not None and entry["file_hash"] == file_hash:
+            # Touched but not edited.
+            entry["mtime"] = mtime
+            continue
+        # Pool the indexed chunks of the file by hash to reuse them.
+        old_ids_by_hash: Dict[str, List[str]] = {}
+        for chunk_hash, chunk_id in entry["chunks"] if entry else []:
+            old_ids_by_hash.setdefault(chunk_hash, []).append(chunk_id)
+        chunks = split_documents(
+            parse_markdown_files([path]),
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+        manifest_chunks = []
+        for chunk in chunks:
+            chunk_hash = _hash_text(chunk.page_content)
+            if old_ids_by_hash.get(chunk_hash):
+                chunk_id = old_ids_by_hash[chunk_hash].pop()
+            else:
+                chunk_id = str(uuid.uuid4())
+                new_chunks.append(chunk)
+                new_ids.append(chunk_id)
+            manifest_chunks.append([chunk_hash, chunk_id])
+        # The chunks that were not reused are stale.
+        for chunk_ids in old_ids_by_hash.values():
+            ids_to_delete.extend(chunk_ids)
+        manifest[path] = {
+            "mtime": mtime,
+            "file_hash": file_hash,
+            "chunks": manifest_chunks,
+        }
+    if ids_to_delete and vector_store is not None:
+        vector_store.delete(ids_to_delete)
+    if new_chunks:
+        # Embed with `embeddings` rather than the store embedding function, so
+        # that the embedding cache is used.
+        texts = [chunk.page_content for chunk in new_chunks]
+        text_embeddings = list(zip(texts, embeddings.embed_documents(texts)))
+        metadatas = [chunk.metadata for chunk in new_chunks]
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(
+                text_embeddings, embeddings, metadatas=metadatas, ids=new_ids
+            )
+        else:
+            vector_store.add_embeddings(
+                text_embeddings, metadatas=metadatas, ids=new_ids
+            )
+    _LOG.info(
+        "Embedded %d new chunks and deleted %d stale chunks",
+        len(new_chunks),
+        len(ids_to_delete),
+    )
+    return vector_store
+
+
 def update_vector_store_from_changes(
     config: Dict[str, Any],
     vector_store: FAISS,
     embeddings: langchain.embeddings.OpenAIEmbeddings,
-) -> None:
+) -> FAISS:
     """
     Update vector store based on file changes in the source directory.
 
+    The indexed state is persisted in the manifest at
+    `config["index_manifest_path"]` (default `vector_store_manifest.json`).
+    If `config["embedding_cache_path"]` is set, embeddings go through
+    `CachedEmbeddings`.
+    If the manifest doesn't exist yet, it is rebuilt from the vector store, so
+    that only the files changed after its creation are re-indexed.
+
     :param config: Configuration dictionary containing source directory and chunk parameters
-    :param known_files: Dictionary tracking known files and modification times
     :param vector_store: FAISS vector store to update
     :param embeddings: Embeddings model to use
+    :return: updated FAISS vector store
     """
-    # Monitor the folder for changes and update the vector store.
-    known_files = initialize_known_files(config["source_directory"])
-    # First check what files have changed by comparing against our known state.
-    changes = watch_folder_for_changes(
-        dir_path=config["source_directory"], known_files=known_files
+    manifest_path = config.get(
+        "index_manifest_path", "vector_store_manifest.json"
     )
-    # Only process if we have new or modified files to avoid unnecessary work.
-    if changes["new"] or changes["modified"]:
-        changed_files = changes["new"] + changes["modified"]
-        # Convert markdown to raw documents first so we can validate the content
-        # before spending time on chunking and embedding
-        raw_new_docs = parse_markdown_files(changed_files)
-        if raw_new_docs:
-            # Break documents into smaller chunks to improve retrieval accuracy
-            # and stay within model context limits
-            chunked_new_docs = split_documents(
-                documents=raw_new_docs,
-                chunk_size=config["parse_data_into_chunks"]["chunk_size"],
-                chunk_overlap=config["parse_data_into_chunks"]["chunk_overlap"],
-            )
-            # Add the new document chunks to our existing vector store
-            # This maintains the searchable knowledge base
-            update_vector_store(
-                vector_store=vector_store,
-                new_documents=chunked_new_docs,
-                embeddings=embeddings,
+    manifest = load_index_manifest(manifest_path)
+    if not manifest:
+        manifest = build_index_manifest(vector_store)
+    vector_store = update_vector_store_incrementally(
+        config["source_directory"],
+        vector_store,
+        embeddings,
+        manifest,
+        chunk_size=config["parse_data_into_chunks"]["chunk_size"],
+        chunk_overlap=config["parse_data_into_chunks"]["chunk_overlap"],
+        embedding_cache_path=config.get("embedding_cache_path"),
+    )
+    save_index_manifest(manifest, manifest_path)
+    return vector_store
+
+
+def _parse_and_split_file(
+    file_path: str, chunk_size: int, chunk_overlap: int
+) -> List[lngchdocstordoc.Document]:
+    """
+    Parse, split, and hash the chunks of a markdown file.
+
+    This runs in the worker processes of `iter_chunk_batches()`.
+
+    :param file_path: path to the markdown file
+    :param chunk_size: size of each chunk in characters
+    :param chunk_overlap: overlap between chunks in characters
+    :return: chunks with a `chunk_checksum` metadata
+    """
+    text_splitter = langchain.text_splitter.RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+    )
+    chunks = text_splitter.split_documents(_parse_markdown_file(file_path))
+    for chunk in chunks:
+        chunk.metadata["chunk_checksum"] = _hash_text(chunk.page_content)
+    return chunks
+
+
+def iter_chunk_batches(
+    file_paths: List[str],
+    *,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    batch_size: int = 256,
+    max_workers: Optional[int] = None,
+) -> Iterator[List[lngchdocstordoc.Document]]:
+    """
+    Parse and split markdown files in a process pool, yielding chunk batches.
+
+    Parsing with `UnstructuredMarkdownLoader` is CPU-bound, so files are
+    processed in separate processes. At most `2 * max_workers` files are in
+    flight and chunks are yielded as soon as a batch is full, so memory is
+    bounded by the batch size rather than by the corpus size.
+
+    :param file_paths: list of paths to markdown files
+    :param chunk_size: size of each chunk in characters
+    :param chunk_overlap: overlap between chunks in characters
+    :param batch_size: number of chunks per yielded batch
+    :param max_workers: number of processes, defaults to the number of CPUs
+    :return: iterator over lists of chunks, in file completion order
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    batch: List[lngchdocstordoc.Document] = []
+    num_failed = 0
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    with executor:
+        pending = set()
+        file_paths_iter = iter(file_paths)
+        while True:
+            # Keep the pool busy without materializing all the results.
+            for file_path in file_paths_iter:
+                future = executor.submit(
+                    _parse_and_split_file, file_path, chunk_size, chunk_overlap
+                )
+                pending.add(future)
+                if len(pending) >= 2 * max_workers:
+                    break
+            if not pending:
+                break
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
             )
-            # Log success metrics to track system health
-            _LOG.info(
-                "Updated vector store with %d new chunks from %d files",
-                len(chunked_new_docs),
-                len(changed_files),
+            for future in done:
+                try:
+                    batch.extend(future.result())
+                except Exception as e:
+                    num_failed += 1
+                    _LOG.warning("Failed to parse file: %s", e)
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+    if batch:
+        yield batch
+    _LOG.info(
+        "Parsed %d/%d files", len(file_paths) - num_failed, len(file_paths)
+    )
+
+
+def ingest_markdown_files(
+    file_paths: List[str],
+    embeddings: langchain.embeddings.OpenAIEmbeddings,
+    *,
+    vector_store: Optional[FAISS] = None,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    batch_size: int = 256,
+    max_workers: Optional[int] = None,
+    embedding_cache_path: Optional[str] = None,
+) -> Optional[FAISS]:
+    """
+    Stream markdown files into a vector store.
+
+    Files are parsed and split by `iter_chunk_batches()` while the main
+    process embeds each batch and inserts it in the vector store, so parsing
+    and embedding overlap and all the cores are used.
+
+    :param file_paths: list of paths to markdown files
+    :param embeddings: embeddings model to use
+    :param vector_store: FAISS vector store to add to, or `None` to create
+        one
+    :param chunk_size: size of each chunk in characters
+    :param chunk_overlap: overlap between chunks in characters
+    :param batch_size: number of chunks embedded and inserted at once
+    :param max_workers: number of parsing processes
+    :param embedding_cache_path: if provided, path to the embedding cache
+    :return: FAISS vector store, `None` if no chunk was produced
+    """
+    embeddings = _maybe_cache_embeddings(embeddings, embedding_cache_path)
+    num_chunks = 0
+    batches = iter_chunk_batches(
+        file_paths,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        batch_size=batch_size,
+        max_workers=max_workers,
+    )
+    for batch in batches:
+        texts = [chunk.page_content for chunk in batch]
+        text_embeddings = list(zip(texts, embeddings.embed_documents(texts)))
+        metadatas = [chunk.metadata for chunk in batch]
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(
+                text_embeddings, embeddings, metadatas=metadatas
             )
-            _LOG.debug("New/modified files: %s", changed_files)
         else:
-            # Alert if files changed but we couldn't extract valid content
-            _LOG.warning(
-                "No valid documents found in %d changed files", len(changed_files)
-            )
-    # Currently we don't handle deletions since it would require rebuilding.
-    # indexes Flag this limitation to operators through logs.
-    if changes["deleted"]:
-        _LOG.warning(
-            "Deletion handling not implemented. Found %d deleted files: %s",
-            len(changes["deleted"]),
-            changes["deleted"],
-        )
+            vector_store.add_embeddings(text_embeddings, metadatas=metadatas)
+        num_chunks += len(batch)
+    _LOG.info("Ingested %d chunks from %d files", num_chunks, len(file_paths))
+    return vector_store
@@ -0,0 +1,444 @@
+"""
+Bulk graph ingestion helpers for Neo4j.
+
+Nodes and relationships are grouped by label / relationship type and written
+with parametrized `UNWIND $rows AS row MERGE ...` statements, one managed
+write transaction per batch, instead of one statement per node or edge.
+
+Import as:
+
+import tutorial_neo4j.neo4j.neo4j_utils as tnnenuti
+"""
+
+import logging
+import math
+import re
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import neo4j as nj
+import pandas as pd
+
+import helpers.hdbg as hdbg
+
+_LOG = logging.getLogger(__name__)
+
+# Rows can be passed either as a DataFrame or as an iterable of dicts.
+Rows = Union[pd.DataFrame, Iterable[Dict[str, Any]]]
+
+_DEFAULT_BATCH_SIZE = 10_000
+# Labels, relationship types and property names cannot be passed as query
+# parameters, so they are validated before being interpolated in Cypher.
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+# #############################################################################
+# Utilities
+# #############################################################################
+
+
+def _quote(name: str) -> str:
+    """
+    Validate a label / type / property name and quote it for Cypher.
+
+    :param name: identifier to quote
+    :return: backtick-quoted identifier
+    """
+    hdbg.dassert(
+        _IDENTIFIER_RE.match(str(name)), "Invalid Cypher identifier:", name
+    )
+    return f"`{name}`"
+
+
+def _clean_value(value: Any) -> Any:
+    """
+    Convert a value into a type that the Neo4j driver can send.
+
+    NaN / NaT become `None` and numpy scalars become Python scalars.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is pd.NaT:
+        return None
+    if hasattr(value, "item") and not isinstance(value, (list, dict)):
+        # Unwrap numpy scalars.
+        return value.item()
+    return value
+
+
+def _get_props(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the properties of a row, dropping missing values.
+
+    Missing values are dropped instead of being set to `null`, since
+    `SET n += {prop: null}` would remove a property set by another row.
+    """
+    props = {k: _clean_value(v) for k, v in record.items()}
+    props = {k: v for k, v in props.items() if v is not None}
+    return props
+
+
+def _iter_records(rows: Rows) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over rows as dicts, regardless of the input container.
+    """
+    if isinstance(rows, pd.DataFrame):
+        # `to_dict()` is much faster than `iterrows()` on large frames.
+        yield from rows.to_dict(orient="records")
+    else:
+        yield from rows
+
+
+def _write_batch(tx: nj.ManagedTransaction, query: str, rows: List[Dict]) -> None:
+    """
+    Run one `UNWIND` statement inside a managed transaction.
+    """
+    tx.run(query, rows=rows).consume()
+
+
+def _flush(
+    driver: nj.Driver,
+    query: str,
+    rows: List[Dict],
+    *,
+    database: Optional[str],
+) -> int:
+    """
+    Write a batch of rows in its own managed write transaction.
+
+    :return: number of rows written
+    """
+    if not rows:
+        return 0
+    with driver.session(database=database) as session:
+        # `execute_write()` retries the batch on transient errors.
+        session.execute_write(_write_batch, query, rows)
+    return len(rows)
+
+
+def _report(what: str, num_rows: int, start_time: float) -> Dict[str, float]:
+    """
+    Log and return the throughput of a load.
+    """
+    elapsed = time.perf_counter() - start_time
+    rows_per_sec = num_rows / elapsed if elapsed > 0 else float("inf")
+    _LOG.info(
+        "Loaded %d %s in %.2f s (%.0f rows/sec)",
+        num_rows,
+        what,
+        elapsed,
+        rows_per_sec,
+    )
+    stats = {
+        "rows": num_rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows_per_sec,
+    }
+    return stats
+
+
+# #############################################################################
+# Schema
+# #############################################################################
+
+
+def create_constraints(
+    driver: nj.Driver,
+    node_keys: Dict[str, str],
+    *,
+    indexes: Optional[Dict[str, List[str]]] = None,
+    database: Optional[str] = None,
+) -> None:
+    """
+    Create uniqueness constraints on the node keys and optional indexes.
+
+    A uniqueness constraint is backed by an index, so `MERGE` on the key is an
+    index lookup instead of a label scan. This must run before loading.
+
+    :param driver: Neo4j driver
+    :param node_keys: label -> property that uniquely identifies a node,
+        e.g., `{"Movie": "title", "Director": "name"}`
+    :param indexes: label -> additional properties to index
+    :param database: database to write to (`None` for the default one)
+    """
+    queries = []
+    for label, key in node_keys.items():
+        name = f"{label}_{key}_unique"
+        queries.append(
+            f"CREATE CONSTRAINT {_quote(name)} IF NOT EXISTS "
+            f"FOR (n:{_quote(label)}) REQUIRE n.{_quote(key)} IS UNIQUE"
+        )
+    for label, props in (indexes or {}).items():
+        for prop in props:
+            name = f"{label}_{prop}_index"
+            queries.append(
+                f"CREATE INDEX {_quote(name)} IF NOT EXISTS "
+                f"FOR (n:{_quote(label)}) ON (n.{_quote(prop)})"
+            )
+    # Schema statements cannot be mixed with data writes in a transaction, so
+    # each one runs as an auto-commit query.
+    with driver.session(database=database) as session:
+        for query in queries:
+            _LOG.debug("Running: %s", query)
+            session.run(query).consume()
+    _LOG.info("Created %d constraints / indexes", len(queries))
+
+
+# #############################################################################
+# Nodes
+# #############################################################################
+
+
+def get_node_query(label: str, key: str) -> str:
+    """
+    Build the `UNWIND` query merging nodes with a given label.
+
+    Each row is `{"key": <key value>, "props": {<properties>}}`.
+
+    :param label: node label
+    :param key: property uniquely identifying a node
+    :return: Cypher query
+    """
+    query = (
+        "UNWIND $rows AS row\n"
+        f"MERGE (n:{_quote(label)} {{{_quote(key)}: row.key}})\n"
+        "SET n += row.props"
+    )
+    return query
+
+
+def load_nodes(
+    driver: nj.Driver,
+    nodes: Rows,
+    node_keys: Dict[str, str],
+    *,
+    label: Optional[str] = None,
+    label_col: str = "label",
+    batch_size: int = _DEFAULT_BATCH_SIZE,
+    database: Optional[str] = None,
+) -> Dict[str, float]:
+    """
+    Merge nodes in batches, grouped by label.
+
+    Every column other than the label column is stored as a property. Rows
+    are buffered per label and flushed every `batch_size` rows, so iterables
+    are streamed without being materialized.
+
+    :param driver: Neo4j driver
+    :param nodes: DataFrame or iterable of dicts with the node properties
+    :param node_keys: label -> key property (see `create_constraints()`)
+    :param label: label for all the nodes; if `None` the label is read from
+        `label_col` in each row
+    :param label_col: column holding the label of each node
+    :param batch_size: number of rows per transaction
+    :param database: database to write to (`None` for the default one)
+    :return: stats with the number of rows, seconds, and rows/sec
+    """
+    hdbg.dassert_lte(1, batch_size)
+    start_time = time.perf_counter()
+    buffers: Dict[str, List[Dict]] = {}
+    queries: Dict[str, str] = {}
+    num_rows = 0
+    for record in _iter_records(nodes):
+        record = dict(record)
+        node_label = label if label is not None else record.pop(label_col)
+        record.pop(label_col, None)
+        hdbg.dassert_in(node_label, node_keys)
+        key = node_keys[node_label]
+        key_value = _clean_value(record.pop(key))
+        hdbg.dassert_is_not(key_value, None, "Missing key for", node_label)
+        props = _get_props(record)
+        if node_label not in queries:
+            queries[node_label] = get_node_query(node_label, key)
+        buffer = buffers.setdefault(node_label, [])
+        buffer.append({"key": key_value, "props": props})
+        if len(buffer) >= batch_size:
+            num_rows += _flush(
+                driver, queries[node_label], buffer, database=database
+            )
+            buffers[node_label] = []
+    for node_label, buffer in buffers.items():
+        num_rows += _flush(driver, queries[node_label], buffer, database=database)
+    return _report("nodes", num_rows, start_time)
+
+
+# #############################################################################
+# Relationships
+# #############################################################################
+
+
+def get_relationship_query(
+    rel_type: str,
+    source_label: str,
+    source_key: str,
+    target_label: str,
+    target_key: str,
+) -> str:
+    """
+    Build the `UNWIND` query merging relationships of a given type.
+
+    Each row is `{"source": <key>, "target": <key>, "props": {...}}`. Both
+    endpoints must already exist.
+
+    :param rel_type: relationship type
+    :param source_label: label of the start nodes
+    :param source_key: key property of the start nodes
+    :param target_label: label of the end nodes
+    :param target_key: key property of the end nodes
+    :return: Cypher query
+    """
+    query = (
+        "UNWIND $rows AS row\n"
+        f"MATCH (a:{_quote(source_label)} {{{_quote(source_key)}: row.source}})\n"
+        f"MATCH (b:{_quote(target_label)} {{{_quote(target_key)}: row.target}})\n"
+        f"MERGE (a)-[r:{_quote(rel_type)}]->(b)\n"
+        "SET r += row.props"
+    )
+    return query
+
+
+def load_relationships(
+    driver: nj.Driver,
+    edges: Rows,
+    node_keys: Dict[str, str],
+    *,
+    rel_type: Optional[str] = None,
+    source_label: Optional[str] = None,
+    target_label: Optional[str] = None,
+    type_col: str = "type",
+    source_label_col: str = "source_label",
+    target_label_col: str = "target_label",
+    source_col: str = "source",
+    target_col: str = "target",
+    batch_size: int = _DEFAULT_BATCH_SIZE,
+    database: Optional[str] = None,
+) -> Dict[str, float]:
+    """
+    Merge relationships in batches, grouped by type and endpoint labels.
+
+    The type and endpoint labels are either fixed with `rel_type`,
+    `source_label`, `target_label` or read per row from the corresponding
+    columns. The remaining columns are stored as relationship properties.
+
+    :param driver: Neo4j driver
+    :param edges: DataFrame or iterable of dicts with the edges
+    :param node_keys: label -> key property (see `create_constraints()`)
+    :param rel_type: relationship type for all the edges
+    :param source_label: label of all the start nodes
+    :param target_label: label of all the end nodes
+    :param type_col: column with the relationship type
+    :param source_label_col: column with the label of the start node
+    :param target_label_col: column with the label of the end node
+    :param source_col: column with the key of the start node
+    :param target_col: column with the key of the end node
+    :param batch_size: number of rows per transaction
+    :param database: database to write to (`None` for the default one)
+    :return: stats with the number of rows, seconds, and rows/sec
+    """
+    hdbg.dassert_lte(1, batch_size)
+    start_time = time.perf_counter()
+    buffers: Dict[Tuple[str, str, str], List[Dict]] = {}
+    queries: Dict[Tuple[str, str, str], str] = {}
+    num_rows = 0
+    for record in _iter_records(edges):
+        record = dict(record)
+        group = (
+            rel_type if rel_type is not None else record.pop(type_col),
+            (
+                source_label
+                if source_label is not None
+                else record.pop(source_label_col)
+            ),
+            (
+                target_label
+                if target_label is not None
+                else record.pop(target_label_col)
+            ),
+        )
+        for col in (type_col, source_label_col, target_label_col):
+            record.pop(col, None)
+        row = {
+            "source": _clean_value(record.pop(source_col)),
+            "target": _clean_value(record.pop(target_col)),
+            "props": _get_props(record),
+        }
+        if group not in queries:
+            type_, src_label, dst_label = group
+            hdbg.dassert_in(src_label, node_keys)
+            hdbg.dassert_in(dst_label, node_keys)
+            queries[group] = get_relationship_query(
+                type_,
+                src_label,
+                node_keys[src_label],
+                dst_label,
+                node_keys[dst_label],
+            )
+        buffer = buffers.setdefault(group, [])
+        buffer.append(row)
+        if len(buffer) >= batch_size:
+            num_rows += _flush(driver, queries[group], buffer, database=database)
+            buffers[group] = []
+    for group, buffer in buffers.items():
+        num_rows += _flush(driver, queries[group], buffer, database=database)
+    return _report("relationships", num_rows, start_time)
+
+
+# #############################################################################
+# Graph
+# #############################################################################
+
+
+def load_graph(
+    driver: nj.Driver,
+    node_keys: Dict[str, str],
+    *,
+    nodes: Optional[Rows] = None,
+    edges: Optional[Rows] = None,
+    indexes: Optional[Dict[str, List[str]]] = None,
+    batch_size: int = _DEFAULT_BATCH_SIZE,
+    database: Optional[str] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Create the schema, then bulk-load nodes and relationships.
+
+    E.g., to load the Netflix movies and their directors:
+        ```
+        movies = df[["title", "release_year"]].drop_duplicates("title")
+        directors = df[["director"]].drop_duplicates()
+        edges = df[["director", "title"]].rename(
+            columns={"director": "source", "title": "target"}
+        )
+        load_graph(
+            driver,
+            {"Movie": "title", "Director": "director"},
+            nodes=pd.concat(
+                [movies.assign(label="Movie"), directors.assign(label="Director")]
+            ),
+            edges=edges.assign(
+                type="DIRECTED", source_label="Director", target_label="Movie"
+            ),
+        )
+        ```
+
+    :param driver: Neo4j driver
+    :param node_keys: label -> key property of the nodes
+    :param nodes: nodes to load (see `load_nodes()`)
+    :param edges: relationships to load (see `load_relationships()`)
+    :param indexes: label -> additional properties to index
+    :param batch_size: number of rows per transaction
+    :param database: database to write to (`None` for the default one)
+    :return: stats for "nodes" and "relationships"
+    """
+    create_constraints(driver, node_keys, indexes=indexes, database=database)
+    stats = {}
+    if nodes is not None:
+        stats["nodes"] = load_nodes(
+            driver, nodes, node_keys, batch_size=batch_size, database=database
+        )
+    if edges is not None:
+        stats["relationships"] = load_relationships(
+            driver, edges, node_keys, batch_size=batch_size, database=database
+        )
+    return stats
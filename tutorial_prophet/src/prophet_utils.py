@@ -0,0 +1,390 @@
+"""
+Fit and forecast many time series with Prophet in parallel.
+
+Each series (e.g., one per grid region or currency pair) is fitted in a worker
+of a process pool. Fitted models, forecasts and cross-validation results are
+persisted under a key derived from a hash of the data and of the model
+config, so that unchanged series are not refitted on the next run.
+
+Import as:
+
+import tutorial_prophet.src.prophet_utils as tpsprut
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import prophet as prh
+import prophet.diagnostics as diagnostics
+import prophet.serialize as prhs
+
+import helpers.hdbg as hdbg
+
+_LOG = logging.getLogger(__name__)
+
+# Holidays shared by all the series fitted in a worker process. They are sent
+# once per worker by `_init_worker()` instead of once per series.
+_WORKER_HOLIDAYS: Optional[pd.DataFrame] = None
+
+
+# #############################################################################
+# Hashing
+# #############################################################################
+
+
+def _hash_df(df: Optional[pd.DataFrame]) -> str:
+    """
+    Compute a content hash of a DataFrame, including its columns.
+    """
+    if df is None:
+        return ""
+    hasher = hashlib.sha256()
+    hasher.update(",".join(map(str, df.columns)).encode())
+    hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return hasher.hexdigest()
+
+
+def get_series_key(
+    df: pd.DataFrame,
+    model_config: Dict[str, Any],
+    *,
+    holidays: Optional[pd.DataFrame] = None,
+    regressors: Optional[List[str]] = None,
+    periods: int = 0,
+    freq: str = "D",
+    cv_kwargs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Compute the cache key of a series fit.
+
+    The key changes whenever the data, the holidays, or any of the params that
+    affect the model or its outputs change.
+
+    :param df: series with the "ds", "y" and regressors columns
+    :param model_config: kwargs passed to `prh.Prophet()`
+    :param holidays: holidays passed to `prh.Prophet()`
+    :param regressors: names of the extra regressors
+    :param periods: number of future periods to forecast
+    :param freq: frequency of the future periods
+    :param cv_kwargs: kwargs passed to `diagnostics.cross_validation()`
+    :return: hex digest
+    """
+    params = {
+        "model_config": model_config,
+        "regressors": regressors or [],
+        "periods": periods,
+        "freq": freq,
+        "cv_kwargs": cv_kwargs,
+    }
+    hasher = hashlib.sha256()
+    hasher.update(_hash_df(df).encode())
+    hasher.update(_hash_df(holidays).encode())
+    hasher.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return hasher.hexdigest()
+
+
+# #############################################################################
+# ProphetModelStore
+# #############################################################################
+
+
+class ProphetModelStore:
+    """
+    Persist fitted Prophet models, forecasts and CV results on disk.
+
+    The layout is:
+        ```
+        <cache_dir>/<series_name>/<key>.model.json
+        <cache_dir>/<series_name>/<key>.forecast.parquet
+        <cache_dir>/<series_name>/<key>.cv.parquet
+        ```
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        """
+        Initialize the store.
+
+        :param cache_dir: dir where to store the results
+        """
+        self._cache_dir = pathlib.Path(cache_dir)
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def has(self, series_name: str, key: str) -> bool:
+        """
+        Check whether the results for a series and key are stored.
+        """
+        return self._get_path(series_name, key, "forecast.parquet").exists()
+
+    def save(
+        self,
+        series_name: str,
+        key: str,
+        model: prh.Prophet,
+        forecast: pd.DataFrame,
+        df_cv: Optional[pd.DataFrame],
+    ) -> None:
+        """
+        Store the results of a fit, replacing the older ones for the series.
+
+        The forecast is written last so that `has()` never sees a partial
+        entry.
+        """
+        series_dir = self._get_series_dir(series_name)
+        series_dir.mkdir(parents=True, exist_ok=True)
+        # Remove the results for the previous versions of the series.
+        for path in series_dir.glob("*"):
+            if not path.name.startswith(key):
+                path.unlink()
+        model_path = self._get_path(series_name, key, "model.json")
+        model_path.write_text(prhs.model_to_json(model))
+        if df_cv is not None:
+            df_cv.to_parquet(self._get_path(series_name, key, "cv.parquet"))
+        forecast_path = self._get_path(series_name, key, "forecast.parquet")
+        tmp_path = forecast_path.with_suffix(".tmp")
+        forecast.to_parquet(tmp_path)
+        os.replace(tmp_path, forecast_path)
+
+    def load_model(self, series_name: str, key: str) -> prh.Prophet:
+        """
+        Load a fitted model.
+        """
+        model_path = self._get_path(series_name, key, "model.json")
+        return prhs.model_from_json(model_path.read_text())
+
+    def load_forecast(self, series_name: str, key: str) -> pd.DataFrame:
+        """
+        Load a forecast.
+        """
+        return pd.read_parquet(
+            self._get_path(series_name, key, "forecast.parquet")
+        )
+
+    def load_cv(self, series_name: str, key: str) -> Optional[pd.DataFrame]:
+        """
+        Load the CV results, if CV was run.
+        """
+        cv_path = self._get_path(series_name, key, "cv.parquet")
+        if not cv_path.exists():
+            return None
+        return pd.read_parquet(cv_path)
+
+    def _get_series_dir(self, series_name: str) -> pathlib.Path:
+        # Series names like "BTC/USD" cannot be used as is as dir names.
+        return self._cache_dir / series_name.replace(os.sep, "_")
+
+    def _get_path(self, series_name: str, key: str, suffix: str) -> pathlib.Path:
+        return self._get_series_dir(series_name) / f"{key}.{suffix}"
+
+
+# #############################################################################
+# Fitting
+# #############################################################################
+
+
+def _init_worker(holidays: Optional[pd.DataFrame]) -> None:
+    """
+    Store the shared holidays in the worker process.
+    """
+    global _WORKER_HOLIDAYS
+    _WORKER_HOLIDAYS = holidays
+    # Silence the per-fit logging of cmdstanpy in the workers.
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+
+
+def fit_series(
+    df: pd.DataFrame,
+    model_config: Dict[str, Any],
+    *,
+    holidays: Optional[pd.DataFrame] = None,
+    regressors: Optional[List[str]] = None,
+    periods: int = 0,
+    freq: str = "D",
+    cv_kwargs: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Fit a Prophet model on one series, forecast, and cross-validate.
+
+    :param df: series with the "ds", "y" and regressors columns
+    :param model_config: kwargs passed to `prh.Prophet()`
+    :param holidays: holidays passed to `prh.Prophet()`
+    :param regressors: names of the extra regressors
+    :param periods: number of future periods to forecast; when there are
+        regressors their future values are not known, so only in-sample
+        predictions are possible and `periods` must be 0
+    :param freq: frequency of the future periods
+    :param cv_kwargs: kwargs passed to `diagnostics.cross_validation()`, e.g.,
+        `{"initial": "730 days", "period": "180 days", "horizon": "365 days"}`;
+        `None` to skip CV
+    :return: dict with "model", "forecast" and "cv" (`None` without CV)
+    """
+    regressors = regressors or []
+    hdbg.dassert(
+        periods == 0 or not regressors,
+        "Cannot forecast future periods with regressors",
+    )
+    model = prh.Prophet(**model_config, holidays=holidays)
+    for regressor in regressors:
+        model.add_regressor(regressor)
+    model.fit(df)
+    if periods > 0:
+        future = model.make_future_dataframe(periods=periods, freq=freq)
+    else:
+        future = df.drop(columns=["y"])
+    forecast = model.predict(future)
+    df_cv = None
+    if cv_kwargs is not None:
+        # Each fold is an independent fit, so the folds run in parallel.
+        # Threads are enough since the fit runs in a CmdStan subprocess, and
+        # they can be used inside a worker of a process pool.
+        cv_kwargs = {"parallel": "threads", **cv_kwargs}
+        df_cv = diagnostics.cross_validation(model, **cv_kwargs)
+    result = {"model": model, "forecast": forecast, "cv": df_cv}
+    return result
+
+
+def _fit_and_save(
+    series_name: str,
+    key: str,
+    df: pd.DataFrame,
+    model_config: Dict[str, Any],
+    cache_dir: str,
+    fit_kwargs: Dict[str, Any],
+) -> str:
+    """
+    Fit a series in a worker process and persist the results.
+
+    The results are written by the worker so that only the series name, and
+    not the model and forecast, travels back to the parent process.
+    """
+    start_time = time.perf_counter()
+    result = fit_series(df, model_config, holidays=_WORKER_HOLIDAYS, **fit_kwargs)
+    store = ProphetModelStore(cache_dir)
+    store.save(
+        series_name, key, result["model"], result["forecast"], result["cv"]
+    )
+    _LOG.info(
+        "Fitted series '%s' in %.1f s",
+        series_name,
+        time.perf_counter() - start_time,
+    )
+    return series_name
+
+
+def fit_series_batch(
+    series: Dict[str, pd.DataFrame],
+    model_config: Dict[str, Any],
+    cache_dir: str,
+    *,
+    holidays: Optional[pd.DataFrame] = None,
+    regressors: Optional[List[str]] = None,
+    periods: int = 0,
+    freq: str = "D",
+    cv_kwargs: Optional[Dict[str, Any]] = None,
+    max_workers: Optional[int] = None,
+    force: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fit many series in parallel, skipping the ones that did not change.
+
+    E.g., to fit one model per region:
+        ```
+        series = {
+            region: df_region[["ds", "y"]]
+            for region, df_region in df.groupby("region")
+        }
+        results = fit_series_batch(
+            series,
+            config["model"],
+            "prophet_cache",
+            holidays=holidays_df,
+            cv_kwargs={"initial": "730 days", "horizon": "365 days"},
+        )
+        forecast = results["CAISO"]["forecast"]
+        ```
+
+    :param series: series name -> series with "ds", "y" and regressors
+    :param model_config: kwargs passed to `prh.Prophet()`
+    :param cache_dir: dir where the models and results are persisted
+    :param holidays: holidays shared by all the series
+    :param regressors: names of the extra regressors
+    :param periods: number of future periods to forecast
+    :param freq: frequency of the future periods
+    :param cv_kwargs: kwargs passed to `diagnostics.cross_validation()`;
+        `None` to skip CV
+    :param max_workers: number of processes (`None` for one per core)
+    :param force: refit all the series even if they are cached
+    :return: series name -> dict with "key", "forecast", "cv" and "refitted";
+        the models can be loaded with `ProphetModelStore.load_model()`
+    """
+    store = ProphetModelStore(cache_dir)
+    fit_kwargs = {
+        "regressors": regressors,
+        "periods": periods,
+        "freq": freq,
+        "cv_kwargs": cv_kwargs,
+    }
+    keys = {
+        series_name: get_series_key(
+            df, model_config, holidays=holidays, **fit_kwargs
+        )
+        for series_name, df in series.items()
+    }
+    to_fit = [
+        series_name
+        for series_name, key in keys.items()
+        if force or not store.has(series_name, key)
+    ]
+    _LOG.info(
+        "Fitting %d/%d series (%d unchanged)",
+        len(to_fit),
+        len(series),
+        len(series) - len(to_fit),
+    )
+    start_time = time.perf_counter()
+    if to_fit:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(holidays,),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _fit_and_save,
+                    series_name,
+                    keys[series_name],
+                    series[series_name],
+                    model_config,
+                    cache_dir,
+                    fit_kwargs,
+                ): series_name
+                for series_name in to_fit
+            }
+            for future in concurrent.futures.as_completed(futures):
+                # Re-raise the errors of the workers with the series name.
+                try:
+                    future.result()
+                except Exception as e:
+                    raise RuntimeError(
+                        f"Failed to fit series '{futures[future]}'"
+                    ) from e
+        _LOG.info(
+            "Fitted %d series in %.1f s",
+            len(to_fit),
+            time.perf_counter() - start_time,
+        )
+    results = {}
+    for series_name, key in keys.items():
+        results[series_name] = {
+            "key": key,
+            "forecast": store.load_forecast(series_name, key),
+            "cv": store.load_cv(series_name, key),
+            "refitted": series_name in to_fit,
+        }
+    return results
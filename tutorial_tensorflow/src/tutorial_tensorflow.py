@@ -52,6 +52,8 @@ import helpers.hprint as hprint
 import helpers.hdbg as hdbg
 import helpers.hpandas as hpanda
 
+import tutorial_tensorflow.src.sts_utils as ttsstut
+
 # %%
 hdbg.init_logger(verbosity=logging.INFO)
 
@@ -336,10 +338,9 @@ all_dates = pd.date_range(start=config["train_start_date"], end=config["test_end
 # Extract holiday dates from the configuration.
 holiday_dates = pd.to_datetime(config["data"]["holidays_dates"])
 holiday_features = np.isin(all_dates, holiday_dates).astype(float)
-holiday_indicators = np.zeros((len(all_dates), len(holiday_dates)))
-# For each date we create a one hot vector.
-for i, holiday in enumerate(holiday_dates):
-    holiday_indicators[:, i] = (all_dates == holiday).astype(int)
+# Get one one-hot column per holiday. The observed values are float64, so the
+# regressors have to be too.
+holiday_indicators = ttsstut.get_holiday_design_matrix(all_dates, holiday_dates).astype(np.float64)
 _LOG.info("holdiay features = %s, shape = %s", holiday_indicators, holiday_indicators.shape)
 
 # %%